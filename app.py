@@ -3,29 +3,33 @@
 # Streamlit Quant Monitoring Platform (ORCHESTRATION ONLY)
 # ============================================================
 
+import os
+
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 
 from config import (
     DEFAULT_DECISION_DATE, # Only used as a default UI value
-    MASTER_CSV,
-    REGIME_TABLE,
-    MACRO_MAP,
-    RESULTS_DIR
+    JOB_POLL_SEC,
+    LOG_FILE
 )
 
-from data_pipeline import (
-    run_daily_data_pipeline, 
-    get_master_date_range, 
-    fetch_monitoring_data
-)
-from corporate_cleaner import clean_corporate_events
-from regime_engine import integrate_regimes
-from feature_engineer import add_features
-from model_engine import train_and_save_models
-from trade_engine import live_trade_decision
+from data_pipeline import fetch_monitoring_data
+from app_data import master_range, symbols, symbol_history
+from trading_calendar import load_trading_calendar
 from performance_engine import run_weekly_performance_check
+from run_metrics import load_run_metrics, summarize_runs
+from job_runner import (
+    STAGES,
+    ensure_worker,
+    worker_alive,
+    submit_pipeline_job,
+    submit_backtest_job,
+    job_status,
+    job_log,
+    cancel_job
+)
 
 # ============================================================
 # STREAMLIT PAGE CONFIG
@@ -38,13 +42,85 @@ st.set_page_config(
 
 st.title("📈 Quant Trading – Real-Time Monitoring")
 
+# ============================================================
+# PIPELINE JOB STATUS (polled without rerunning the whole app)
+# ============================================================
+
+@st.fragment(run_every=JOB_POLL_SEC)
+def pipeline_job_panel():
+    job_id = st.session_state.get("pipeline_job")
+    if not job_id:
+        return
+
+    job = job_status(job_id)
+    params = job["params"]
+    st.subheader(f"🔄 Pipeline for Decision Date: {params['decision_date']}  ·  {job['status']}")
+    st.progress(job["progress"])
+    st.dataframe(
+        pd.DataFrame(job["stages"]).T.reindex(columns=["status", "started", "finished", "seconds", "error"]),
+        use_container_width=True
+    )
+
+    if job["status"] in ("queued", "running"):
+        if st.button("⏹ Cancel Job", key="btn_cancel_job"):
+            cancel_job(job_id)
+        if not worker_alive():
+            ensure_worker()
+    elif job["status"] == "done":
+        reused = {s for s, v in job["stages"].items() if v["status"] == "reused"}
+        fs = job["result"].get("features")
+        if "features" in reused:
+            st.success("✔ Features Ready (inputs unchanged, checkpoint reused)")
+        elif fs:
+            st.success(f"✔ Features Ready ({fs['status']}, {fs['rows']} rows recomputed)")
+        if "train" in job["result"]:
+            st.success("✔ Models Up To Date (checkpoint reused)" if "train" in reused else "✔ Retrained")
+            st.dataframe(pd.read_csv(job["result"]["train"]["file"]), use_container_width=True)
+        if "trade" in job["result"]:
+            st.success("🚀 Trades Generated")
+            st.dataframe(pd.read_csv(job["result"]["trade"]["file"]), use_container_width=True)
+            st.info(f"Saved: {job['result']['trade']['file']}")
+    else:
+        st.error(f"Pipeline {job['status']}: {job['error'] or ''}")
+
+    with st.expander("Job Log"):
+        st.code(job_log(job_id)[-5000:])
+
+
+@st.fragment(run_every=JOB_POLL_SEC)
+def backtest_job_panel():
+    job_id = st.session_state.get("backtest_job")
+    if not job_id:
+        return
+
+    job = job_status(job_id)
+    params = job["params"]
+    st.subheader(f"🧪 Out-of-Sample Backtest: {params['start']} → {params['end']}  ·  {job['status']}")
+    st.progress(job["progress"])
+
+    if job["status"] in ("queued", "running"):
+        if st.button("⏹ Cancel Backtest", key="btn_cancel_backtest"):
+            cancel_job(job_id)
+        if not worker_alive():
+            ensure_worker()
+    elif job["status"] == "done":
+        bt = pd.read_csv(job["result"]["backtest"]["file"], parse_dates=["decision_date"])
+        st.line_chart(bt.set_index("decision_date")[["alpha_mean"]].rolling(20).mean())
+        st.dataframe(bt, use_container_width=True)
+    else:
+        st.error(f"Backtest {job['status']}: {job['error'] or ''}")
+
+    with st.expander("Backtest Log"):
+        st.code(job_log(job_id)[-5000:])
+
 # ============================================================
 # TABS ARCHITECTURE
 # ============================================================
 
-tab_strategy, tab_monitor = st.tabs([
+tab_strategy, tab_monitor, tab_diag = st.tabs([
     "🚀 Strategy Pipeline", 
-    "⏱ Realtime Monitoring (4-Weeks)"
+    "⏱ Realtime Monitoring (4-Weeks)",
+    "🩺 Run Diagnostics"
 ])
 
 # ============================================================
@@ -56,8 +132,8 @@ with tab_strategy:
     # --- SIDEBAR FOR TAB 1 ---
     st.sidebar.header("📅 Strategy Controls")
     
-    # 1. Master Data Info
-    current_start, current_end = get_master_date_range()
+    # 1. Master Data Info (cached until the master manifest changes)
+    current_start, current_end = master_range()
     st.sidebar.markdown(f"**Master Range:** `{current_start}` to `{current_end}`")
     st.sidebar.divider()
 
@@ -89,8 +165,8 @@ with tab_strategy:
     # Convert UI date to Timestamp for backend
     ts_decision_date = pd.Timestamp(ui_decision_date)
     
-    # Calculate Entry Date (Next BDay)
-    ts_entry_date = ts_decision_date + pd.tseries.offsets.BDay(1)
+    # Calculate Entry Date (next exchange session, holidays skipped)
+    ts_entry_date = load_trading_calendar().next_session(ts_decision_date)
     
     st.sidebar.info(f"Auto Entry Date: {ts_entry_date.date()}")
     st.sidebar.divider()
@@ -98,7 +174,7 @@ with tab_strategy:
     # 4. Training Mode
     training_mode = st.sidebar.radio(
         "Model Strategy:",
-        ("Use Existing Pre-Trained Models", "Retrain & Save New Models"),
+        ("Use Existing Pre-Trained Models", "Retrain & Save New Models", "Incremental Update (Warm Start)"),
         index=0,
         key="rad_train"
     )
@@ -109,67 +185,31 @@ with tab_strategy:
     btn_run_pipeline = st.sidebar.button("▶ Run Strategy Pipeline")
     btn_perf_check = st.sidebar.button("📊 Run Performance Check")
 
+    # 6. Out-of-Sample Backtest (decision dates up to the UI date)
+    backtest_start = st.sidebar.date_input(
+        "Backtest From",
+        value=(ts_decision_date - pd.DateOffset(years=1)).date(),
+        key="bt_start"
+    )
+    btn_backtest = st.sidebar.button("🧪 Run Out-of-Sample Backtest")
+
     # --- MAIN CONTENT FOR TAB 1 ---
 
     if btn_run_pipeline:
-        st.subheader(f"🔄 Running Pipeline for Decision Date: {ui_decision_date}")
-
-        # 1. Download
-        if update_data_mode:
-            with st.spinner(f"Fetching {download_start_date} to {download_end_date}..."):
-                try:
-                    run_daily_data_pipeline(download_start_date, download_end_date)
-                    st.success("✔ Data downloaded & appended")
-                except Exception as e:
-                    st.error(f"Pipeline Error: {e}")
-                    st.stop()
-        
-        # 2. Clean
-        with st.spinner("Cleaning Data..."):
-            try:
-                df_clean = clean_corporate_events(MASTER_CSV)
-                st.success("✔ Cleaned")
-            except:
-                st.error("Master CSV missing."); st.stop()
-
-        # 3. Regime (Pass UI Date)
-        with st.spinner("Integrating Regimes..."):
-            df_regime = integrate_regimes(
-                df_clean, 
-                REGIME_TABLE, 
-                MACRO_MAP, 
-                cutoff_date=ts_decision_date # <--- UI Date Used
-            )
-            st.success("✔ Regimes Done")
-
-        # 4. Features
-        with st.spinner("Building Features..."):
-            df_feat = add_features(df_regime)
-            st.success("✔ Features Done")
-
-        # 5. Train (Pass UI Date)
-        if training_mode == "Retrain & Save New Models":
-            with st.spinner("Retraining..."):
-                train_df = df_feat[df_feat["DATE"] <= ts_decision_date] # <--- UI Date Used
-                train_and_save_models(train_df)
-                st.success("✔ Retrained")
-        
-        # 6. Trade (Pass UI Date)
-        with st.spinner("Generating Trades..."):
-            try:
-                trade_sheet = live_trade_decision(
-                    df_feat, 
-                    decision_date=ts_decision_date, # <--- UI Date Used
-                    entry_date=ts_entry_date        # <--- UI Date Used
-                )
-                st.success("🚀 Trades Generated")
-                st.dataframe(trade_sheet, use_container_width=True)
-                
-                out_file = f"{RESULTS_DIR}/LIVE_TRADES_{ts_entry_date.date()}.csv"
-                trade_sheet.to_csv(out_file, index=False)
-                st.info(f"Saved: {out_file}")
-            except Exception as e:
-                st.error(f"Trade Error: {e}")
+        # Runs in the background worker; an identical active job is shared
+        ensure_worker()
+        st.session_state.pipeline_job = submit_pipeline_job(
+            decision_date=ts_decision_date,                 # <--- UI Date Used
+            entry_date=ts_entry_date,                       # <--- UI Date Used
+            download=(download_start_date, download_end_date) if update_data_mode else None,
+            train_mode={
+                "Retrain & Save New Models": "full",
+                "Incremental Update (Warm Start)": "incremental"
+            }.get(training_mode),
+            profile_stage=st.session_state.get("sel_profile")   # set in Run Diagnostics
+        )
+
+    pipeline_job_panel()
 
     if btn_perf_check:
         st.subheader("📊 Performance Check")
@@ -181,22 +221,32 @@ with tab_strategy:
         except Exception as e:
             st.error(f"Performance Error: {e}")
 
+    if btn_backtest:
+        # Same background worker as the pipeline; the app stays responsive
+        ensure_worker()
+        st.session_state.backtest_job = submit_backtest_job(
+            backtest_start, ts_decision_date,
+            profile_stage=st.session_state.get("sel_profile")
+        )
+
+    backtest_job_panel()
+
     # --- STOCK VISUALIZER (MASTER DATA) ---
     st.divider()
     st.markdown("#### 📂 Master Data Visualizer")
     try:
-        df_m = pd.read_csv(MASTER_CSV, low_memory=False)
-        if "DATE1" in df_m.columns: df_m["D"] = pd.to_datetime(df_m["DATE1"])
-        else: df_m["D"] = pd.to_datetime(df_m["DATE"])
-        
-        syms = sorted(df_m["SYMBOL"].unique())
+        syms = symbols()
         col1, col2 = st.columns([1,3])
         with col1:
             sel = st.selectbox("Select Symbol (Master Data)", syms, key="sel_master")
         
         if sel:
-            d_sub = df_m[df_m["SYMBOL"]==sel].sort_values("D").set_index("D")["CLOSE_PRICE"]
-            st.line_chart(d_sub)
+            # This symbol's slices of the master shards, cached per symbol
+            d_sub = symbol_history(sel)
+            st.line_chart(d_sub.set_index("DATE1")["CLOSE_PRICE"])
+
+            with st.expander("View Raw Data"):
+                st.dataframe(d_sub, use_container_width=True)
     except:
         st.warning("Master CSV not available.")
 
@@ -222,6 +272,7 @@ with tab_monitor:
     # Initialize Session State for Data persistence
     if "monitor_df" not in st.session_state:
         st.session_state.monitor_df = None
+        st.session_state.monitor_rows = None
 
     if fetch_btn:
         ts_monitor = pd.Timestamp(monitor_date)
@@ -232,6 +283,9 @@ with tab_monitor:
                 
                 if not df_mon.empty:
                     st.session_state.monitor_df = df_mon
+                    # Row positions per symbol (frame is date-sorted), so
+                    # switching symbols is a take, not a full-frame filter
+                    st.session_state.monitor_rows = df_mon.groupby("SYMBOL", sort=True).indices
                     st.success(f"✔ Loaded {len(df_mon)} rows from {df_mon['DATE'].min().date()} to {df_mon['DATE'].max().date()}")
                 else:
                     st.warning("No data found for this range.")
@@ -244,7 +298,8 @@ with tab_monitor:
     if st.session_state.monitor_df is not None:
         df_real = st.session_state.monitor_df
         
-        all_syms_real = sorted(df_real["SYMBOL"].unique().tolist())
+        rows_real = st.session_state.monitor_rows
+        all_syms_real = list(rows_real)
         
         col_m1, col_m2 = st.columns([1,3])
         with col_m1:
@@ -256,7 +311,7 @@ with tab_monitor:
         
         if sel_sym_real:
             # Filter
-            subset = df_real[df_real["SYMBOL"] == sel_sym_real].sort_values("DATE")
+            subset = df_real.iloc[rows_real[sel_sym_real]]
             
             # Plot
             st.subheader(f"Price Trend: {sel_sym_real}")
@@ -267,4 +322,55 @@ with tab_monitor:
             with st.expander("View Raw Data"):
                 st.dataframe(subset, use_container_width=True)
     else:
-        st.info("👈 Select a date and click Fetch to start monitoring.")
\ No newline at end of file
+        st.info("👈 Select a date and click Fetch to start monitoring.")
+
+# ============================================================
+# TAB 3: RUN DIAGNOSTICS
+# ============================================================
+
+with tab_diag:
+    st.header("🩺 Run Diagnostics")
+    st.markdown(f"Wall / CPU time, peak RSS and rows per stage, from `{LOG_FILE}`.")
+
+    n_runs = st.slider("Runs to show", 5, 100, 20, key="diag_runs")
+    metrics = load_run_metrics(n_runs)
+
+    stage_names = {f"pipeline.{s}" for s in STAGES}
+    if not metrics.empty:
+        stage_names |= set(metrics["stage"])
+    st.selectbox(
+        "Profile Stage in Next Pipeline Run (cProfile + tracemalloc)",
+        [None] + sorted(stage_names),
+        format_func=lambda s: s or "(off)",
+        key="sel_profile"
+    )
+
+    if metrics.empty:
+        st.info("No runs logged yet. Run the pipeline, a performance check or a backtest.")
+    else:
+        runs = summarize_runs(metrics)
+        st.subheader("Run History")
+        st.dataframe(runs.iloc[::-1], use_container_width=True)
+
+        # Run-over-run wall time per stage (runs in start order)
+        history = metrics.pivot_table(index="run", columns="stage", values="wall_s", aggfunc="sum")
+        history = history.reindex(runs["run"])
+        top_stages = sorted(set(metrics.loc[metrics["depth"] == 0, "stage"]))
+        shown = st.multiselect("Stages", list(history.columns), default=top_stages, key="diag_stages")
+        if shown:
+            st.line_chart(history[shown])
+
+        st.subheader("Run Detail")
+        sel_run = st.selectbox("Run", list(runs["run"].iloc[::-1]), key="diag_run")
+        one = metrics[metrics["run"] == sel_run].copy()
+        one["stage"] = ["↳ " * d + s for d, s in zip(one["depth"], one["stage"])]
+
+        cols = ["stage", "status", "wall_s", "cpu_s", "thread_cpu_s", "rows", "peak_rss_mb", "peak_rss_growth_mb", "error"]
+        st.dataframe(one[[c for c in cols if c in one]], use_container_width=True)
+        st.bar_chart(one[one["depth"] == 0].set_index("stage")["wall_s"])
+
+        for path in one.get("profile", pd.Series(dtype=object)).dropna():
+            if os.path.exists(path):
+                with st.expander(f"Profile: {os.path.basename(path)}"):
+                    with open(path, encoding="utf-8") as f:
+                        st.code(f.read())
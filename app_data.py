@@ -0,0 +1,66 @@
+# ============================================================
+# app_data.py
+# Master reads of one app rerun, cached across reruns and sessions
+# ============================================================
+
+import os
+
+import streamlit as st
+import pandas as pd
+
+from config import (
+    MASTER_STORE_DIR,
+    SYMBOL_HISTORY_DIR
+)
+from data_pipeline import get_master_date_range
+from master_store import master_symbols, master_manifest_path
+from symbol_history import load_symbol_history
+
+# ------------------------------------------------------------
+# CACHE KEYS
+# ------------------------------------------------------------
+# Every Streamlit rerun re-executes app.py top to bottom. The reads
+# below go through st.cache_data with the master manifest's mtime in
+# the key: the manifest is the store's single commit point, so a rerun
+# costs one stat while the master is unchanged and the first rerun
+# after an append misses and re-reads. Cached values are copied out
+# per call, so a session cannot modify another session's frame.
+
+HISTORY_ENTRIES = 32   # symbol charts kept (one per selected symbol)
+
+
+def master_stamp(store_dir: str = MASTER_STORE_DIR):
+    """mtime of the committed master manifest; None before the first write."""
+    path = master_manifest_path(store_dir)
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+
+@st.cache_data(show_spinner=False)
+def _master_range(store_dir: str, stamp):
+    return get_master_date_range(store_dir)
+
+
+@st.cache_data(show_spinner=False)
+def _symbols(store_dir: str, stamp) -> list:
+    return sorted(master_symbols(store_dir))
+
+
+@st.cache_data(show_spinner=False, max_entries=HISTORY_ENTRIES)
+def _symbol_history(symbol: str, store_dir: str, history_dir: str, stamp) -> pd.DataFrame:
+    return load_symbol_history(symbol, history_dir=history_dir, master_dir=store_dir)
+
+
+def master_range(store_dir: str = MASTER_STORE_DIR):
+    """("dd-Mon-yyyy", "dd-Mon-yyyy") first / last master date."""
+    return _master_range(store_dir, master_stamp(store_dir))
+
+
+def symbols(store_dir: str = MASTER_STORE_DIR) -> list:
+    """Sorted master symbol universe."""
+    return _symbols(store_dir, master_stamp(store_dir))
+
+
+def symbol_history(symbol: str, store_dir: str = MASTER_STORE_DIR,
+                   history_dir: str = SYMBOL_HISTORY_DIR) -> pd.DataFrame:
+    """All master rows of `symbol`, sorted by date."""
+    return _symbol_history(symbol, store_dir, history_dir, master_stamp(store_dir))
@@ -0,0 +1,311 @@
+# ============================================================
+# backtest_engine.py
+# Out-of-sample backtest of the champion–challenger strategy
+# ============================================================
+
+import os
+import json
+import shutil
+import hashlib
+import warnings
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    FEATURES,
+    TOP_K,
+    HOLDING_DAYS,
+    MIN_TRAIN_ROWS,
+    TRAIN_TREE_METHOD,
+    PRICE_PANEL_DIR,
+    BACKTEST_FILE,
+    BACKTEST_RETRAIN_SESSIONS,
+    BACKTEST_MODEL_DIR
+)
+from store_io import write_json_atomic
+from price_panel import load_price_panel
+from feature_store import load_features
+from model_engine import XGB_PARAMS, train_and_save_models
+from model_registry import load_models, model_versions
+from run_metrics import timed
+
+# ------------------------------------------------------------
+# RULES (same as trade_engine + performance_engine)
+# ------------------------------------------------------------
+# Decision date D, master trading dates d[0..n]:
+#   snapshot   feature rows on D with all FEATURES present
+#   per model  top-K by (pred desc, SYMBOL asc); score = mean pred
+#   champion   highest score, first model in registry order on ties
+#   entry      d[i+1], exit d[i+HOLDING_DAYS], prices = AVG_PRICE
+#              averaged per base symbol (_PRE/_POST stripped)
+#   universe   every base symbol with a row on both entry and exit
+#
+# Walk-forward: the decision dates are cut into windows of
+# BACKTEST_RETRAIN_SESSIONS dates. At the first date W of a window the
+# macro models are refit the way the pipeline's train step does as of
+# W (every macro group, feature rows up to W), and only they score the
+# window. Targets look HOLDING_DAYS sessions ahead and are computed
+# inside the rows up to W, so the last labelled row is
+# d[w - HOLDING_DAYS]: no training target uses a price after W. Every
+# date is therefore picked exactly as a user who retrained at W and
+# traded the following sessions would have.
+#
+# <BACKTEST_MODEL_DIR>/<W>/ keeps each window's models, stamped with a
+# hash of its training rows and training config, so a rerun over the
+# same data retrains nothing. Windows where no macro group has
+# MIN_TRAIN_ROWS labelled rows are skipped.
+
+SNAPSHOT_FILE = "_snapshot.json"
+
+SUMMARY_COLUMNS = [
+    "decision_date", "entry_date", "exit_date", "champion", "n_universe",
+    "universe_mean", "universe_median", "model_mean", "model_median",
+    "alpha_mean", "alpha_median", "universe_win_rate", "model_win_rate",
+    "symbols"
+]
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def _base_symbol(s: pd.Series) -> pd.Series:
+    return s.str.replace(r"_(POST|PRE)$", "", regex=True)
+
+
+def _masked_stats(r: np.ndarray, mask: np.ndarray):
+    """Row-wise mean / median / win rate of r over mask (NaN returns count as losses)."""
+    vals = np.where(mask, r, np.nan)
+    n = mask.sum(axis=1)
+    # All-NaN rows (no picks priced) just give NaN
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(vals, axis=1)
+        median = np.nanmedian(vals, axis=1)
+        win = np.where(n > 0, ((vals > 0) & mask).sum(axis=1) / n, np.nan)
+    return mean, median, win, n
+
+# ============================================================
+# VECTORIZED PICKS
+# ============================================================
+
+def _picks(snap: pd.DataFrame, models: dict):
+    """
+    Champion per decision date and its top-K row positions in `snap`.
+    All dates are scored in one inplace_predict per model. Dates no
+    model produced a finite score for get no champion and are dropped.
+    """
+    X = np.ascontiguousarray(snap[FEATURES].to_numpy(dtype=np.float32))
+    date_codes, dates = pd.factorize(snap["DATE"], sort=True)
+    sym_codes = pd.factorize(snap["SYMBOL"], sort=True)[0]
+    n_dates = len(dates)
+
+    scores = np.full((n_dates, len(models)), -np.inf)
+    chosen = []
+
+    for j, (key, model) in enumerate(models.items()):
+        pred = model.get_booster().inplace_predict(X)
+
+        # Sort by date, then pred desc, then symbol; rank within date
+        order = np.lexsort((sym_codes, -pred, date_codes))
+        d = date_codes[order]
+        first = np.searchsorted(d, np.arange(n_dates))
+        rank = np.arange(len(order)) - first[d]
+        top = order[rank < TOP_K]
+
+        sums = pd.Series(pred[top]).groupby(date_codes[top]).mean()
+        scores[sums.index.to_numpy(), j] = sums.to_numpy()
+        chosen.append(top)
+
+    scores[~np.isfinite(scores)] = -np.inf
+    scored = np.isfinite(scores).any(axis=1)
+    if not scored.all():
+        print(f"⚠️ Backtest: no model scored {(~scored).sum()} decision date(s); dropped")
+
+    champion = np.argmax(scores, axis=1)
+    keys = list(models)
+
+    rows = []
+    for j, top in enumerate(chosen):
+        keep = (champion[date_codes[top]] == j) & scored[date_codes[top]]
+        rows.append(top[keep])
+    rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+
+    return dates[scored], np.array([keys[c] for c in champion[scored]]), rows
+
+# ============================================================
+# BLOCK (ONE PROCESS)
+# ============================================================
+
+def _backtest_block(job) -> pd.DataFrame:
+    snap, decisions, model_dir, panel_dir = job
+
+    models = load_models(model_dir)
+    if not models:
+        raise RuntimeError(f"❌ No trained models found in {model_dir}")
+
+    panel = load_price_panel(panel_dir)
+
+    snap = snap[snap["DATE"].isin(decisions)].dropna(subset=FEATURES).reset_index(drop=True)
+    if snap.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    dates, champions, rows = _picks(snap, models)
+    if len(dates) == 0:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    # Entry / exit on the master calendar, returns from the price panel
+    pos = np.searchsorted(panel.dates, dates.to_numpy())
+    entry = panel.dates[pos + 1]
+    exit_ = panel.dates[pos + HOLDING_DAYS]
+    r, in_both = panel.returns(pos + 1, pos + HOLDING_DAYS)
+
+    # Champion picks as a date x base-symbol mask
+    picked = np.zeros_like(in_both)
+    pick_dates = pd.Index(dates).get_indexer(snap["DATE"].iloc[rows])
+    pick_syms = pd.Index(panel.base_symbols).get_indexer(_base_symbol(snap["SYMBOL"].iloc[rows]))
+    ok = pick_syms >= 0
+    picked[pick_dates[ok], pick_syms[ok]] = True
+
+    u_mean, u_median, u_win, n_u = _masked_stats(r, in_both)
+    m_mean, m_median, m_win, _ = _masked_stats(r, in_both & picked)
+
+    symbols = (
+        snap.iloc[rows]
+        .assign(_d=pick_dates)
+        .groupby("_d")["SYMBOL"]
+        .agg(lambda s: "|".join(sorted(s)))
+        .reindex(range(len(dates)))
+    )
+
+    return pd.DataFrame({
+        "decision_date": dates,
+        "entry_date": entry,
+        "exit_date": exit_,
+        "champion": champions,
+        "n_universe": n_u,
+        "universe_mean": u_mean,
+        "universe_median": u_median,
+        "model_mean": m_mean,
+        "model_median": m_median,
+        "alpha_mean": m_mean - u_mean,
+        "alpha_median": m_median - u_median,
+        "universe_win_rate": u_win,
+        "model_win_rate": m_win,
+        "symbols": symbols.to_numpy()
+    })
+
+# ============================================================
+# WALK-FORWARD MODEL SNAPSHOTS
+# ============================================================
+
+def _training_key(train: pd.DataFrame) -> str:
+    """Hash of the rows a window trains on and of the training config."""
+    cols = ["SYMBOL", "DATE", "CLOSE_PRICE", "macro_group"] + FEATURES
+    rows = pd.util.hash_pandas_object(train[cols], index=False).to_numpy()
+    config = json.dumps(
+        [FEATURES, HOLDING_DAYS, MIN_TRAIN_ROWS, XGB_PARAMS, TRAIN_TREE_METHOD],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(config.encode() + rows.tobytes()).hexdigest()
+
+
+def _window_models(df_feat: pd.DataFrame, as_of, snapshot_dir: str) -> str:
+    """
+    Model directory of the window starting at `as_of`: models trained on
+    the feature rows up to `as_of`, reused while those rows are unchanged.
+    """
+    as_of = pd.Timestamp(as_of)
+    train = df_feat[df_feat["DATE"] <= as_of]
+    key = _training_key(train)
+
+    model_dir = os.path.join(snapshot_dir, str(as_of.date()))
+    stamp = os.path.join(model_dir, SNAPSHOT_FILE)
+    if os.path.exists(stamp):
+        with open(stamp) as f:
+            if json.load(f).get("key") == key:
+                return model_dir
+
+    shutil.rmtree(model_dir, ignore_errors=True)
+    os.makedirs(model_dir)
+    print(f"--- walk-forward window {as_of.date()}: training on {len(train)} rows ---")
+    report = train_and_save_models(train_df=train, model_dir=model_dir, mode="full")
+    write_json_atomic(stamp, {
+        "key": key,
+        "as_of": str(as_of.date()),
+        "macro_groups": int(len(report))
+    })
+    return model_dir
+
+# ============================================================
+# RUN BACKTEST
+# ============================================================
+
+@timed("backtest", rows=len)
+def run_backtest(start, end, processes: int = 1,
+                 df_feat: pd.DataFrame = None, save: bool = True,
+                 retrain_every: int = BACKTEST_RETRAIN_SESSIONS,
+                 snapshot_dir: str = BACKTEST_MODEL_DIR) -> pd.DataFrame:
+    """
+    Walk-forward backtest over every master trading date in [start, end]
+    that has HOLDING_DAYS of future data (see RULES). Features are read
+    once (feature store unless `df_feat` is given, which must reach back
+    to the start of the history); models are refit every `retrain_every`
+    decision dates, and the windows are scored across `processes`.
+    Returns one row per decision date.
+    """
+    start, end = pd.to_datetime(start), pd.to_datetime(end)
+
+    master_dates = load_price_panel().dates
+
+    last_ok = master_dates[-HOLDING_DAYS - 1] if len(master_dates) > HOLDING_DAYS else None
+    decisions = master_dates[
+        (master_dates >= np.datetime64(start)) & (master_dates <= np.datetime64(end))
+    ]
+    if last_ok is not None:
+        decisions = decisions[decisions <= last_ok]
+    else:
+        decisions = decisions[:0]
+
+    if len(decisions) == 0:
+        raise RuntimeError("❌ No decision dates with enough future data in range")
+
+    if df_feat is None:
+        df_feat = load_features(as_of=decisions[-1])
+    snap = df_feat[["SYMBOL", "DATE"] + FEATURES]
+
+    # Training is sequential (each fit already uses the core budget);
+    # windows are scored in parallel. Workers map the same panel files
+    # instead of receiving prices.
+    jobs = []
+    for i in range(0, len(decisions), max(1, retrain_every)):
+        window = decisions[i:i + max(1, retrain_every)]
+        model_dir = _window_models(df_feat, window[0], snapshot_dir)
+        if not model_versions(model_dir):
+            print(f"⚠️ Backtest: no macro group has {MIN_TRAIN_ROWS} training rows by "
+                  f"{pd.Timestamp(window[0]).date()}; skipping {len(window)} decision date(s)")
+            continue
+        jobs.append((snap[snap["DATE"].between(window[0], window[-1])], window, model_dir, PRICE_PANEL_DIR))
+
+    if not jobs:
+        raise RuntimeError("❌ No walk-forward window in range has enough training rows")
+
+    workers = max(1, min(processes, len(jobs)))
+    if workers == 1:
+        parts = [_backtest_block(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            parts = list(pool.map(_backtest_block, jobs))
+
+    result = pd.concat(parts, ignore_index=True)
+
+    if save:
+        out = BACKTEST_FILE(start.date(), end.date())
+        result.to_csv(out, index=False)
+        print(f"✅ Backtest saved: {out}")
+
+    print(f"✅ Backtest: {len(result)} decision dates over {len(jobs)} walk-forward windows, "
+          f"mean alpha {result['alpha_mean'].mean():.4%}")
+    return result
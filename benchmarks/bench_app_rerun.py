@@ -0,0 +1,117 @@
+# ============================================================
+# benchmarks/bench_app_rerun.py
+# Data work of one Streamlit rerun: master CSV re-reads vs app caches
+#
+#   python -m benchmarks.bench_app_rerun [n_symbols] [n_years]
+# ============================================================
+
+import os
+import sys
+import time
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import app_data
+from master_store import write_master, append_master, export_master_csv
+from trading_calendar import load_trading_calendar
+from benchmarks.synthetic import make_master
+
+REPEATS = 5
+
+# st.cache_data outside `streamlit run` warns on every first call
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+# ============================================================
+# ONE RERUN
+# ============================================================
+# Each rerun shows the master range, derives the entry date from the
+# decision date, lists the master symbols and charts the selected one.
+# legacy_rerun is what app.py did before the store (two CSV parses);
+# cached_rerun makes the same calls app.py makes now.
+
+def legacy_rerun(csv_path: str, symbol: str, decision):
+    df = pd.read_csv(csv_path, usecols=["DATE1"])
+    df["DATE1"] = pd.to_datetime(df["DATE1"])
+    master_range = df["DATE1"].min().strftime("%d-%b-%Y"), df["DATE1"].max().strftime("%d-%b-%Y")
+
+    entry = pd.Timestamp(decision) + pd.tseries.offsets.BDay(1)
+
+    df_m = pd.read_csv(csv_path, low_memory=False)
+    df_m["D"] = pd.to_datetime(df_m["DATE1"])
+    syms = sorted(df_m["SYMBOL"].unique())
+    chart = df_m[df_m["SYMBOL"] == symbol].sort_values("D").set_index("D")["CLOSE_PRICE"]
+    return master_range, entry, syms, chart
+
+
+def cached_rerun(store_dir: str, history_dir: str, symbol: str, decision):
+    master_range = app_data.master_range(store_dir)
+
+    entry = load_trading_calendar(store_dir).next_session(decision)
+
+    syms = app_data.symbols(store_dir)
+    chart = app_data.symbol_history(symbol, store_dir, history_dir).set_index("DATE1")["CLOSE_PRICE"]
+    return master_range, entry, syms, chart
+
+
+def _best_of(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _check(r, ref):
+    assert r[0] == ref[0], "master range differs"
+    assert list(r[2]) == list(ref[2]), "symbol list differs"
+    np.testing.assert_array_equal(r[3].to_numpy(), ref[3].to_numpy())
+    np.testing.assert_array_equal(r[3].index.to_numpy(), ref[3].index.to_numpy())
+
+# ============================================================
+# RUN
+# ============================================================
+
+def main(n_symbols: int = 200, n_years: float = 10):
+    df = make_master(n_symbols, n_years)
+    last = df["DATE1"].max()
+    base, new_day = df[df["DATE1"] < last], df[df["DATE1"] == last]
+
+    symbol = sorted(df["SYMBOL"].unique())[0]
+    decision = base["DATE1"].max()
+
+    with tempfile.TemporaryDirectory() as root:
+        store_dir = os.path.join(root, "master")
+        history_dir = os.path.join(root, "history")
+        csv_path = os.path.join(root, "master.csv")
+        write_master(base, store_dir)
+        export_master_csv(csv_path, store_dir)
+
+        t_legacy = _best_of(lambda: legacy_rerun(csv_path, symbol, decision))
+
+        t0 = time.perf_counter()
+        cached_rerun(store_dir, history_dir, symbol, decision)
+        t_cold = time.perf_counter() - t0
+        t_warm = _best_of(lambda: cached_rerun(store_dir, history_dir, symbol, decision))
+
+        # Pipeline appends a day: the first rerun after it misses the caches
+        append_master(new_day, store_dir)
+        t0 = time.perf_counter()
+        r = cached_rerun(store_dir, history_dir, symbol, decision)
+        t_invalidated = time.perf_counter() - t0
+
+        export_master_csv(csv_path, store_dir)
+        _check(r, legacy_rerun(csv_path, symbol, decision))
+
+    print(f"{n_symbols} symbols x {n_years} years, {len(df):,} rows, best of {REPEATS}")
+    print(f"  legacy rerun (master CSV reads) : {t_legacy * 1e3:9.2f} ms")
+    print(f"  cached rerun, first             : {t_cold * 1e3:9.2f} ms  (symbol index + shard decode)")
+    print(f"  cached rerun, warm              : {t_warm * 1e3:9.2f} ms  (st.cache_data hits)")
+    print(f"  first rerun after an append     : {t_invalidated * 1e3:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*[float(a) if i else int(a) for i, a in enumerate(sys.argv[1:3])])
@@ -0,0 +1,92 @@
+# ============================================================
+# benchmarks/bench_feature_engineer.py
+# Grouped-kernel features vs the legacy per-symbol apply
+#
+#   python -m benchmarks.bench_feature_engineer
+# ============================================================
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import FEATURES
+from corporate_cleaner import clean_corporate_frame
+from feature_engineer import add_features
+from benchmarks.synthetic import make_master
+
+# F&O universe vs the whole cash market, 10 years each
+SCALES = {
+    "fno": dict(n_symbols=200, n_years=10),
+    "full_market": dict(n_symbols=2000, n_years=10),
+}
+
+# ============================================================
+# LEGACY REFERENCE (groupby.apply of a per-symbol function)
+# ============================================================
+
+def legacy_add_features(df: pd.DataFrame) -> pd.DataFrame:
+
+    def build_features(g):
+
+        g = g.sort_values("DATE")
+
+        g["ret_1"]  = g["CLOSE_PRICE"].pct_change(1)
+        g["ret_3"]  = g["CLOSE_PRICE"].pct_change(3)
+        g["ret_5"]  = g["CLOSE_PRICE"].pct_change(5)
+        g["ret_10"] = g["CLOSE_PRICE"].pct_change(10)
+
+        g["vol_5"]  = g["CLOSE_PRICE"].pct_change().rolling(5).std()
+        g["vol_10"] = g["CLOSE_PRICE"].pct_change().rolling(10).std()
+
+        g["range"] = (
+            (g["HIGH_PRICE"] - g["LOW_PRICE"]) / g["CLOSE_PRICE"]
+        )
+
+        g["vol_z"] = (
+            (g["TTL_TRD_QNTY"] - g["TTL_TRD_QNTY"].rolling(20).mean()) /
+            g["TTL_TRD_QNTY"].rolling(20).std()
+        )
+
+        g["deliv_z"] = (
+            (g["DELIV_PER"] - g["DELIV_PER"].rolling(20).mean()) /
+            g["DELIV_PER"].rolling(20).std()
+        )
+
+        return g
+
+    # Same as groupby(...).apply(build_features) with group_keys=False,
+    # but keeps SYMBOL on pandas versions that exclude grouping columns
+    return pd.concat(
+        [build_features(g) for _, g in df.groupby("SYMBOL")],
+        ignore_index=True
+    )
+
+# ============================================================
+# RUN
+# ============================================================
+
+def _timed(fn, df):
+    t0 = time.perf_counter()
+    out = fn(df)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    for name, scale in SCALES.items():
+        df = clean_corporate_frame(make_master(**scale))
+
+        new, t_new = _timed(add_features, df)
+        old, t_old = _timed(legacy_add_features, df)
+
+        pd.testing.assert_frame_equal(new, old, check_exact=True)
+
+        diff = np.nanmax(np.abs(new[FEATURES].to_numpy() - old[FEATURES].to_numpy()))
+        print(f"[{name}] {len(df):,} rows, {df['SYMBOL'].nunique()} symbols")
+        print(f"  legacy apply    : {t_old:7.2f}s")
+        print(f"  grouped kernels : {t_new:7.2f}s")
+        print(f"  speedup         : {t_old / t_new:7.1f}x  (max |diff| {diff:.1e})")
+
+
+if __name__ == "__main__":
+    main()
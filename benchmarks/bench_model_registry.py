@@ -0,0 +1,108 @@
+# ============================================================
+# benchmarks/bench_model_registry.py
+# Model load time: joblib pickle vs native UBJSON / JSON vs warm registry
+#
+#   python -m benchmarks.bench_model_registry [repeats]
+# ============================================================
+
+import os
+import sys
+import time
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from config import FEATURES
+from model_engine import XGB_PARAMS
+from model_registry import save_model, load_models
+
+N_MACROS = 4
+N_ROWS = 20_000
+
+# ============================================================
+# FIXTURE
+# ============================================================
+
+def _train(seed: int) -> xgb.XGBRegressor:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(N_ROWS, len(FEATURES)))
+    y = X @ rng.normal(size=len(FEATURES)) * 0.01 + rng.normal(scale=0.02, size=N_ROWS)
+
+    model = xgb.XGBRegressor(**XGB_PARAMS)
+    model.fit(pd.DataFrame(X, columns=FEATURES), y)
+    return model
+
+# ============================================================
+# LOADERS
+# ============================================================
+
+def _load_joblib(d):
+    return {f: joblib.load(os.path.join(d, f)) for f in os.listdir(d) if f.endswith(".joblib")}
+
+
+def _load_native(d, ext):
+    out = {}
+    for f in os.listdir(d):
+        if f.endswith(f".{ext}") and not f.endswith(".meta.json"):
+            m = xgb.XGBRegressor()
+            m.load_model(os.path.join(d, f))
+            out[f] = m
+    return out
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+# ============================================================
+# RUN
+# ============================================================
+
+def main(repeats: int = 5):
+    models = [_train(seed) for seed in range(N_MACROS)]
+
+    with tempfile.TemporaryDirectory() as root:
+        dirs = {k: os.path.join(root, k) for k in ("joblib", "ubj", "json")}
+        for d in dirs.values():
+            os.makedirs(d)
+
+        for macro, m in enumerate(models):
+            joblib.dump(m, os.path.join(dirs["joblib"], f"macro_{float(macro)}.joblib"))
+            save_model(m, macro, {"features": list(FEATURES)}, dirs["ubj"], "ubj")
+            save_model(m, macro, {"features": list(FEATURES)}, dirs["json"], "json")
+
+        sizes = {
+            k: sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d) if not f.endswith(".meta.json"))
+            for k, d in dirs.items()
+        }
+
+        t_joblib = _best_of(lambda: _load_joblib(dirs["joblib"]), repeats)
+        t_ubj = _best_of(lambda: _load_native(dirs["ubj"], "ubj"), repeats)
+        t_json = _best_of(lambda: _load_native(dirs["json"], "json"), repeats)
+
+        load_models(dirs["ubj"])
+        t_warm = _best_of(lambda: load_models(dirs["ubj"]), repeats)
+
+        # Native round trip must reproduce the pickled model exactly
+        X = np.random.default_rng(99).normal(size=(1000, len(FEATURES)))
+        ref = _load_joblib(dirs["joblib"])
+        for f, m in _load_native(dirs["ubj"], "ubj").items():
+            a = ref[f.replace(".ubj", ".joblib")].predict(X)
+            assert np.array_equal(a, m.predict(X)), f
+
+    print(f"{N_MACROS} models x {XGB_PARAMS['n_estimators']} trees, best of {repeats}")
+    print(f"  joblib pickle : {t_joblib * 1e3:8.1f} ms  ({sizes['joblib'] / 1e6:5.2f} MB)")
+    print(f"  native json   : {t_json * 1e3:8.1f} ms  ({sizes['json'] / 1e6:5.2f} MB)")
+    print(f"  native ubj    : {t_ubj * 1e3:8.1f} ms  ({sizes['ubj'] / 1e6:5.2f} MB)")
+    print(f"  warm registry : {t_warm * 1e3:8.2f} ms  (stat-only revalidation)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
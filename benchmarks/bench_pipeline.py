@@ -0,0 +1,278 @@
+# ============================================================
+# benchmarks/bench_pipeline.py
+# Timed pipeline entry points on synthetic bhavcopies, saved as JSON
+#
+#   python -m benchmarks.bench_pipeline [--symbols N] [--years Y]
+#       [--events E] [--repeats R] [--out FILE] [--baseline FILE]
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import multiprocessing as mp
+from datetime import datetime
+
+import config
+from benchmarks.synthetic import make_master, write_bhavcopy_days
+
+SUITE_VERSION = 1
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+START = "2020-01-01"        # regime table coverage starts here
+NEW_DAYS = 5                # trailing days delivered as bhavcopy files
+OTHER_PER_SYMBOL = 4        # non-F&O symbols per master symbol in each file
+TRAIN_REPEATS = 1           # full refits dominate the suite; one per run
+TOLERANCE = 0.10            # slower than baseline by more than this = regression
+MIN_DELTA_S = 0.025         # ...and by at least this much (ms-scale cases are noisy)
+
+# ------------------------------------------------------------
+# SANDBOX
+# ------------------------------------------------------------
+# The entry points read and write the config locations (master store,
+# ledger, models, results, logs). The suite runs in a spawned process
+# that points every output location under PROJECT_ROOT at a temporary
+# directory before any engine module is imported; regime and holiday
+# files are still read from the repo.
+
+OUTPUT_DIRS = ["DATA_DIR", "MODEL_DIR", "RESULTS_DIR", "LOG_DIR"]
+
+
+def _sandbox(root: str):
+    prefixes = [getattr(config, name) for name in OUTPUT_DIRS]
+    for name, value in list(vars(config).items()):
+        if isinstance(value, str) and any(
+            value == p or value.startswith(p + os.sep) for p in prefixes
+        ):
+            setattr(config, name, os.path.join(root, os.path.relpath(value, config.PROJECT_ROOT)))
+    for name in OUTPUT_DIRS:
+        os.makedirs(getattr(config, name), exist_ok=True)
+
+# ============================================================
+# MEASURE
+# ============================================================
+
+def _measure(fn, repeats: int, setup=None):
+    """(last result, {"wall_s": [...], "cpu_s": [...]}) over `repeats` calls."""
+    wall, cpu, out = [], [], None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        t0, c0 = time.perf_counter(), time.process_time()
+        out = fn()
+        wall.append(round(time.perf_counter() - t0, 4))
+        cpu.append(round(time.process_time() - c0, 4))
+    return out, {"wall_s": wall, "cpu_s": cpu}
+
+
+def _case(runs: dict, rows: int) -> dict:
+    return {
+        **runs,
+        "best_s": min(runs["wall_s"]),
+        "median_s": statistics.median(runs["wall_s"]),
+        "rows": int(rows)
+    }
+
+# ============================================================
+# SUITE (runs inside the sandboxed process)
+# ============================================================
+
+def _run_suite(root: str, scale: dict, repeats: int, out_path: str):
+    _sandbox(root)
+
+    import pandas as pd
+    from config import REGIME_TABLE, MACRO_MAP, MASTER_CSV, CORPORATE_LEDGER, HOLDING_DAYS, LIVE_TRADES_FILE
+    from bhav_parser import parse_bhavcopies
+    from master_store import write_master
+    from data_pipeline import append_consolidated_bhavcopy_fno_only
+    from corporate_cleaner import clean_corporate_events
+    from regime_engine import integrate_regimes
+    from feature_engineer import add_features
+    from model_engine import train_and_save_models
+    from trade_engine import live_trade_decision
+    from trading_calendar import load_trading_calendar
+    from performance_engine import run_weekly_performance_check
+
+    master = make_master(scale["symbols"], scale["years"], n_events=scale["events"],
+                         n_bad_ticks=scale["events"], start=START, seed=scale["seed"])
+    dates = master["DATE1"].drop_duplicates().sort_values()
+    cut = dates.iloc[-NEW_DAYS]
+    base = master[master["DATE1"] < cut]
+
+    # The new days arrive as full-market files: F&O symbols plus others
+    other = make_master(scale["symbols"] * OTHER_PER_SYMBOL, scale["years"], n_events=0,
+                        n_bad_ticks=0, start=START, seed=scale["seed"] + 1, prefix="OTH")
+    new = pd.concat([master[master["DATE1"] >= cut], other[other["DATE1"] >= cut]], ignore_index=True)
+    paths = write_bhavcopy_days(new, os.path.join(root, "bhavcopies"))
+
+    results = {}
+
+    bhav, runs = _measure(lambda: parse_bhavcopies(paths), repeats)
+    results["parse_bhavcopies"] = _case(runs, len(bhav))
+
+    appended, runs = _measure(lambda: append_consolidated_bhavcopy_fno_only(bhav), repeats,
+                              setup=lambda: write_master(base))
+    results["append_consolidated_bhavcopy_fno_only"] = _case(runs, appended)
+
+    def _drop_ledger():
+        if os.path.exists(CORPORATE_LEDGER):
+            os.remove(CORPORATE_LEDGER)
+
+    cleaned, runs = _measure(lambda: clean_corporate_events(MASTER_CSV), repeats, setup=_drop_ledger)
+    results["clean_corporate_events"] = _case(runs, len(master))
+
+    cleaned, runs = _measure(lambda: clean_corporate_events(MASTER_CSV), repeats)
+    results["clean_corporate_events.warm_ledger"] = _case(runs, len(master))
+
+    decision = dates.iloc[-(HOLDING_DAYS + 2)]
+
+    regimed, runs = _measure(
+        lambda: integrate_regimes(cleaned.copy(), REGIME_TABLE, MACRO_MAP, cutoff_date=decision), repeats
+    )
+    results["integrate_regimes"] = _case(runs, len(regimed))
+
+    feats, runs = _measure(lambda: add_features(regimed.copy()), repeats)
+    results["add_features"] = _case(runs, len(feats))
+
+    train_df = feats[feats["DATE"] <= decision]
+    report, runs = _measure(lambda: train_and_save_models(train_df=train_df, mode="full"), TRAIN_REPEATS)
+    results["train_and_save_models"] = _case(runs, len(train_df))
+
+    entry = load_trading_calendar().next_session(decision)
+    trade, runs = _measure(lambda: live_trade_decision(feats, decision, entry), repeats)
+    results["live_trade_decision"] = _case(runs, (feats["DATE"] == decision).sum())
+    trade.to_csv(LIVE_TRADES_FILE(entry.date()), index=False)
+
+    # First call builds the price panel, later calls reuse it
+    _, runs = _measure(lambda: run_weekly_performance_check(decision), repeats)
+    results["run_weekly_performance_check"] = _case(runs, len(trade))
+
+    with open(out_path, "w") as f:
+        json.dump({
+            "rows": int(len(master)),
+            "new_day_rows": int(len(new)),
+            "macro_groups": int(len(report)),
+            "decision_date": str(decision.date()),
+            "results": results
+        }, f)
+
+# ============================================================
+# RESULTS
+# ============================================================
+
+def _environment() -> dict:
+    import numpy, pandas, pyarrow, xgboost
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=config.PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": {m.__name__: m.__version__ for m in (numpy, pandas, pyarrow, xgboost)}
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """
+    One row per case present in both runs: best wall time now vs in
+    the baseline and whether it slowed down past `tolerance` (and by
+    more than MIN_DELTA_S).
+    """
+    if current["scale"] != baseline["scale"]:
+        raise RuntimeError(f"❌ Baseline scale {baseline['scale']} differs from {current['scale']}")
+
+    rows = []
+    for name, case in current["results"].items():
+        ref = baseline["results"].get(name)
+        if ref is None:
+            continue
+        ratio = case["best_s"] / ref["best_s"] if ref["best_s"] else float("inf")
+        rows.append({
+            "case": name,
+            "baseline_s": ref["best_s"],
+            "current_s": case["best_s"],
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + tolerance and case["best_s"] - ref["best_s"] > MIN_DELTA_S
+        })
+    return rows
+
+# ============================================================
+# RUN
+# ============================================================
+
+def run(symbols: int = 100, years: float = 5, events: int = 10, seed: int = 42,
+        repeats: int = 3) -> dict:
+    """Runs the suite at one scale in a sandboxed process and returns the result document."""
+    scale = {"symbols": symbols, "years": years, "events": events, "seed": seed}
+
+    with tempfile.TemporaryDirectory() as root:
+        out_path = os.path.join(root, "suite.json")
+        proc = mp.get_context("spawn").Process(target=_run_suite, args=(root, scale, repeats, out_path))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            raise RuntimeError(f"❌ Benchmark suite failed (exit code {proc.exitcode})")
+        with open(out_path) as f:
+            suite = json.load(f)
+
+    return {
+        "suite_version": SUITE_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "scale": scale,
+        "repeats": repeats,
+        **_environment(),
+        **suite
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Pipeline benchmark suite on synthetic bhavcopies")
+    p.add_argument("--symbols", type=int, default=100)
+    p.add_argument("--years", type=float, default=5)
+    p.add_argument("--events", type=int, default=10, help="injected splits (and as many bad ticks)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--repeats", type=int, default=3)
+    p.add_argument("--out", help="result JSON (default: benchmarks/results/<scale>-<time>.json)")
+    p.add_argument("--baseline", help="earlier result JSON to compare against")
+    p.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = p.parse_args(argv)
+
+    doc = run(args.symbols, args.years, args.events, args.seed, args.repeats)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"pipeline_{args.symbols}s_{args.years:g}y_{args.events}e_{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(doc, f, indent=1)
+
+    print(f"{args.symbols} symbols x {args.years:g} years, {args.events} events: "
+          f"{doc['rows']:,} master rows, {doc['new_day_rows']:,} bhavcopy rows, best of {args.repeats}")
+    for name, case in doc["results"].items():
+        print(f"  {name:40s} {case['best_s'] * 1e3:10.1f} ms  (median {case['median_s'] * 1e3:.1f} ms, {case['rows']:,} rows)")
+    print(f"✅ Results saved: {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(doc, json.load(f), args.tolerance)
+        print(f"\nvs baseline {args.baseline} (tolerance {args.tolerance:.0%})")
+        for r in rows:
+            flag = "⚠️ REGRESSION" if r["regression"] else ""
+            print(f"  {r['case']:40s} {r['baseline_s'] * 1e3:10.1f} -> {r['current_s'] * 1e3:10.1f} ms  x{r['ratio']:.2f} {flag}")
+        if any(r["regression"] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
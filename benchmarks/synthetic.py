@@ -0,0 +1,117 @@
+# ============================================================
+# benchmarks/synthetic.py
+# Reproducible synthetic master data in the bhavcopy schema
+# ============================================================
+
+import os
+
+import numpy as np
+import pandas as pd
+
+BHAV_COLUMNS = [
+    "SYMBOL", "SERIES", "DATE1", "PREV_CLOSE",
+    "OPEN_PRICE", "HIGH_PRICE", "LOW_PRICE", "LAST_PRICE",
+    "CLOSE_PRICE", "AVG_PRICE", "TTL_TRD_QNTY", "TURNOVER_LACS",
+    "NO_OF_TRADES", "DELIV_QTY", "DELIV_PER"
+]
+
+TRADING_DAYS_PER_YEAR = 250
+
+# ============================================================
+# MASTER GENERATOR
+# ============================================================
+
+def make_master(n_symbols: int = 200, n_years: float = 10, n_events: int = 20,
+                n_bad_ticks: int = 20, start: str = "2015-01-01", seed: int = 42,
+                prefix: str = "SYM") -> pd.DataFrame:
+    """
+    Random-walk OHLCV panel for `n_symbols` over `n_years` of business
+    days. `n_events` symbols get a 1:2 split somewhere in the middle and
+    `n_bad_ticks` single-day spikes are injected, so the corporate-event
+    cleaner has real work to do.
+    """
+    rng = np.random.default_rng(seed)
+    n_days = int(n_years * TRADING_DAYS_PER_YEAR)
+    dates = pd.bdate_range(start, periods=n_days)
+
+    shape = (n_symbols, n_days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.018, shape), axis=1))
+    close *= rng.uniform(0.2, 20, (n_symbols, 1))
+
+    # Splits: price halves from a random day onwards
+    for s in rng.choice(n_symbols, size=min(n_events, n_symbols), replace=False):
+        k = rng.integers(30, max(31, n_days - 30))
+        close[s, k:] /= 2
+
+    # Bad ticks: one-day spike that reverts
+    for _ in range(n_bad_ticks):
+        s, k = rng.integers(0, n_symbols), rng.integers(1, n_days - 1)
+        close[s, k] *= 2.5
+
+    prev = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    spread = rng.uniform(0.002, 0.03, shape)
+    high = close * (1 + spread)
+    low = close * (1 - spread)
+    open_ = prev * (1 + rng.normal(0, 0.005, shape))
+    avg = (high + low + close) / 3
+
+    qty = rng.lognormal(12, 1, shape).round()
+    deliv_per = rng.uniform(10, 90, shape).round(2)
+
+    def flat(a):
+        return a.reshape(-1)
+
+    df = pd.DataFrame({
+        "SYMBOL": np.repeat([f"{prefix}{i:04d}" for i in range(n_symbols)], n_days),
+        "SERIES": "EQ",
+        "DATE1": np.tile(dates.values, n_symbols),
+        "PREV_CLOSE": flat(prev).round(2),
+        "OPEN_PRICE": flat(open_).round(2),
+        "HIGH_PRICE": flat(high).round(2),
+        "LOW_PRICE": flat(low).round(2),
+        "LAST_PRICE": flat(close).round(2),
+        "CLOSE_PRICE": flat(close).round(2),
+        "AVG_PRICE": flat(avg).round(2),
+        "TTL_TRD_QNTY": flat(qty),
+        "TURNOVER_LACS": flat(qty * avg / 1e5).round(2),
+        "NO_OF_TRADES": flat(qty // 20),
+        "DELIV_QTY": flat((qty * deliv_per / 100).round()),
+        "DELIV_PER": flat(deliv_per),
+    })
+
+    return df[BHAV_COLUMNS]
+
+# ============================================================
+# RAW BHAVCOPY FILES
+# ============================================================
+
+PRICE_COLUMNS = [
+    "PREV_CLOSE", "OPEN_PRICE", "HIGH_PRICE", "LOW_PRICE", "LAST_PRICE",
+    "CLOSE_PRICE", "AVG_PRICE", "TURNOVER_LACS", "DELIV_PER"
+]
+
+
+def write_bhavcopy_days(df: pd.DataFrame, out_dir: str) -> list:
+    """
+    Writes one sec_bhavdata_full CSV per DATE1 of `df`, formatted like
+    the NSE files in realtime/data: ", "-separated headers and values,
+    DD-Mon-YYYY dates, two-decimal prices. Returns the paths by date.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    text = pd.DataFrame({"SYMBOL": df["SYMBOL"], "SERIES": df["SERIES"]})
+    text["DATE1"] = pd.to_datetime(df["DATE1"]).dt.strftime("%d-%b-%Y")
+    for c in BHAV_COLUMNS[3:]:
+        text[c] = df[c].map("{:.2f}".format) if c in PRICE_COLUMNS else df[c].astype("int64").astype(str)
+
+    lines = text[BHAV_COLUMNS[0]].str.cat(text[BHAV_COLUMNS[1:]], sep=", ")
+    header = ", ".join(BHAV_COLUMNS)
+
+    paths = []
+    for day, rows in lines.groupby(pd.to_datetime(df["DATE1"]).to_numpy(), sort=True):
+        day = pd.Timestamp(day)
+        path = os.path.join(out_dir, f"{day:%d-%b-%Y}_sec_bhavdata_full_{day:%d%m%Y}.csv")
+        with open(path, "w") as f:
+            f.write(header + "\n" + "\n".join(rows) + "\n")
+        paths.append(path)
+    return paths
@@ -0,0 +1,253 @@
+# ============================================================
+# bhav_downloader.py
+# Concurrent NSE bhavcopy downloader (pooled session, retries)
+# ============================================================
+
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    DOWNLOAD_MAX_WORKERS,
+    DOWNLOAD_RATE_PER_SEC,
+    DOWNLOAD_RETRIES,
+    DOWNLOAD_BACKOFF_SEC
+)
+
+# ------------------------------------------------------------
+# NSE ENDPOINTS
+# ------------------------------------------------------------
+
+NSE_BASE_URL = "https://www.nseindia.com"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://www.nseindia.com/all-reports",
+}
+
+def report_url(date_str: str, base_url: str = NSE_BASE_URL) -> str:
+    return (
+        f"{base_url}/api/reports?"
+        "archives=[{\"name\":\"Full%20Bhavcopy%20and%20Security%20Deliverable%20data\","
+        "\"type\":\"daily-reports\",\"category\":\"capital-market\","
+        "\"section\":\"equities\"}]&"
+        f"date={date_str}&type=equities&mode=single"
+    )
+
+# Statuses worth another attempt; 401/403 usually mean the cookies
+# from the warm-up request went stale
+RETRY_STATUS = {401, 403, 429, 500, 502, 503, 504}
+REWARM_STATUS = {401, 403}
+
+REPORT_COLUMNS = ["date", "status", "path", "http_status", "attempts", "elapsed", "error"]
+
+# ============================================================
+# RATE LIMIT
+# ============================================================
+
+# One limiter per host for the whole process, so concurrent batches
+# (e.g. two app sessions refreshing at once) share the budget instead
+# of each spending the full rate. While batches overlap, the strictest
+# (slowest) of their rates applies to all of them.
+
+def _interval(rate_per_sec: float) -> float:
+    return 1.0 / rate_per_sec if rate_per_sec else 0.0
+
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate_per_sec: float):
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+        self.interval = _interval(rate_per_sec)
+        self.batches = []   # intervals requested by the batches running now
+
+    @contextmanager
+    def batch(self, rate_per_sec: float):
+        """Registers one batch's rate for as long as the batch runs."""
+        with self.lock:
+            self.batches.append(_interval(rate_per_sec))
+            self.interval = max(self.batches)
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.batches.remove(_interval(rate_per_sec))
+                if self.batches:
+                    self.interval = max(self.batches)
+
+    def wait(self) -> float:
+        """Blocks until this caller's slot; returns the slot (monotonic time)."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+        return slot
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(base_url: str) -> RateLimiter:
+    """The process-wide limiter of `base_url`."""
+    with _limiters_lock:
+        if base_url not in _limiters:
+            _limiters[base_url] = RateLimiter(DOWNLOAD_RATE_PER_SEC)
+        return _limiters[base_url]
+
+# ============================================================
+# SESSION
+# ============================================================
+
+def make_session(base_url: str = NSE_BASE_URL, pool_size: int = DOWNLOAD_MAX_WORKERS) -> requests.Session:
+    """One pooled session, cookie-warmed with a single homepage GET."""
+    s = requests.Session()
+    s.headers.update(HEADERS)
+
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+
+    warm_session(s, base_url)
+    return s
+
+
+def warm_session(s: requests.Session, base_url: str = NSE_BASE_URL):
+    try:
+        s.get(f"{base_url}/", timeout=10)
+    except requests.RequestException:
+        pass
+
+# ============================================================
+# SINGLE DATE (WITH RETRY)
+# ============================================================
+
+def _fetch_one(s, date_str, output_dir, base_url, limiter, retries, backoff, warm_lock):
+    url = report_url(date_str, base_url)
+    tmp_path = None
+    started = time.monotonic()
+    result = {
+        "date": date_str, "status": "error", "path": None,
+        "http_status": None, "attempts": 0, "elapsed": 0.0, "error": None
+    }
+
+    for attempt in range(retries + 1):
+        result["attempts"] = attempt + 1
+        limiter.wait()
+
+        try:
+            with s.get(url, stream=True, timeout=30) as resp:
+                result["http_status"] = resp.status_code
+
+                if resp.status_code == 404:
+                    result["status"] = "missing"
+                    result["error"] = None
+                    break
+
+                if resp.status_code in RETRY_STATUS:
+                    if resp.status_code in REWARM_STATUS:
+                        with warm_lock:
+                            warm_session(s, base_url)
+                    raise requests.HTTPError(f"HTTP {resp.status_code}", response=resp)
+
+                resp.raise_for_status()
+
+                fname = resp.headers.get("Content-Disposition", "bhav.zip").split("filename=")[-1].replace('"', "")
+                save_path = os.path.join(output_dir, f"{date_str}_{fname}")
+                tmp_path = f"{save_path}.part"
+
+                with open(tmp_path, "wb") as f:
+                    for chunk in resp.iter_content(64 * 1024):
+                        f.write(chunk)
+
+            if os.path.getsize(tmp_path) == 0:
+                os.remove(tmp_path)
+                result["status"] = "missing"
+                result["error"] = "empty response"
+                break
+
+            os.replace(tmp_path, save_path)
+            result["status"] = "ok"
+            result["path"] = save_path
+            result["error"] = None
+            break
+
+        except requests.RequestException as e:
+            result["error"] = str(e)
+            if attempt < retries:
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+
+        except OSError as e:
+            # Local write failed (disk full, permissions): retrying will
+            # not help, and the rest of the batch must still report
+            result["status"] = "error"
+            result["error"] = f"write failed: {e}"
+            break
+
+    # No half-written .part left behind by a failed write or a dropped stream
+    if result["status"] != "ok" and tmp_path is not None and os.path.isfile(tmp_path):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    result["elapsed"] = time.monotonic() - started
+    return result
+
+# ============================================================
+# BATCH DOWNLOAD
+# ============================================================
+
+def download_bhavcopies(
+    dates,
+    output_dir: str,
+    base_url: str = NSE_BASE_URL,
+    max_workers: int = DOWNLOAD_MAX_WORKERS,
+    rate_per_sec: float = DOWNLOAD_RATE_PER_SEC,
+    retries: int = DOWNLOAD_RETRIES,
+    backoff: float = DOWNLOAD_BACKOFF_SEC,
+    session: requests.Session = None
+) -> pd.DataFrame:
+    """
+    Downloads bhavcopies for `dates` ("%d-%b-%Y" strings or timestamps)
+    into `output_dir` over one shared session. Returns one report row per
+    date with status "ok", "missing" (no file published) or "error".
+    """
+    date_strs = [
+        d if isinstance(d, str) else pd.Timestamp(d).strftime("%d-%b-%Y")
+        for d in dates
+    ]
+    if not date_strs:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    own_session = session is None
+    s = session or make_session(base_url, max_workers)
+    warm_lock = threading.Lock()
+
+    try:
+        with rate_limiter(base_url).batch(rate_per_sec) as limiter:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(
+                    lambda d: _fetch_one(s, d, output_dir, base_url, limiter, retries, backoff, warm_lock),
+                    date_strs
+                ))
+    finally:
+        if own_session:
+            s.close()
+
+    return pd.DataFrame(results, columns=REPORT_COLUMNS)
@@ -0,0 +1,138 @@
+# ============================================================
+# bhav_parser.py
+# Typed bhavcopy parser with column pruning & universe pushdown
+# ============================================================
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+
+from config import (
+    PARSE_PROCESSES,
+    PARSE_POOL_MIN_FILES
+)
+from raw_cache import open_raw_csv
+from run_metrics import timed
+
+# ------------------------------------------------------------
+# SCHEMA (sec_bhavdata_full)
+# ------------------------------------------------------------
+# Headers and values carry a leading space (" SERIES", " EQ"); the
+# parser strips both so downstream stages see clean names. "-" marks
+# missing delivery data for non-EQ series.
+
+TEXT_COLUMNS = ["SYMBOL", "SERIES"]
+DATE_FORMATS = ["%d-%b-%Y", " %d-%b-%Y"]
+NULL_VALUES = ["-", " -", ""]
+
+BHAV_SCHEMA = {
+    "SYMBOL": pa.string(),
+    "SERIES": pa.string(),
+    "DATE1": pa.timestamp("ns"),
+    "PREV_CLOSE": pa.float64(),
+    "OPEN_PRICE": pa.float64(),
+    "HIGH_PRICE": pa.float64(),
+    "LOW_PRICE": pa.float64(),
+    "LAST_PRICE": pa.float64(),
+    "CLOSE_PRICE": pa.float64(),
+    "AVG_PRICE": pa.float64(),
+    "TTL_TRD_QNTY": pa.float64(),
+    "TURNOVER_LACS": pa.float64(),
+    "NO_OF_TRADES": pa.float64(),
+    "DELIV_QTY": pa.float64(),
+    "DELIV_PER": pa.float64(),
+}
+
+# ============================================================
+# SINGLE FILE
+# ============================================================
+
+def _header(f) -> list:
+    line = f.readline().decode("utf-8-sig")
+    return [c.strip().upper() for c in line.strip().split(",")]
+
+
+def parse_bhavcopy(path: str, usecols=None, symbols=None, series=None) -> pd.DataFrame:
+    """
+    Parses one raw bhavcopy (CSV or zip) into the typed schema.
+    Rows outside `symbols` / `series` are dropped in Arrow, before any
+    pandas objects are built.
+    """
+    with open_raw_csv(path) as f:
+        names = _header(f)
+        body = f.read()
+
+    keep = names if usecols is None else [c for c in names if c in set(usecols)]
+    include = list(keep)
+    if symbols is not None and "SYMBOL" not in include:
+        include.append("SYMBOL")
+    if series is not None and "SERIES" not in include:
+        include.append("SERIES")
+
+    table = pacsv.read_csv(
+        pa.BufferReader(body),
+        read_options=pacsv.ReadOptions(column_names=names),
+        convert_options=pacsv.ConvertOptions(
+            column_types={c: t for c, t in BHAV_SCHEMA.items() if c in names},
+            include_columns=include,
+            null_values=NULL_VALUES,
+            strings_can_be_null=True,
+            timestamp_parsers=DATE_FORMATS
+        )
+    )
+
+    for c in TEXT_COLUMNS:
+        if c in table.column_names:
+            idx = table.column_names.index(c)
+            table = table.set_column(idx, c, pc.utf8_trim_whitespace(table[c]))
+
+    mask = None
+    if symbols is not None:
+        mask = pc.is_in(table["SYMBOL"], value_set=pa.array(list(symbols), pa.string()))
+    if series is not None:
+        m = pc.is_in(table["SERIES"], value_set=pa.array(list(series), pa.string()))
+        mask = m if mask is None else pc.and_(mask, m)
+    if mask is not None:
+        table = table.filter(mask)
+
+    return table.select(keep).to_pandas()
+
+# ============================================================
+# MANY FILES (PROCESS POOL)
+# ============================================================
+
+def _parse_job(args):
+    path, usecols, symbols, series = args
+    try:
+        return parse_bhavcopy(path, usecols, symbols, series)
+    except Exception as e:
+        print(f"Skipping unreadable bhavcopy {path}: {e}")
+        return None
+
+
+@timed("parse", rows=len)
+def parse_bhavcopies(paths, usecols=None, symbols=None, series=None,
+                     processes: int = PARSE_PROCESSES) -> pd.DataFrame:
+    """Parses a batch of day files, spread over a process pool when worthwhile."""
+    paths = list(paths)
+    if not paths:
+        return pd.DataFrame()
+
+    symbols = sorted(symbols) if symbols is not None else None
+    series = sorted(series) if series is not None else None
+    jobs = [(p, usecols, symbols, series) for p in paths]
+
+    if processes and processes > 1 and len(paths) >= PARSE_POOL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=min(processes, len(paths))) as pool:
+            frames = list(pool.map(_parse_job, jobs))
+    else:
+        frames = [_parse_job(j) for j in jobs]
+
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return pd.DataFrame()
+
+    return pd.concat(frames, ignore_index=True)
@@ -45,19 +45,88 @@ MASTER_CSV = os.path.join(
     DATA_DIR, "FNO_Combined_Updated_recent_1.csv"
 )
 
+# Columnar, month-partitioned store that serves reads of MASTER_CSV.
+# The CSV itself is only the migration source / compatibility export.
+MASTER_STORE_DIR = os.path.join(
+    DATA_DIR, "master_store"
+)
+
 CONSOLIDATED_BHAVCOPY = os.path.join(
     DATA_DIR, "consolidated_bhavcopy.csv"
 )
 
+# Content-addressed cache of raw daily bhavcopies, shared by the
+# strategy pipeline and the Realtime Monitoring Tab
+RAW_CACHE_DIR = os.path.join(
+    DATA_DIR, "raw_cache"
+)
+
+# Corporate-event / bad-tick ledger kept by the incremental cleaner
+CORPORATE_LEDGER = os.path.join(
+    DATA_DIR, "corporate_ledger.json"
+)
+
+# Streaming feature state (per-symbol rolling windows) for daily runs
+FEATURE_STATE_FILE = os.path.join(
+    DATA_DIR, "feature_state.npz"
+)
+
+# Cleaned + regime-tagged feature frame, versioned by master / regime
+# content and read point-in-time by training and trading
+FEATURE_STORE_DIR = os.path.join(
+    DATA_DIR, "feature_store"
+)
+
+# Memory-mapped trading-date x symbol AVG/CLOSE price panel, rebuilt
+# when the master changes and shared by performance, backtest and charts
+PRICE_PANEL_DIR = os.path.join(
+    DATA_DIR, "price_panel"
+)
+
+# Per-symbol row index over the master shards for single-symbol
+# history reads
+SYMBOL_HISTORY_DIR = os.path.join(
+    DATA_DIR, "symbol_history"
+)
+
+# Legacy per-caller download folders; their files are adopted into
+# RAW_CACHE_DIR the first time the cache is used
 LIVE_BHAVCOPY_DIR = os.path.join(
     DATA_DIR, "live_bhavcopy"
 )
 
-# Temp folder specifically for the Realtime Monitoring Tab
 MONITOR_DIR = os.path.join(
     DATA_DIR, "monitor_temp"
 )
 
+# ------------------------------------------------------------
+# DOWNLOADER
+# ------------------------------------------------------------
+
+DOWNLOAD_MAX_WORKERS = 4      # concurrent requests sharing one session
+DOWNLOAD_RATE_PER_SEC = 3.0   # global cap on request starts
+DOWNLOAD_RETRIES = 3          # extra attempts per date
+DOWNLOAD_BACKOFF_SEC = 0.5    # base of the jittered exponential backoff
+
+# ------------------------------------------------------------
+# PARSER
+# ------------------------------------------------------------
+
+PARSE_PROCESSES = min(4, os.cpu_count() or 1)   # day files parsed in parallel
+PARSE_POOL_MIN_FILES = 8                        # below this, parse in-process
+
+# ------------------------------------------------------------
+# FEATURE STORE
+# ------------------------------------------------------------
+
+FEATURE_STATE_CHECK_DAYS = 5   # streamed days re-checked against add_features per daily run
+
+# ------------------------------------------------------------
+# PRICE PANEL
+# ------------------------------------------------------------
+
+PANEL_KEEP_GENERATIONS = 2     # panel generations kept on disk (live + previous)
+
 # ------------------------------------------------------------
 # REGIME FILES
 # ------------------------------------------------------------
@@ -70,6 +139,33 @@ MACRO_MAP = os.path.join(
     PROJECT_ROOT, "regime_to_macro_mapping.csv"
 )
 
+# ------------------------------------------------------------
+# TRADING CALENDAR
+# ------------------------------------------------------------
+
+# Weekday exchange holidays; sessions past the last master date are
+# projected as weekdays not in this list. Extend it each year.
+HOLIDAY_CALENDAR = os.path.join(
+    PROJECT_ROOT, "nse_holidays.csv"
+)
+
+# ------------------------------------------------------------
+# TRAINING
+# ------------------------------------------------------------
+
+TRAIN_CORES = os.cpu_count() or 1   # split between macro workers x XGBoost threads
+TRAIN_TREE_METHOD = "exact"         # "exact" (reference) or "hist" (faster)
+HIST_VALIDATE = True                # with "hist", also fit "exact" and compare
+HIST_MIN_RANK_CORR = 0.95           # hist model kept only above this Spearman vs exact
+
+# Incremental retraining: boost the saved models on rows past their
+# training watermark instead of refitting 300 trees from scratch
+INCREMENTAL_TREES = 30              # trees added per incremental update
+INCREMENTAL_MIN_ROWS = 200          # fewer new rows than this: keep the model as is
+MAX_INCREMENTAL_UPDATES = 5         # full refit after this many updates in a row
+DRIFT_MAX_RMSE_RATIO = 1.5          # full refit if new-row RMSE exceeds holdout RMSE by this
+HOLDOUT_FRACTION = 0.2              # last share of sessions scored out of sample at full fit
+
 # ------------------------------------------------------------
 # MODEL PATHS
 # ------------------------------------------------------------
@@ -77,6 +173,10 @@ MACRO_MAP = os.path.join(
 MODEL_DIR = os.path.join(PROJECT_ROOT, "models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+# Native XGBoost serialization used by the model registry ("ubj" or "json").
+# Legacy macro_*.joblib pickles are converted on first load.
+MODEL_FORMAT = "ubj"
+
 # ------------------------------------------------------------
 # OUTPUT / RESULTS
 # ------------------------------------------------------------
@@ -96,6 +196,25 @@ MODEL_RETURNS_FILE = lambda d: os.path.join(
     RESULTS_DIR, f"model_stock_returns_{d}.csv"
 )
 
+BACKTEST_FILE = lambda start, end: os.path.join(
+    RESULTS_DIR, f"backtest_{start}_{end}.csv"
+)
+
+# Walk-forward backtest: models are refit as of the first decision date
+# of every window of BACKTEST_RETRAIN_SESSIONS dates and score only that
+# window. Each window's models are kept as a snapshot and reused while
+# its training rows are unchanged.
+BACKTEST_RETRAIN_SESSIONS = 21
+BACKTEST_MODEL_DIR = os.path.join(RESULTS_DIR, "backtest_models")
+
+# Background pipeline jobs (status, logs, reports) and their worker
+JOBS_DIR = os.path.join(RESULTS_DIR, "jobs")
+JOB_POLL_SEC = 1.0            # worker queue / cancel polling interval
+WORKER_IDLE_EXIT_SEC = 600    # worker exits when idle this long; restarted on demand
+
+# Per-node checkpoints of the pipeline DAG (input key + output versions)
+PIPELINE_DIR = os.path.join(RESULTS_DIR, "pipeline")
+
 # ------------------------------------------------------------
 # LOGS
 # ------------------------------------------------------------
@@ -103,4 +222,13 @@ MODEL_RETURNS_FILE = lambda d: os.path.join(
 LOG_DIR = os.path.join(PROJECT_ROOT, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 
-LOG_FILE = os.path.join(LOG_DIR, "daily_run.log")
\ No newline at end of file
+LOG_FILE = os.path.join(LOG_DIR, "daily_run.log")
+
+# Per-stage run metrics (one JSON line per stage) roll over to
+# daily_run.log.1 past this size
+LOG_MAX_BYTES = 5 * 1024 * 1024
+
+# Stage captured with cProfile + tracemalloc (e.g. "train"); None = off.
+# Captures are written to PROFILE_DIR.
+PROFILE_STAGE = None
+PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
@@ -1,41 +1,111 @@
 # ============================================================
 # corporate_cleaner.py
-# Corporate action & bad tick cleaning (NO LOGIC CHANGES)
+# Corporate action & bad tick cleaning (vectorized scan, event ledger)
 # ============================================================
 
+import os
+import json
+
 import numpy as np
 import pandas as pd
 
+from config import (
+    MASTER_CSV,
+    MASTER_STORE_DIR,
+    CORPORATE_LEDGER
+)
+from master_store import (
+    load_master,
+    master_symbols,
+    master_date_counts
+)
+from store_io import write_json_atomic
+from run_metrics import timed, set_rows
+
+NON_NUMERIC = ["SYMBOL", "DATE"]
+
+GAP_DAYS = 10
+EXCLUDE_SPLIT = ["BRITANNIA"]
+
+# Rows after an abnormal jump that must stay within 10% of the first one
+STABLE_WINDOW = 5
+
+# ret_2d looks two rows back, so a rescan starts two rows before the
+# first unconfirmed row
+LOOKBACK_ROWS = 2
+
+# Symbols with no rows in this many latest sessions (delisted,
+# suspended) stop being rescanned until they trade again
+DORMANT_SESSIONS = 20
+
+SCAN_COLUMNS = ["SYMBOL", "DATE1", "CLOSE_PRICE"]
+
+OUTPUT_COLUMNS = [
+    "SYMBOL", "DATE",
+    "OPEN_PRICE", "HIGH_PRICE", "LOW_PRICE",
+    "LAST_PRICE", "CLOSE_PRICE", "AVG_PRICE",
+    "TTL_TRD_QNTY", "TURNOVER_LACS",
+    "NO_OF_TRADES", "DELIV_QTY", "DELIV_PER"
+]
+
 # ============================================================
-# CLEAN CORPORATE EVENTS
+# KERNELS
 # ============================================================
 
-def clean_corporate_events(master_csv: str) -> pd.DataFrame:
+def _coerce_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Text-to-number coercion of the output columns, skipping any that are
+    already numeric. Columns dropped from the output are left untouched.
+    """
+    for col in OUTPUT_COLUMNS:
+        if col in NON_NUMERIC or col not in df.columns:
+            continue
+        s = df[col]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            continue
+        df[col] = pd.to_numeric(
+            s.astype(str)
+            .str.replace(",", "", regex=False)
+            .str.replace("%", "", regex=False)
+            .str.strip(),
+            errors="coerce"
+        )
+    return df
 
-    df = pd.read_csv(master_csv, low_memory=False)
-    df.columns = df.columns.str.strip()
-    df["DATE"] = pd.to_datetime(df["DATE1"])
 
-    NON_NUMERIC = ["SYMBOL", "DATE"]
+def _post_stable(df: pd.DataFrame) -> np.ndarray:
+    """
+    For each abnormal jump at row i: rows i+1..i+5 exist within the
+    symbol and all stay within 10% of row i+1. Frame must be sorted by
+    (SYMBOL, DATE).
+    """
+    g = df.groupby("SYMBOL", sort=False)
+    close = g["CLOSE_PRICE"]
 
-    for col in df.columns:
-        if col not in NON_NUMERIC:
-            df[col] = (
-                df[col].astype(str)
-                .str.replace(",", "", regex=False)
-                .str.replace("%", "", regex=False)
-                .str.strip()
-            )
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    pos = g.cumcount().to_numpy()
+    size = g["CLOSE_PRICE"].transform("size").to_numpy()
 
-    df = df.sort_values(["SYMBOL", "DATE"]).reset_index(drop=True)
+    base = close.shift(-1).to_numpy()
+    stable = pos + STABLE_WINDOW < size
+
+    for k in range(1, STABLE_WINDOW + 1):
+        fut = close.shift(-k).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stable &= np.abs(fut / base - 1) < 0.10
+
+    return df["abnormal_jump"].to_numpy() & stable
+
+
+def _detect_events(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds return, jump, stability and event/bad-tick flags."""
+    g = df.groupby("SYMBOL")["CLOSE_PRICE"]
 
     # --------------------------------------------------------
     # RETURNS
     # --------------------------------------------------------
 
-    df["ret_1d"] = df.groupby("SYMBOL")["CLOSE_PRICE"].pct_change()
-    df["ret_2d"] = df.groupby("SYMBOL")["CLOSE_PRICE"].pct_change(2)
+    df["ret_1d"] = g.pct_change()
+    df["ret_2d"] = g.pct_change(2)
 
     # --------------------------------------------------------
     # ABNORMAL JUMPS
@@ -46,17 +116,7 @@ def clean_corporate_events(master_csv: str) -> pd.DataFrame:
         (df["ret_2d"].abs() > 0.60)
     )
 
-    df["post_stable"] = False
-
-    for sym, sub in df.groupby("SYMBOL"):
-        sub = sub.reset_index()
-        for i in sub.index[sub["abnormal_jump"]]:
-            if i + 5 >= len(sub):
-                continue
-            base = sub.loc[i + 1, "CLOSE_PRICE"]
-            fut = sub.loc[i + 1:i + 5, "CLOSE_PRICE"]
-            if np.all(np.abs(fut / base - 1) < 0.10):
-                df.at[sub.loc[i, "index"], "post_stable"] = True
+    df["post_stable"] = _post_stable(df)
 
     # --------------------------------------------------------
     # CLASSIFY EVENTS
@@ -69,49 +129,256 @@ def clean_corporate_events(master_csv: str) -> pd.DataFrame:
         (df.groupby("SYMBOL")["ret_1d"].shift(-1).abs() < 0.1)
     )
 
-    GAP_DAYS = 10
-    EXCLUDE_SPLIT = ["BRITANNIA"]
+    return df
 
-    final = []
 
-    # --------------------------------------------------------
-    # SPLIT PRE / POST
-    # --------------------------------------------------------
+def _split_pre_post(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drops bad ticks, then splits each symbol at its first corporate
+    event into *_PRE / *_POST, leaving GAP_DAYS rows out on either side.
+    """
+    df = df[~df["suspected_bad_tick"]]
 
-    for sym, sub in df.groupby("SYMBOL"):
-        sub = sub[~sub["suspected_bad_tick"]].reset_index(drop=True)
+    g = df.groupby("SYMBOL", sort=False)
+    pos = g.cumcount().to_numpy()
+    size = g["SYMBOL"].transform("size").to_numpy()
 
-        if sym in EXCLUDE_SPLIT:
-            final.append(sub.copy())
-            continue
+    first = (
+        pd.Series(np.where(df["suspected_corp_event"], pos, np.nan), index=df.index)
+        .groupby(df["SYMBOL"], sort=False)
+        .transform("min")
+        .to_numpy()
+    )
 
-        events = sub.index[sub["suspected_corp_event"]]
+    split = ~np.isnan(first) & ~df["SYMBOL"].isin(EXCLUDE_SPLIT).to_numpy()
 
-        if len(events) == 0:
-            final.append(sub.copy())
-            continue
+    with np.errstate(invalid="ignore"):
+        pre = split & (pos < np.maximum(0, first - GAP_DAYS))
+        post = split & (pos >= np.minimum(size, first + GAP_DAYS + 1))
+
+    out = df[~split | pre | post].copy()
+
+    sym = out["SYMBOL"].astype(object).to_numpy(copy=True)
+    pre, post = pre[~split | pre | post], post[~split | pre | post]
+    sym[pre] = sym[pre] + "_PRE"
+    sym[post] = sym[post] + "_POST"
+    out["SYMBOL"] = sym
+
+    return out.reset_index(drop=True)
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df["DATE"] = pd.to_datetime(df["DATE1"])
+
+    df = _coerce_numeric(df)
+
+    return df.sort_values(["SYMBOL", "DATE"]).reset_index(drop=True)
+
+# ============================================================
+# EVENT LEDGER (INCREMENTAL SCAN)
+# ============================================================
+# A row's flags are final once STABLE_WINDOW rows follow it within its
+# symbol. The ledger stores final events / bad ticks per symbol plus a
+# high-water mark, so each run only rescans the unconfirmed tail.
+#
+# A symbol that stops trading never gets STABLE_WINDOW more rows, so
+# its tail would pin every scan to an old date. Once it misses
+# DORMANT_SESSIONS sessions its pending flags are held in the ledger
+# and it is left out of the scan; new rows for it bring it back.
+
+def _empty_ledger() -> dict:
+    return {"through_date": None, "rows_through": 0, "symbols": {}}
+
+
+def _load_ledger(path: str) -> dict:
+    if not os.path.exists(path):
+        return _empty_ledger()
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return _empty_ledger()
+
+
+def _rows_through(counts: dict, through_date) -> int:
+    if through_date is None:
+        return 0
+    return sum(n for d, n in counts.items() if d <= through_date)
+
+
+def _flag_keys(df: pd.DataFrame, mask) -> set:
+    sub = df.loc[mask, ["SYMBOL", "DATE"]]
+    return set(zip(sub["SYMBOL"], sub["DATE"].dt.strftime("%Y-%m-%d")))
+
+
+@timed("clean.ledger")
+def update_event_ledger(ledger_path: str = CORPORATE_LEDGER,
+                        master_dir: str = MASTER_STORE_DIR):
+    """
+    Scans only the unconfirmed tail of each symbol and folds newly final
+    events / bad ticks into the ledger. Returns (events, bad_ticks) as
+    sets of (SYMBOL, "YYYY-MM-DD"), covering both ledger entries and the
+    still-pending tail, i.e. exactly what a full scan would flag today.
+    The ledger at `ledger_path` must belong to the store at `master_dir`.
+    """
+    counts = master_date_counts(master_dir)
+    ledger = _load_ledger(ledger_path)
+
+    # Rows inserted at or before the high-water mark (backfill, rebuilt
+    # store) invalidate the ledger
+    if _rows_through(counts, ledger["through_date"]) != ledger["rows_through"]:
+        print("Corporate ledger out of date, rescanning full history")
+        ledger = _empty_ledger()
+
+    known = ledger["symbols"]
+    active = {s: v for s, v in known.items() if not v.get("dormant")}
+
+    if not known:
+        tail = load_master(columns=SCAN_COLUMNS, store_dir=master_dir)
+    else:
+        starts = [v["rescan_from"] for v in active.values() if v["rescan_from"]]
+        start = min(starts) if starts else max(counts)
+        tail = load_master(columns=SCAN_COLUMNS, start=start, store_dir=master_dir)
+
+        # Dormant symbols that traded again are rescanned from their own tail
+        last = {s: v["last_date"] for s, v in known.items() if v.get("dormant")}
+        seen = tail["DATE1"].dt.strftime("%Y-%m-%d").to_numpy()
+        back = {
+            s for s in tail["SYMBOL"][seen > tail["SYMBOL"].map(last).fillna("9999").to_numpy()].unique()
+        }
+        for s in back:
+            v = known[s]
+            v["dormant"] = False
+            v["held_events"], v["held_bad_ticks"] = [], []
+            active[s] = v
+
+        early = (master_symbols(master_dir) - set(known)) | {s for s in back if known[s]["rescan_from"] < start}
+        if early:
+            tail = pd.concat([
+                tail,
+                load_master(columns=SCAN_COLUMNS, symbols=early,
+                            end=pd.Timestamp(start) - pd.Timedelta(days=1), store_dir=master_dir)
+            ], ignore_index=True)
+
+        # Each known symbol only from its own rescan point; dormant ones not at all
+        since = tail["SYMBOL"].map({s: v["rescan_from"] for s, v in active.items()})
+        dormant = tail["SYMBOL"].isin([s for s in known if s not in active]).to_numpy()
+        day = tail["DATE1"].dt.strftime("%Y-%m-%d").to_numpy()
+        keep = (since.isna().to_numpy() | (day >= since.fillna("").to_numpy())) & ~dormant
+        tail = tail[keep].reset_index(drop=True)
+
+    tail = _detect_events(_prepare(tail))
+    set_rows(len(tail))
+
+    g = tail.groupby("SYMBOL", sort=False)
+    pos = g.cumcount().to_numpy()
+    size = g["SYMBOL"].transform("size").to_numpy()
+    final = pos + STABLE_WINDOW < size
+    day = tail["DATE"].dt.strftime("%Y-%m-%d").to_numpy()
+
+    # Only rows past each symbol's previous watermark are new information
+    prev = tail["SYMBOL"].map(
+        {s: v["final_through"] for s, v in known.items() if v["final_through"]}
+    )
+    fresh_row = (prev.isna() | (day > prev.fillna("").to_numpy())).to_numpy()
+
+    pending = ~final
+    new_final = final & fresh_row
+    is_event = tail["suspected_corp_event"].to_numpy()
+    is_bad = tail["suspected_bad_tick"].to_numpy()
+
+    sessions = sorted(counts)
+    dormant_before = sessions[-DORMANT_SESSIONS] if len(sessions) >= DORMANT_SESSIONS else None
+
+    for sym, idx in tail.groupby("SYMBOL", sort=False).indices.items():
+        entry = known.setdefault(
+            sym, {"events": [], "bad_ticks": [], "final_through": None, "rescan_from": None}
+        )
+
+        nf = idx[new_final[idx]]
+        entry["events"] += day[nf[is_event[nf]]].tolist()
+        entry["bad_ticks"] += day[nf[is_bad[nf]]].tolist()
+
+        fin = idx[final[idx]]
+        if len(fin):
+            entry["final_through"] = day[fin[-1]]
+            entry["rescan_from"] = day[fin[max(0, len(fin) - LOOKBACK_ROWS)]]
+        elif entry["rescan_from"] is None:
+            entry["rescan_from"] = day[idx[0]]
+
+        entry["last_date"] = day[idx[-1]]
+        if dormant_before is not None and entry["last_date"] < dormant_before:
+            # Its tail can only change if it trades again
+            pend = idx[pending[idx]]
+            entry["dormant"] = True
+            entry["held_events"] = day[pend[is_event[pend]]].tolist()
+            entry["held_bad_ticks"] = day[pend[is_bad[pend]]].tolist()
+
+    max_date = max(counts) if counts else None
+    ledger["through_date"] = max_date
+    ledger["rows_through"] = _rows_through(counts, max_date)
+    write_json_atomic(ledger_path, ledger)
+
+    events = _flag_keys(tail, pending & is_event)
+    bad = _flag_keys(tail, pending & is_bad)
+    for sym, v in known.items():
+        events.update((sym, d) for d in v["events"] + v.get("held_events", []))
+        bad.update((sym, d) for d in v["bad_ticks"] + v.get("held_bad_ticks", []))
+
+    return events, bad
+
+
+def _mark(df: pd.DataFrame, keys: set) -> np.ndarray:
+    out = np.zeros(len(df), dtype=bool)
+    if not keys:
+        return out
+
+    k = pd.DataFrame(sorted(keys), columns=["SYMBOL", "DATE"])
+    k["DATE"] = pd.to_datetime(k["DATE"])
+
+    # Flags are rare: narrow to candidate rows before the key match
+    cand = (df["SYMBOL"].isin(k["SYMBOL"]) & df["DATE"].isin(k["DATE"])).to_numpy()
+    sub = pd.MultiIndex.from_frame(df.loc[cand, ["SYMBOL", "DATE"]])
+    out[cand] = sub.isin(pd.MultiIndex.from_frame(k))
+    return out
+
+# ============================================================
+# CLEAN CORPORATE EVENTS
+# ============================================================
+
+def clean_corporate_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Full cleaning of an already-loaded master frame."""
+
+    df = _prepare(df)
+
+    df = _detect_events(df)
+    df = _split_pre_post(df)
+
+    return df[OUTPUT_COLUMNS]
+
+
+def clean_corporate_events(master_csv: str) -> pd.DataFrame:
+    """
+    Cleans the master. The default master is scanned incrementally
+    against the event ledger; any other CSV gets a full scan.
+    """
+    if os.path.abspath(master_csv) != os.path.abspath(MASTER_CSV):
+        return clean_corporate_frame(load_master(source=master_csv))
+
+    events, bad = update_event_ledger()
 
-        idx = events[0]
+    return apply_event_flags(load_master(source=master_csv), events, bad)
 
-        pre = sub.iloc[:max(0, idx - GAP_DAYS)].copy()
-        post = sub.iloc[min(len(sub), idx + GAP_DAYS + 1):].copy()
 
-        if len(pre):
-            pre.loc[:, "SYMBOL"] = f"{sym}_PRE"
-            final.append(pre)
+@timed("clean.flags", rows=len)
+def apply_event_flags(df: pd.DataFrame, events: set, bad: set) -> pd.DataFrame:
+    """Cleans a master frame using flags already resolved by the ledger."""
 
-        if len(post):
-            post.loc[:, "SYMBOL"] = f"{sym}_POST"
-            final.append(post)
+    df = _prepare(df)
+    df["suspected_corp_event"] = _mark(df, events)
+    df["suspected_bad_tick"] = _mark(df, bad)
 
-    df = pd.concat(final, ignore_index=True)
+    df = _split_pre_post(df)
 
-    return df[
-        [
-            "SYMBOL", "DATE",
-            "OPEN_PRICE", "HIGH_PRICE", "LOW_PRICE",
-            "LAST_PRICE", "CLOSE_PRICE", "AVG_PRICE",
-            "TTL_TRD_QNTY", "TURNOVER_LACS",
-            "NO_OF_TRADES", "DELIV_QTY", "DELIV_PER"
-        ]
-    ]
+    return df[OUTPUT_COLUMNS]
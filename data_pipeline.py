@@ -3,46 +3,45 @@
 # Bhavcopy download, merge, append & dedupe
 # ============================================================
 
-import os
-import glob
-import zipfile
-import requests
+import threading
 import pandas as pd
-import shutil
 from datetime import datetime, timedelta
 
 from config import (
-    DATA_DIR,
-    MASTER_CSV,
     CONSOLIDATED_BHAVCOPY,
-    LIVE_BHAVCOPY_DIR,
-    MONITOR_DIR
+    MASTER_STORE_DIR
 )
-
-# ------------------------------------------------------------
-# NSE HEADERS
-# ------------------------------------------------------------
-
-HEADERS = {
-    "User-Agent": "Mozilla/5.0",
-    "Accept-Language": "en-US,en;q=0.9",
-    "Referer": "https://www.nseindia.com/all-reports",
-}
+from bhav_downloader import download_bhavcopies
+from raw_cache import ensure_days
+from trading_calendar import load_trading_calendar
+from price_panel import load_price_panel
+from symbol_history import build_symbol_history
+from bhav_parser import parse_bhavcopies
+from master_store import (
+    master_exists,
+    store_exists,
+    master_symbols,
+    master_info,
+    write_master,
+    append_master,
+    normalize_master_frame
+)
+from run_metrics import timed
 
 # ============================================================
 # HELPER: GET CURRENT MASTER RANGE
 # ============================================================
 
-def get_master_date_range():
-    if not os.path.exists(MASTER_CSV):
+def get_master_date_range(store_dir: str = MASTER_STORE_DIR):
+    """First / last master date, from the warm store manifest (no row read)."""
+    if not (store_exists(store_dir) or master_exists()):
         return "N/A", "N/A"
     
     try:
-        df = pd.read_csv(MASTER_CSV, usecols=["DATE1"])
-        df["DATE1"] = pd.to_datetime(df["DATE1"])
+        info = master_info(store_dir)
         
-        min_date = df["DATE1"].min().strftime("%d-%b-%Y")
-        max_date = df["DATE1"].max().strftime("%d-%b-%Y")
+        min_date = pd.Timestamp(info["min_date"]).strftime("%d-%b-%Y")
+        max_date = pd.Timestamp(info["max_date"]).strftime("%d-%b-%Y")
         return min_date, max_date
     except:
         return "Error", "Error"
@@ -53,139 +52,106 @@ def get_master_date_range():
 
 def download_bhavcopy_to_dir(date_str: str, output_dir: str):
     """Downloads a single bhavcopy to a specific directory."""
-    API_URL = (
-        "https://www.nseindia.com/api/reports?"
-        "archives=[{\"name\":\"Full%20Bhavcopy%20and%20Security%20Deliverable%20data\","
-        "\"type\":\"daily-reports\",\"category\":\"capital-market\","
-        "\"section\":\"equities\"}]&"
-        f"date={date_str}&type=equities&mode=single"
-    )
-
-    os.makedirs(output_dir, exist_ok=True)
-
-    with requests.Session() as s:
-        s.headers.update(HEADERS)
-        try:
-            s.get("https://www.nseindia.com/", timeout=10)
-        except:
-            pass
-
-        try:
-            resp = s.get(API_URL, stream=True, timeout=30)
-            resp.raise_for_status()
-
-            fname = resp.headers.get("Content-Disposition", "bhav.zip").split("filename=")[-1].replace('"', "")
-            save_path = os.path.join(output_dir, f"{date_str}_{fname}")
-
-            with open(save_path, "wb") as f:
-                for chunk in resp.iter_content(1024):
-                    f.write(chunk)
-            return True
-        except:
-            return False
+    report = download_bhavcopies([date_str], output_dir)
+    return bool((report["status"] == "ok").all())
+
+
+def _date_range(start, end):
+    """Calendar dates in [start, end] that can have a bhavcopy (no weekends / holidays)."""
+    days = load_trading_calendar().download_days(pd.Timestamp(start).normalize(), end)
+    return [d.strftime("%d-%b-%Y") for d in days]
+
 
 # ============================================================
 # STRATEGY PIPELINE FUNCTIONS
 # ============================================================
 
+@timed("data_pipeline")
 def run_daily_data_pipeline(start_date: str, end_date: str):
     """Downloads data for Master CSV update"""
     s = datetime.strptime(start_date, "%d-%b-%Y")
     e = datetime.strptime(end_date, "%d-%b-%Y")
 
-    while s <= e:
-        download_bhavcopy_to_dir(s.strftime("%d-%b-%Y"), LIVE_BHAVCOPY_DIR)
-        s += timedelta(days=1)
-
-    # Merge logic (simplified for brevity, logic remains same as before)
-    all_data = []
-    for zip_file in glob.glob(os.path.join(LIVE_BHAVCOPY_DIR, "*.zip")):
-        try:
-            with zipfile.ZipFile(zip_file, "r") as z:
-                csvs = [f for f in z.namelist() if f.endswith(".csv")]
-                if csvs:
-                    df = pd.read_csv(z.open(csvs[0]), low_memory=False)
-                    all_data.append(df)
-        except: pass
+    # Raw days come from the shared cache; only uncached dates hit NSE
+    days = ensure_days(_date_range(s, e))
+    print(f"Resolved {len(days)} trading days for {start_date} to {end_date}")
+
+    # Parse straight to the master schema, keeping only the F&O
+    # universe once a master exists
+    universe = master_symbols() if master_exists() else None
+    final_df = parse_bhavcopies(days.values(), symbols=universe)
     
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
+    if not final_df.empty:
         final_df.to_csv(CONSOLIDATED_BHAVCOPY, index=False)
-        append_consolidated_bhavcopy_fno_only()
-
-def append_consolidated_bhavcopy_fno_only():
-    # ... (Same logic as provided in previous turns) ...
-    # Re-implementing briefly for completeness in this file context
-    if not os.path.exists(MASTER_CSV) and os.path.exists(CONSOLIDATED_BHAVCOPY):
-        shutil.copy(CONSOLIDATED_BHAVCOPY, MASTER_CSV)
-        return
-
-    master = pd.read_csv(MASTER_CSV, low_memory=False)
-    bhav = pd.read_csv(CONSOLIDATED_BHAVCOPY, low_memory=False)
-    bhav.columns = bhav.columns.str.strip().str.upper()
-    
-    if "DATE1" in bhav.columns: bhav["DATE1"] = pd.to_datetime(bhav["DATE1"])
-    elif "DATE" in bhav.columns: bhav["DATE1"] = pd.to_datetime(bhav["DATE"])
-    
-    master["DATE1"] = pd.to_datetime(master["DATE1"])
-    fno = set(master["SYMBOL"].unique())
-    bhav = bhav[bhav["SYMBOL"].isin(fno)]
-    
-    key = ["SYMBOL", "DATE1"]
-    bhav = bhav[~bhav.set_index(key).index.isin(master.set_index(key).index)]
-    
-    if not bhav.empty:
-        pd.concat([master, bhav], ignore_index=True).sort_values(key).to_csv(MASTER_CSV, index=False)
+        append_consolidated_bhavcopy_fno_only(final_df)
+
+        # Bring the shared price panel / calendar / symbol index up to
+        # date here, so the next app rerun does not pay for it. Panel and
+        # index only process the appended dates and shards
+        load_price_panel()
+        load_trading_calendar()
+        build_symbol_history()
+
+def append_consolidated_bhavcopy_fno_only(bhav: pd.DataFrame = None) -> int:
+    """
+    Appends F&O-universe rows of the consolidated bhavcopy to the master.
+    Dedupe and the write only touch the incoming dates (see append_master).
+    """
+    if bhav is None:
+        bhav = pd.read_csv(CONSOLIDATED_BHAVCOPY, low_memory=False)
+
+    if not master_exists():
+        write_master(bhav)
+        return len(bhav)
+
+    bhav = normalize_master_frame(bhav)
+    bhav = bhav[bhav["SYMBOL"].isin(master_symbols())]
+
+    return append_master(bhav)
 
 # ============================================================
 # REALTIME MONITORING FETCH
 # ============================================================
 
+# Parsed 4-week windows shared by every app session in this process
+MONITOR_CACHE_ENTRIES = 4
+
+_monitor_cache = {}
+_monitor_lock = threading.Lock()
+
+@timed("monitor_fetch", rows=len)
 def fetch_monitoring_data(end_date: pd.Timestamp):
     """
-    Downloads last 4 weeks of data ending on 'end_date' to a temp folder.
+    Loads the last 4 weeks of data ending on 'end_date' from the raw-day
+    cache, downloading only the days it does not hold yet.
     Returns a DataFrame of that data.
     """
     start_date = end_date - timedelta(weeks=4)
-    current = start_date
-    
-    # 1. Prepare Temp Directory
-    if os.path.exists(MONITOR_DIR):
-        shutil.rmtree(MONITOR_DIR) # Clear old cache
-    os.makedirs(MONITOR_DIR, exist_ok=True)
 
     print(f"Fetching monitor data: {start_date.date()} to {end_date.date()}")
     
-    # 2. Download Loop
-    while current <= end_date:
-        d_str = current.strftime("%d-%b-%Y")
-        download_bhavcopy_to_dir(d_str, MONITOR_DIR)
-        current += timedelta(days=1)
-
-    # 3. Load & Merge
-    all_dfs = []
-    
-    for zf in glob.glob(os.path.join(MONITOR_DIR, "*.zip")):
-        try:
-            with zipfile.ZipFile(zf, "r") as z:
-                csvs = [f for f in z.namelist() if f.endswith(".csv")]
-                if csvs:
-                    df = pd.read_csv(z.open(csvs[0]), low_memory=False)
-                    all_dfs.append(df)
-        except: pass
+    # 1. Resolve days (cached days need no network)
+    days = ensure_days(_date_range(start_date, end_date))
+
+    # 2. Parse & Merge (typed, headers already clean). Objects are
+    # content-addressed, so the resolved paths identify the result and
+    # every session asking for the same window shares one parse.
+    key = tuple(days.items())
+    with _monitor_lock:
+        combined = _monitor_cache.get(key)
+
+    if combined is None:
+        combined = parse_bhavcopies(days.values())
+        if not combined.empty:
+            combined["DATE"] = combined["DATE1"]
+            combined = combined.sort_values("DATE")
+        with _monitor_lock:
+            _monitor_cache[key] = combined
+            while len(_monitor_cache) > MONITOR_CACHE_ENTRIES:
+                _monitor_cache.pop(next(iter(_monitor_cache)))
         
-    if not all_dfs:
+    if combined.empty:
         return pd.DataFrame()
 
-    combined = pd.concat(all_dfs, ignore_index=True)
-    
-    # Normalize Columns
-    combined.columns = combined.columns.str.strip().str.upper()
-    
-    # Standardize Date Column
-    if "DATE1" in combined.columns:
-        combined["DATE"] = pd.to_datetime(combined["DATE1"])
-    elif "DATE" in combined.columns:
-        combined["DATE"] = pd.to_datetime(combined["DATE"])
-        
-    return combined.sort_values("DATE")
\ No newline at end of file
+    # Shallow copy: callers may add columns without touching the shared frame
+    return combined.copy(deep=False)
@@ -0,0 +1,257 @@
+# ============================================================
+# feature_state.py
+# Streaming per-symbol feature state for new trading days
+# ============================================================
+
+import os
+import pickle
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    FEATURES,
+    FEATURE_STATE_FILE
+)
+from feature_engineer import add_features
+from store_io import write_npz_atomic
+
+# ------------------------------------------------------------
+# WINDOWS
+# ------------------------------------------------------------
+# ret_10 and vol_10 need the last 11 closes; vol_z / deliv_z need the
+# last 20 quantities / delivery %. Buffers hold exactly that per symbol,
+# newest value in the last column, NaN where history is shorter.
+
+CLOSE_WINDOW = 11
+Z_WINDOW = 20
+
+# What np.load raises for a missing, truncated or foreign state file
+LOAD_ERRORS = (OSError, ValueError, KeyError, EOFError,
+               pickle.UnpicklingError, zipfile.BadZipFile)
+
+INPUT_COLUMNS = ["SYMBOL", "DATE", "CLOSE_PRICE", "HIGH_PRICE",
+                 "LOW_PRICE", "TTL_TRD_QNTY", "DELIV_PER"]
+
+# ============================================================
+# KERNELS
+# ============================================================
+
+def _std(a: np.ndarray) -> np.ndarray:
+    """Row-wise sample std; NaN if any value in the window is missing."""
+    return np.std(a, axis=1, ddof=1)
+
+
+def _zscore(buf: np.ndarray) -> np.ndarray:
+    mean = np.mean(buf, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (buf[:, -1] - mean) / _std(buf)
+
+# ============================================================
+# FEATURE STATE
+# ============================================================
+
+class FeatureState:
+    """
+    Rolling-window state per symbol. `update(day)` appends one trading
+    day and returns its feature rows in O(symbols), without touching
+    history. Matches `add_features` on the same row sequence.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.index = {}
+        self.close = np.empty((0, CLOSE_WINDOW))
+        self.qty = np.empty((0, Z_WINDOW))
+        self.deliv = np.empty((0, Z_WINDOW))
+        self.last_date = None
+        self.version = None
+
+    # --------------------------------------------------------
+    # Symbol slots
+    # --------------------------------------------------------
+
+    def _rows(self, symbols) -> np.ndarray:
+        new = [s for s in dict.fromkeys(symbols) if s not in self.index]
+        if new:
+            for s in new:
+                self.index[s] = len(self.symbols)
+                self.symbols.append(s)
+            pad = len(new)
+            self.close = np.vstack([self.close, np.full((pad, CLOSE_WINDOW), np.nan)])
+            self.qty = np.vstack([self.qty, np.full((pad, Z_WINDOW), np.nan)])
+            self.deliv = np.vstack([self.deliv, np.full((pad, Z_WINDOW), np.nan)])
+        return np.array([self.index[s] for s in symbols], dtype=np.int64)
+
+    @staticmethod
+    def _push(buf: np.ndarray, rows: np.ndarray, values: np.ndarray):
+        buf[rows, :-1] = buf[rows, 1:]
+        buf[rows, -1] = values
+
+    # --------------------------------------------------------
+    # Build from history
+    # --------------------------------------------------------
+
+    def bootstrap(self, df: pd.DataFrame) -> "FeatureState":
+        """Seeds the buffers from the tail of a cleaned history frame."""
+        df = df.sort_values(["SYMBOL", "DATE"], kind="mergesort")
+        tail = df.groupby("SYMBOL", sort=False).tail(Z_WINDOW)
+
+        rows = self._rows(tail["SYMBOL"].tolist())
+        # Column slot counted from the right: newest row lands in -1
+        back = tail.groupby("SYMBOL", sort=False).cumcount(ascending=False).to_numpy()
+
+        self.qty[rows, Z_WINDOW - 1 - back] = tail["TTL_TRD_QNTY"].to_numpy()
+        self.deliv[rows, Z_WINDOW - 1 - back] = tail["DELIV_PER"].to_numpy()
+
+        keep = back < CLOSE_WINDOW
+        self.close[rows[keep], CLOSE_WINDOW - 1 - back[keep]] = tail["CLOSE_PRICE"].to_numpy()[keep]
+
+        self.last_date = pd.Timestamp(df["DATE"].max()) if len(df) else None
+        return self
+
+    # --------------------------------------------------------
+    # Stream one day
+    # --------------------------------------------------------
+
+    def update(self, day: pd.DataFrame) -> pd.DataFrame:
+        """Appends one trading day and returns it with FEATURES filled in."""
+        if day.empty:
+            return day.assign(**{f: np.nan for f in FEATURES})
+
+        dates = pd.to_datetime(day["DATE"]).unique()
+        if len(dates) != 1:
+            raise RuntimeError("❌ update() expects rows for exactly one trading date")
+        date = pd.Timestamp(dates[0])
+        if self.last_date is not None and date <= self.last_date:
+            raise RuntimeError(f"❌ {date.date()} is not after state date {self.last_date.date()}")
+        if day["SYMBOL"].duplicated().any():
+            raise RuntimeError("❌ update() got more than one row per symbol")
+
+        rows = self._rows(day["SYMBOL"].tolist())
+        close = day["CLOSE_PRICE"].to_numpy(dtype=float)
+
+        self._push(self.close, rows, close)
+        self._push(self.qty, rows, day["TTL_TRD_QNTY"].to_numpy(dtype=float))
+        self._push(self.deliv, rows, day["DELIV_PER"].to_numpy(dtype=float))
+        self.last_date = date
+
+        c = self.close[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rets = c[:, 1:] / c[:, :-1] - 1
+
+            out = day.copy()
+            out["ret_1"] = rets[:, -1]
+            out["ret_3"] = c[:, -1] / c[:, -4] - 1
+            out["ret_5"] = c[:, -1] / c[:, -6] - 1
+            out["ret_10"] = c[:, -1] / c[:, -11] - 1
+            out["vol_5"] = _std(rets[:, -5:])
+            out["vol_10"] = _std(rets[:, -10:])
+            out["range"] = (
+                (day["HIGH_PRICE"].to_numpy(dtype=float) - day["LOW_PRICE"].to_numpy(dtype=float)) / close
+            )
+            out["vol_z"] = _zscore(self.qty[rows])
+            out["deliv_z"] = _zscore(self.deliv[rows])
+
+        return out
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+
+    def save(self, path: str = FEATURE_STATE_FILE, version: str = None):
+        """`version` is the feature-store data_version the buffers match."""
+        self.version = version
+        write_npz_atomic(
+            path,
+            symbols=np.array(self.symbols, dtype=object),
+            close=self.close,
+            qty=self.qty,
+            deliv=self.deliv,
+            last_date=np.array([str(self.last_date.date()) if self.last_date is not None else ""]),
+            version=np.array([version or ""])
+        )
+
+    @classmethod
+    def load(cls, path: str = FEATURE_STATE_FILE) -> "FeatureState":
+        z = np.load(path, allow_pickle=True)
+        st = cls()
+        st.symbols = z["symbols"].tolist()
+        st.index = {s: i for i, s in enumerate(st.symbols)}
+        st.close, st.qty, st.deliv = z["close"], z["qty"], z["deliv"]
+        last = str(z["last_date"][0])
+        st.last_date = pd.Timestamp(last) if last else None
+        version = str(z["version"][0]) if "version" in z.files else ""
+        st.version = version or None
+        return st
+
+# ============================================================
+# DAILY RESUME
+# ============================================================
+
+def advance_feature_state(df: pd.DataFrame, through, version: str,
+                          path: str = FEATURE_STATE_FILE):
+    """
+    Resumes the saved state and streams every date of `df` through it.
+    Returns (feature rows, advanced state), or None when the state cannot
+    be resumed: missing, saved for another feature-store `version`, or
+    not at `through` (a gap). The advanced state is not saved here.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        st = FeatureState.load(path)
+    except LOAD_ERRORS:
+        return None
+    if st.version != version or st.last_date != pd.Timestamp(through):
+        return None
+
+    out = [st.update(day) for _, day in df.groupby("DATE", sort=True)]
+    if not out:
+        return df.iloc[0:0].assign(**{f: np.nan for f in FEATURES}), st
+    return pd.concat(out, ignore_index=True), st
+
+# ============================================================
+# CONSISTENCY CHECK
+# ============================================================
+
+def check_against_batch(df: pd.DataFrame, path: str = FEATURE_STATE_FILE,
+                        n_days: int = 5, rtol: float = 1e-9) -> float:
+    """
+    Loads the saved state, streams the first `n_days` dates of `df` after
+    its last date through `update`, and compares them with `add_features`
+    over `df`, which must hold the history ahead of those dates. A stale
+    or corrupt state file fails the check. Returns the largest absolute
+    difference; raises if outside tolerance.
+    """
+    try:
+        st = FeatureState.load(path)
+    except LOAD_ERRORS as e:
+        raise RuntimeError(f"❌ Saved feature state could not be read: {e}")
+    if st.last_date is None:
+        raise RuntimeError("❌ Saved feature state is empty")
+
+    dates = np.sort(df.loc[df["DATE"] > st.last_date, "DATE"].unique())[:n_days]
+    if not len(dates):
+        raise RuntimeError(f"❌ No dates after the feature state's {st.last_date.date()} to check")
+
+    # Just enough history per symbol for the longest window
+    df = df[df["DATE"] <= dates[-1]]
+    df = df.sort_values(["SYMBOL", "DATE"], kind="mergesort")
+    df = df.groupby("SYMBOL", sort=False).tail(Z_WINDOW + len(dates))
+
+    streamed = pd.concat([st.update(df[df["DATE"] == d]) for d in dates], ignore_index=True)
+
+    batch = add_features(df)
+    batch = batch[batch["DATE"] >= dates[0]]
+
+    key = ["SYMBOL", "DATE"]
+    a = streamed.sort_values(key).reset_index(drop=True)[FEATURES].to_numpy(dtype=float)
+    b = batch.sort_values(key).reset_index(drop=True)[FEATURES].to_numpy(dtype=float)
+
+    if a.shape != b.shape or not np.allclose(a, b, rtol=rtol, atol=1e-12, equal_nan=True):
+        raise RuntimeError("❌ Saved feature state diverges from batch add_features")
+
+    with np.errstate(invalid="ignore"):
+        return float(np.nanmax(np.abs(a - b))) if a.size else 0.0
@@ -0,0 +1,448 @@
+# ============================================================
+# feature_store.py
+# Point-in-time feature store keyed by master & regime versions
+# ============================================================
+
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from config import (
+    MASTER_STORE_DIR,
+    FEATURE_STORE_DIR,
+    FEATURE_STATE_FILE,
+    FEATURE_STATE_CHECK_DAYS,
+    CORPORATE_LEDGER,
+    REGIME_TABLE,
+    MACRO_MAP
+)
+from master_store import (
+    load_master,
+    store_exists,
+    master_manifest,
+    master_date_counts
+)
+from store_io import write_json_atomic, write_parquet_atomic, month_bounds
+from corporate_cleaner import update_event_ledger, apply_event_flags
+from regime_engine import integrate_regimes, load_regime_table, validate_regime_table
+from feature_engineer import add_features
+from feature_state import FeatureState, advance_feature_state, check_against_batch
+from run_metrics import timed
+
+# ------------------------------------------------------------
+# LAYOUT
+# ------------------------------------------------------------
+# One Parquet file per calendar month holding the output of
+# integrate_regimes -> add_features for that month's rows, plus a
+# manifest recording what those files were built from:
+#
+#   master_months   fingerprint of each master month (its shard list)
+#   flags           per-symbol corporate-event / bad-tick flag dates
+#   regime_hash     sha256 of the regime table and macro map
+#
+# Feature rows depend only on their own symbol's history, so a changed
+# master month invalidates that month and everything after it, and a
+# symbol whose flags changed (dropped ticks, PRE/POST relabels) is
+# rebuilt from the first date the change can reach. Anything else is
+# reused as-is.
+#
+# The common daily case (new dates appended after the last built date,
+# no flag changes) streams the new rows through FeatureState, saved
+# with the data_version it matches, instead of recomputing the month.
+# A missing, mismatched or lagging state, or a failed check against
+# add_features, falls back to the batch build, which reseeds the state.
+
+STORE_VERSION = 1
+MANIFEST_FILE = "_manifest.json"
+
+# Rows of history per symbol needed ahead of the first rebuilt date
+# (20-day z-scores are the longest window in add_features)
+WARMUP_ROWS = 20
+
+SPLIT_SUFFIX = r"_(PRE|POST)$"
+
+# ============================================================
+# VERSION INPUTS
+# ============================================================
+
+def _sha256(payload) -> str:
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def regime_hash() -> str:
+    """sha256 of the regime table and macro map the store was tagged with."""
+    h = hashlib.sha256()
+    for path in (REGIME_TABLE, MACRO_MAP):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _master_months(master_dir: str) -> dict:
+    """Fingerprint per master month; shards are immutable, so names + rows identify content."""
+    months = {}
+    for name, shard in sorted(master_manifest(master_dir)["shards"].items()):
+        months.setdefault(shard["month"], []).append([name, shard["rows"]])
+    return {m: _sha256(v) for m, v in months.items()}
+
+
+def _flag_lists(events: set, bad: set) -> dict:
+    per = {}
+    for sym, d in events:
+        per.setdefault(sym, []).append(["E", d])
+    for sym, d in bad:
+        per.setdefault(sym, []).append(["B", d])
+    return {s: sorted(v) for s, v in per.items()}
+
+
+def _dirty_since(old: dict, new: dict) -> dict:
+    """
+    {symbol: first invalidated date} for symbols whose flags changed.
+    Rows before the earliest changed flag keep their values, unless the
+    change moves or precedes the symbol's first corporate event: that
+    shifts its PRE/POST cut, so the whole symbol is rebuilt.
+    """
+    out = {}
+    for sym in set(old) | set(new):
+        a = {tuple(f) for f in old.get(sym, [])}
+        b = {tuple(f) for f in new.get(sym, [])}
+        if a == b:
+            continue
+
+        first_a = min((d for k, d in a if k == "E"), default=None)
+        first_b = min((d for k, d in b if k == "E"), default=None)
+        since = min(d for _, d in a ^ b)
+
+        if first_a != first_b or (first_a is not None and since <= first_a):
+            out[sym] = pd.Timestamp.min
+        else:
+            out[sym] = pd.Timestamp(since)
+    return out
+
+
+def _base_symbol(s: pd.Series) -> pd.Series:
+    return s.str.replace(SPLIT_SUFFIX, "", regex=True)
+
+# ============================================================
+# MANIFEST
+# ============================================================
+
+def _manifest_path(store_dir: str) -> str:
+    return os.path.join(store_dir, MANIFEST_FILE)
+
+
+def _read_store_manifest(store_dir: str):
+    path = _manifest_path(store_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _data_version(manifest: dict) -> str:
+    return _sha256([
+        manifest["version"],
+        manifest["regime_hash"],
+        manifest["master_months"],
+        manifest["flags"]
+    ])
+
+
+def _collect_garbage(store_dir: str, manifest: dict):
+    live = {m["file"] for m in manifest["months"].values()}
+    for f in os.listdir(store_dir):
+        if f == MANIFEST_FILE:
+            continue
+        if f.endswith(".tmp") or (f.endswith(".parquet") and f not in live):
+            os.remove(os.path.join(store_dir, f))
+
+# ============================================================
+# BUILD
+# ============================================================
+
+def _invalidated(df: pd.DataFrame, start, dirty: dict) -> np.ndarray:
+    """Rows on/after `start`, or on/after their symbol's date in `dirty`."""
+    out = np.zeros(len(df), dtype=bool)
+    if start is not None:
+        out |= (df["DATE"] >= start).to_numpy()
+    if dirty:
+        since = _base_symbol(df["SYMBOL"]).map(dirty)
+        out |= (since.notna() & (df["DATE"] >= since.fillna(pd.Timestamp.max))).to_numpy()
+    return out
+
+
+def _compute(cleaned: pd.DataFrame, need: np.ndarray) -> pd.DataFrame:
+    """
+    Features for the `need` rows, computed over just enough earlier
+    history per symbol to fill the rolling windows.
+    """
+    # `need` is a per-symbol suffix, so warm-up rows are the last
+    # WARMUP_ROWS ahead of it for symbols that have any needed rows
+    todo = cleaned.loc[need, "SYMBOL"].unique()
+    warm = cleaned[~need & cleaned["SYMBOL"].isin(todo).to_numpy()]
+    warm = warm.groupby("SYMBOL", sort=False).tail(WARMUP_ROWS)
+
+    part = pd.concat(
+        [cleaned[need].assign(_warm=False), warm.assign(_warm=True)],
+        ignore_index=True
+    )
+
+    # No cutoff here: reads stop at the decision date instead. Regime
+    # columns are kept float so every month file shares one schema.
+    part = integrate_regimes(part, REGIME_TABLE, MACRO_MAP, cutoff_date=pd.Timestamp.max)
+    part["regime"] = part["regime"].astype("float64")
+    part["macro_group"] = part["macro_group"].astype("float64")
+    part = add_features(part)
+
+    return part[~part.pop("_warm")].reset_index(drop=True)
+
+
+def _appended_dates(old: dict, counts: dict, changed: list, dirty: dict):
+    """Master dates added after the last build, if that is all that changed."""
+    through = old.get("through_date")
+    if through is None or dirty:
+        return None
+    if sum(n for d, n in counts.items() if d <= through) != old.get("rows_through"):
+        return None
+
+    new = sorted(d for d in counts if d > through)
+    months = {through[:7]} | {d[:7] for d in new}
+    if not new or not set(changed) <= months:
+        return None
+    return new
+
+
+def _stream(cleaned: pd.DataFrame, old: dict, state_path: str):
+    """(feature rows after old["through_date"], advanced state), or None to rebuild."""
+    through = pd.Timestamp(old["through_date"])
+
+    # Regime tags are looked up per date; the new rows need no history
+    part = cleaned[cleaned["DATE"] > through].copy()
+    part = integrate_regimes(part, REGIME_TABLE, MACRO_MAP, cutoff_date=pd.Timestamp.max)
+    part["regime"] = part["regime"].astype("float64")
+    part["macro_group"] = part["macro_group"].astype("float64")
+
+    resumed = advance_feature_state(part, through, old["data_version"], state_path)
+    if resumed is None:
+        print(f"⚠️ Feature state does not match the store at {through.date()}, batch rebuild")
+        return None
+    fresh, st = resumed
+
+    try:
+        check_against_batch(cleaned, state_path, FEATURE_STATE_CHECK_DAYS)
+    except RuntimeError as e:
+        print(f"⚠️ {e}, batch rebuild")
+        return None
+
+    return fresh[old["columns"]], st
+
+
+def _write_month(store_dir: str, manifest: dict, month: str, df: pd.DataFrame):
+    manifest["generation"] += 1
+    name = f"{month}-{manifest['generation']:06d}.parquet"
+    df = df.sort_values(["SYMBOL", "DATE"], kind="mergesort").reset_index(drop=True)
+    write_parquet_atomic(df, os.path.join(store_dir, name))
+    manifest["months"][month] = {
+        "file": name,
+        "rows": int(len(df)),
+        "first": str(df["DATE"].min().date()) if len(df) else None,
+        "last": str(df["DATE"].max().date()) if len(df) else None
+    }
+
+
+@timed("features.store", rows=lambda s: s["rows"])
+def build_feature_store(store_dir: str = FEATURE_STORE_DIR,
+                        master_dir: str = MASTER_STORE_DIR,
+                        state_path: str = FEATURE_STATE_FILE,
+                        ledger_path: str = CORPORATE_LEDGER) -> dict:
+    """
+    Brings the feature store in line with the current master, corporate
+    flags and regime files, rebuilding only invalidated months/symbols.
+    `ledger_path` is the corporate event ledger of `master_dir`.
+    Returns a short summary of what was done.
+    """
+    if not store_exists(master_dir):
+        load_master(columns=["DATE1"], store_dir=master_dir)
+
+    events, bad = update_event_ledger(ledger_path, master_dir)
+
+    current = {
+        "version": STORE_VERSION,
+        "regime_hash": regime_hash(),
+        "master_months": _master_months(master_dir),
+        "flags": _flag_lists(events, bad)
+    }
+
+    old = _read_store_manifest(store_dir)
+    new_regimes = old is None or old["regime_hash"] != current["regime_hash"]
+    full = new_regimes or old["version"] != STORE_VERSION
+
+    if new_regimes:
+        # Once per regime-file version, not on every tagging call
+        for issue in validate_regime_table(load_regime_table(REGIME_TABLE)):
+            print(f"⚠️ Regime table: {issue}")
+
+    if full:
+        changed = sorted(current["master_months"])
+        dirty = {}
+    else:
+        changed = sorted(
+            m for m in set(current["master_months"]) | set(old["master_months"])
+            if current["master_months"].get(m) != old["master_months"].get(m)
+        )
+        dirty = _dirty_since(old["flags"], current["flags"])
+
+    if not full and not changed and not dirty:
+        return {"status": "fresh", "rows": 0, "symbols": 0,
+                "data_version": old["data_version"]}
+
+    counts = master_date_counts(master_dir)
+    appended = None if full else _appended_dates(old, counts, changed, dirty)
+
+    first = changed[0] if changed else None
+    start = month_bounds(first)[0] if first else None
+
+    cleaned = apply_event_flags(load_master(store_dir=master_dir), events, bad)
+
+    streamed = _stream(cleaned, old, state_path) if appended else None
+    if streamed is not None:
+        fresh, state = streamed
+        first, start = None, pd.Timestamp(appended[0])
+    else:
+        fresh, state = _compute(cleaned, _invalidated(cleaned, start, dirty)), None
+    months = fresh["DATE"].dt.to_period("M").astype(str)
+
+    os.makedirs(store_dir, exist_ok=True)
+    through = max(counts) if counts else None
+    manifest = {
+        **current,
+        "columns": list(fresh.columns),
+        "generation": old["generation"] if old else 0,
+        "months": {} if full else dict(old["months"]),
+        "through_date": through,
+        "rows_through": int(sum(counts.values()))
+    }
+
+    # Months that hold invalidated rows: stale rows out, fresh rows in
+    earliest = min(dirty.values(), default=pd.Timestamp.max)
+    touched = set(months)
+    for m, entry in manifest["months"].items():
+        if (first is not None and m >= first) or (
+            entry["last"] is not None and pd.Timestamp(entry["last"]) >= earliest
+        ):
+            touched.add(m)
+
+    for m in sorted(touched):
+        new_rows = fresh[(months == m).to_numpy()]
+        if m in manifest["months"] and (first is None or m < first):
+            kept = pd.read_parquet(os.path.join(store_dir, manifest["months"][m]["file"]))
+            kept = kept[~_invalidated(kept, start, dirty)]
+            new_rows = pd.concat([kept, new_rows], ignore_index=True)
+        if new_rows.empty and m not in set(months):
+            manifest["months"].pop(m, None)
+            continue
+        _write_month(store_dir, manifest, m, new_rows)
+
+    manifest["data_version"] = _data_version(manifest)
+    write_json_atomic(_manifest_path(store_dir), manifest)
+    _collect_garbage(store_dir, manifest)
+
+    if state is None:
+        state = FeatureState().bootstrap(cleaned)
+    state.save(state_path, manifest["data_version"])
+
+    summary = {
+        "status": "full" if full else "streamed" if streamed is not None else "incremental",
+        "rows": int(len(fresh)),
+        "symbols": len(dirty),
+        "data_version": manifest["data_version"]
+    }
+    print(f"✅ Feature store {summary['status']} build: "
+          f"{summary['rows']} rows recomputed across {len(touched)} month(s)")
+    return summary
+
+# ============================================================
+# READ
+# ============================================================
+
+def feature_store_version(store_dir: str = FEATURE_STORE_DIR):
+    """data_version of the committed store, or None if it was never built."""
+    manifest = _read_store_manifest(store_dir)
+    return manifest["data_version"] if manifest else None
+
+
+def _stale_reason(manifest: dict, master_dir: str):
+    """Why the committed store no longer matches its inputs, or None."""
+    if manifest["version"] != STORE_VERSION:
+        return "built by an older store version"
+    if manifest["regime_hash"] != regime_hash():
+        return "regime files changed"
+    if manifest["master_months"] != _master_months(master_dir):
+        return "master changed"
+    return None
+
+
+def load_features(as_of=None, start=None, columns=None, symbols=None,
+                  refresh: bool = False, store_dir: str = FEATURE_STORE_DIR,
+                  master_dir: str = MASTER_STORE_DIR) -> pd.DataFrame:
+    """
+    Feature rows with DATE in [start, as_of], as the full pipeline
+    (clean -> integrate_regimes(cutoff=as_of) -> add_features) produces
+    them for those dates. The pipeline's features node is the writer;
+    readers raise if the master or regime files moved on since the last
+    build (corporate flags are only re-checked by a build). `refresh`
+    builds first.
+    """
+    if refresh:
+        build_feature_store(store_dir, master_dir)
+
+    manifest = _read_store_manifest(store_dir)
+    if manifest is None:
+        raise RuntimeError(f"❌ Feature store not built: {store_dir}")
+
+    stale = _stale_reason(manifest, master_dir)
+    if stale is not None:
+        raise RuntimeError(
+            f"❌ Feature store is stale ({stale}); run the pipeline's features step first"
+        )
+
+    as_of = pd.to_datetime(as_of) if as_of is not None else None
+    start = pd.to_datetime(start) if start is not None else None
+
+    files = []
+    for month, entry in sorted(manifest["months"].items()):
+        lo, hi = month_bounds(month)
+        if start is not None and hi < start:
+            continue
+        if as_of is not None and lo > as_of:
+            continue
+        files.append(os.path.join(store_dir, entry["file"]))
+
+    all_columns = manifest["columns"]
+    columns = all_columns if columns is None else [c for c in all_columns if c in set(columns)]
+
+    if not files:
+        return pd.DataFrame(columns=columns)
+
+    flt = None
+    if start is not None:
+        flt = ds.field("DATE") >= pa.scalar(start, pa.timestamp("ns"))
+    if as_of is not None:
+        e = ds.field("DATE") <= pa.scalar(as_of, pa.timestamp("ns"))
+        flt = e if flt is None else flt & e
+    if symbols is not None:
+        s = ds.field("SYMBOL").isin(list(symbols))
+        flt = s if flt is None else flt & s
+
+    read = list(dict.fromkeys(columns + ["SYMBOL", "DATE"]))
+    df = ds.dataset(files, format="parquet").to_table(columns=read, filter=flt).to_pandas()
+
+    df = df.sort_values(["SYMBOL", "DATE"], kind="mergesort").reset_index(drop=True)
+    return df[columns]
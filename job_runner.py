@@ -0,0 +1,465 @@
+# ============================================================
+# job_runner.py
+# Local job queue + worker process for the strategy pipeline
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import hashlib
+import threading
+import subprocess
+import traceback
+import multiprocessing as mp
+from datetime import datetime
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl  # Unix only; elsewhere a single worker is assumed
+except ImportError:
+    fcntl = None
+
+from config import (
+    JOBS_DIR,
+    JOB_POLL_SEC,
+    WORKER_IDLE_EXIT_SEC
+)
+from store_io import write_json_atomic
+from pipeline_dag import PIPELINE, BACKTEST, pipeline_params, backtest_params, run_node
+from run_metrics import begin_run, set_profile_stage
+
+# ------------------------------------------------------------
+# LAYOUT
+# ------------------------------------------------------------
+# <JOBS_DIR>/<job_id>/job.json     kind, params, status, per-stage progress, results
+# <JOBS_DIR>/<job_id>/log.txt      everything the stages printed
+# <JOBS_DIR>/<job_id>/cancel       present once cancellation was requested
+# <JOBS_DIR>/<job_id>/claimed      created (O_EXCL) by the worker taking the job
+# <JOBS_DIR>/<key>.active          job_id currently serving these params
+# <JOBS_DIR>/_worker.json          worker pid + heartbeat
+# <JOBS_DIR>/_worker.log           worker output outside the jobs
+# <JOBS_DIR>/_worker.lock          flock held by the one running worker
+#
+# One worker process runs queued jobs one at a time (the stages write
+# the shared stores), each in its own child process so a cancel can
+# stop it mid-stage. The child leads its own process group, and a
+# cancel terminates the whole group, so training / backtest pool
+# workers it started stop with it. The app starts the worker detached
+# (own session), so stopping the app neither waits for nor kills it.
+#
+# A worker runs only while it holds the flock on _worker.lock; a second
+# one exits at once, so recovering the jobs of a dead worker never
+# touches a live one's. Stores commit through atomic manifest swaps, so
+# a terminated stage leaves at most garbage files that the next build
+# removes. Submitting params that an active job already serves returns
+# that job: the .active marker is created with O_EXCL. Stages are the
+# nodes of the job kind's pipeline_dag DAG (strategy pipeline or
+# backtest), so a job reruns only what its inputs invalidate.
+
+JOB_KINDS = {"pipeline": PIPELINE, "backtest": BACKTEST}
+STAGES = [node.name for node in PIPELINE]
+ACTIVE = {"queued", "running"}
+
+JOB_FILE = "job.json"
+LOG_FILE = "log.txt"
+CANCEL_FILE = "cancel"
+CLAIM_FILE = "claimed"
+WORKER_FILE = "_worker.json"
+WORKER_LOG = "_worker.log"
+WORKER_LOCK = "_worker.lock"
+
+_lock = threading.Lock()
+_worker = None
+
+# ============================================================
+# JOB FILES
+# ============================================================
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _job_dir(job_id: str, jobs_dir: str = JOBS_DIR) -> str:
+    return os.path.join(jobs_dir, job_id)
+
+
+def _read_job(job_id: str, jobs_dir: str = JOBS_DIR) -> dict:
+    with open(os.path.join(_job_dir(job_id, jobs_dir), JOB_FILE)) as f:
+        return json.load(f)
+
+
+def _save_job(job: dict, jobs_dir: str = JOBS_DIR):
+    # Unsorted: stages stay in run order
+    write_json_atomic(os.path.join(_job_dir(job["id"], jobs_dir), JOB_FILE), job,
+                      default=str, sort_keys=False)
+
+
+def _age(path: str) -> float:
+    try:
+        return time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        return float("inf")
+
+
+def _job_key(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _release(job: dict, jobs_dir: str):
+    """Drops the .active marker if it still points at this job."""
+    marker = os.path.join(jobs_dir, f"{job['key']}.active")
+    try:
+        with open(marker) as f:
+            if f.read().strip() == job["id"]:
+                os.remove(marker)
+    except FileNotFoundError:
+        pass
+
+# ============================================================
+# SUBMIT / STATUS / CANCEL
+# ============================================================
+
+def submit_pipeline_job(decision_date, entry_date=None, download=None,
+                        train_mode=None, profile_stage=None,
+                        jobs_dir: str = JOBS_DIR) -> str:
+    """
+    Queues the strategy pipeline for `decision_date` and returns its
+    job id; an active job with the same parameters is shared instead.
+    download=(start, end) strings fetch new data first; train_mode is
+    None (keep models), "full" or "incremental"; profile_stage names a
+    run_metrics stage to capture with cProfile + tracemalloc.
+    """
+    params = pipeline_params(decision_date, entry_date, download, train_mode)
+    return _submit("pipeline", params, profile_stage, jobs_dir)
+
+
+def submit_backtest_job(start, end, profile_stage=None, jobs_dir: str = JOBS_DIR) -> str:
+    """
+    Queues an out-of-sample backtest over [start, end] (feature store
+    refreshed first) and returns its job id; shared like pipeline jobs.
+    """
+    return _submit("backtest", backtest_params(start, end), profile_stage, jobs_dir)
+
+
+def _submit(kind: str, params: dict, profile_stage, jobs_dir: str) -> str:
+    key = _job_key({"kind": kind, **params})
+    marker = os.path.join(jobs_dir, f"{key}.active")
+    os.makedirs(jobs_dir, exist_ok=True)
+
+    while True:
+        try:
+            fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            status = None
+            try:
+                with open(marker) as f:
+                    existing = f.read().strip()
+                status = _read_job(existing, jobs_dir)["status"] if existing else None
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+
+            if status in ACTIVE:
+                return existing
+            if status is None and _age(marker) < 5:
+                # Another submit is still writing its job
+                time.sleep(0.05)
+                continue
+
+            # Marker left by a finished job
+            try:
+                os.remove(marker)
+            except FileNotFoundError:
+                pass
+            continue
+        break
+
+    job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    os.makedirs(_job_dir(job_id, jobs_dir))
+    _save_job({
+        "id": job_id,
+        "kind": kind,
+        "key": key,
+        "params": params,
+        "status": "queued",
+        "created": _now(),
+        "started": None,
+        "finished": None,
+        "stages": {node.name: {"status": "pending"} for node in JOB_KINDS[kind]},
+        "result": {},
+        "error": None,
+        "profile_stage": profile_stage
+    }, jobs_dir)
+
+    with os.fdopen(fd, "w") as f:
+        f.write(job_id)
+    return job_id
+
+
+def job_status(job_id: str, jobs_dir: str = JOBS_DIR) -> dict:
+    """job.json of `job_id` plus `progress` (finished stages / stages)."""
+    job = _read_job(job_id, jobs_dir)
+    done = sum(s["status"] in ("done", "reused", "skipped") for s in job["stages"].values())
+    job["progress"] = done / len(job["stages"])
+    return job
+
+
+def job_log(job_id: str, jobs_dir: str = JOBS_DIR) -> str:
+    path = os.path.join(_job_dir(job_id, jobs_dir), LOG_FILE)
+    if not os.path.exists(path):
+        return ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def cancel_job(job_id: str, jobs_dir: str = JOBS_DIR):
+    """Asks the worker to stop `job_id`; a queued job never starts."""
+    open(os.path.join(_job_dir(job_id, jobs_dir), CANCEL_FILE), "w").close()
+
+
+def list_jobs(limit: int = 20, jobs_dir: str = JOBS_DIR) -> pd.DataFrame:
+    """Most recent jobs first, one row each."""
+    if not os.path.isdir(jobs_dir):
+        return pd.DataFrame()
+    rows = []
+    for job_id in sorted(os.listdir(jobs_dir), reverse=True):
+        if not os.path.exists(os.path.join(_job_dir(job_id, jobs_dir), JOB_FILE)):
+            continue
+        job = _read_job(job_id, jobs_dir)
+        rows.append({
+            "id": job_id, "kind": job.get("kind", "pipeline"), "status": job["status"], **job["params"],
+            "created": job["created"], "finished": job["finished"], "error": job["error"]
+        })
+        if len(rows) >= limit:
+            break
+    return pd.DataFrame(rows)
+
+# ============================================================
+# STAGES (run inside the job's child process)
+# ============================================================
+
+def _run_job(job_id: str, jobs_dir: str):
+    """Child process body: runs the stages in order, recording each one."""
+    job_dir = _job_dir(job_id, jobs_dir)
+    log = open(os.path.join(job_dir, LOG_FILE), "a", buffering=1, encoding="utf-8")
+    sys.stdout = sys.stderr = log
+
+    job = _read_job(job_id, jobs_dir)
+    begin_run(job_id)
+    set_profile_stage(job.get("profile_stage"))
+    up = {}
+
+    for node in JOB_KINDS[job.get("kind", "pipeline")]:
+        stage = node.name
+        if os.path.exists(os.path.join(job_dir, CANCEL_FILE)):
+            return
+
+        job["stages"][stage] = {"status": "running", "started": _now()}
+        _save_job(job, jobs_dir)
+        print(f"--- {stage} ---")
+
+        t0 = time.perf_counter()
+        try:
+            status, out = run_node(node, job["params"], up, job_dir)
+        except Exception as e:
+            traceback.print_exc()
+            job["stages"][stage].update(status="failed", finished=_now(), error=str(e))
+            job["error"] = f"{stage}: {e}"
+            _save_job(job, jobs_dir)
+            raise SystemExit(1)
+
+        up[stage] = out
+        job["stages"][stage].update(
+            status=status,
+            finished=_now(),
+            seconds=round(time.perf_counter() - t0, 3)
+        )
+        if out is not None:
+            job["result"][stage] = out
+        _save_job(job, jobs_dir)
+
+def _job_main(job_id: str, jobs_dir: str):
+    """Child process entry: leads a process group for the job's own children."""
+    if hasattr(os, "setpgid"):
+        os.setpgid(0, 0)
+    _run_job(job_id, jobs_dir)
+
+# ============================================================
+# WORKER
+# ============================================================
+
+def _next_job(jobs_dir: str):
+    """Oldest queued job, claimed for this worker (O_EXCL claim file)."""
+    for job_id in sorted(os.listdir(jobs_dir)):
+        path = os.path.join(_job_dir(job_id, jobs_dir), JOB_FILE)
+        if not os.path.exists(path):
+            continue
+        try:
+            if _read_job(job_id, jobs_dir)["status"] != "queued":
+                continue
+            os.close(os.open(os.path.join(_job_dir(job_id, jobs_dir), CLAIM_FILE),
+                             os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except (FileExistsError, json.JSONDecodeError):
+            continue
+        return job_id
+    return None
+
+
+def _heartbeat(jobs_dir: str, job_id=None):
+    write_json_atomic(os.path.join(jobs_dir, WORKER_FILE),
+                      {"pid": os.getpid(), "heartbeat": time.time(), "job": job_id})
+
+
+def _finish(job_id: str, jobs_dir: str, status: str, error=None):
+    job = _read_job(job_id, jobs_dir)
+    for s in job["stages"].values():
+        if s["status"] in ("pending", "running"):
+            s["status"] = "cancelled" if status == "cancelled" else s["status"]
+    job.update(status=status, finished=_now())
+    if error and not job["error"]:
+        job["error"] = error
+    _save_job(job, jobs_dir)
+    _release(job, jobs_dir)
+
+
+def _terminate(child):
+    """Stops the job child together with every process in its group."""
+    try:
+        os.killpg(child.pid, signal.SIGTERM)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # No group of its own (yet, or not on this platform)
+        child.terminate()
+    child.join()
+
+
+def _execute(job_id: str, jobs_dir: str):
+    job_dir = _job_dir(job_id, jobs_dir)
+
+    if os.path.exists(os.path.join(job_dir, CANCEL_FILE)):
+        _finish(job_id, jobs_dir, "cancelled")
+        return
+
+    job = _read_job(job_id, jobs_dir)
+    job.update(status="running", started=_now())
+    _save_job(job, jobs_dir)
+
+    child = mp.get_context("spawn").Process(target=_job_main, args=(job_id, jobs_dir))
+    child.start()
+
+    while child.is_alive():
+        child.join(JOB_POLL_SEC)
+        _heartbeat(jobs_dir, job_id)
+        if child.is_alive() and os.path.exists(os.path.join(job_dir, CANCEL_FILE)):
+            _terminate(child)
+            _finish(job_id, jobs_dir, "cancelled")
+            return
+
+    if os.path.exists(os.path.join(job_dir, CANCEL_FILE)):
+        _finish(job_id, jobs_dir, "cancelled")
+    elif child.exitcode == 0:
+        _finish(job_id, jobs_dir, "done")
+    else:
+        _finish(job_id, jobs_dir, "failed", f"job process exited with code {child.exitcode}")
+
+
+@contextmanager
+def _worker_slot(jobs_dir: str):
+    """Yields True while this process is the only worker on `jobs_dir`."""
+    if fcntl is None:
+        yield True
+        return
+
+    fd = os.open(os.path.join(jobs_dir, WORKER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def _recover_orphans(jobs_dir: str):
+    # Jobs left behind by a worker that died: running ones, and queued
+    # ones it had claimed but not started (their claim would block them
+    # and their .active marker would capture every resubmit)
+    for job_id in sorted(os.listdir(jobs_dir)):
+        job_dir = _job_dir(job_id, jobs_dir)
+        if not os.path.exists(os.path.join(job_dir, JOB_FILE)):
+            continue
+        status = _read_job(job_id, jobs_dir)["status"]
+        claim = os.path.join(job_dir, CLAIM_FILE)
+        if status == "running":
+            _finish(job_id, jobs_dir, "failed", "worker stopped while the job was running")
+        elif status == "queued" and os.path.exists(claim):
+            _finish(job_id, jobs_dir, "failed", "worker stopped before the job started")
+            os.remove(claim)
+
+
+def _serve(jobs_dir: str, idle_exit: float):
+    idle_since = time.time()
+    while True:
+        _heartbeat(jobs_dir)
+        job_id = _next_job(jobs_dir)
+        if job_id is None:
+            if idle_exit and time.time() - idle_since > idle_exit:
+                return
+            time.sleep(JOB_POLL_SEC)
+            continue
+
+        _execute(job_id, jobs_dir)
+        idle_since = time.time()
+
+
+def run_worker(jobs_dir: str = JOBS_DIR, idle_exit: float = WORKER_IDLE_EXIT_SEC):
+    """Runs queued jobs until none has arrived for `idle_exit` seconds."""
+    os.makedirs(jobs_dir, exist_ok=True)
+
+    with _worker_slot(jobs_dir) as held:
+        if not held:
+            print(f"⚠️ Another worker is serving {jobs_dir}; exiting")
+            return
+        _recover_orphans(jobs_dir)
+        _serve(jobs_dir, idle_exit)
+
+
+def worker_alive(jobs_dir: str = JOBS_DIR) -> bool:
+    path = os.path.join(jobs_dir, WORKER_FILE)
+    try:
+        with open(path) as f:
+            beat = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return time.time() - beat["heartbeat"] < max(5.0, 5 * JOB_POLL_SEC)
+
+
+def ensure_worker(jobs_dir: str = JOBS_DIR) -> bool:
+    """Starts the worker process unless one is heartbeating. True if started."""
+    global _worker
+    with _lock:
+        if (_worker is not None and _worker.poll() is None) or worker_alive(jobs_dir):
+            return False
+        os.makedirs(jobs_dir, exist_ok=True)
+        # Keeps reruns from launching again while it starts; a second
+        # worker that does start exits on the worker lock
+        _heartbeat(jobs_dir)
+        with open(os.path.join(jobs_dir, WORKER_LOG), "a") as log:
+            _worker = subprocess.Popen(
+                [sys.executable, "-m", "job_runner", os.path.abspath(jobs_dir), str(WORKER_IDLE_EXIT_SEC)],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        return True
+
+
+if __name__ == "__main__":
+    # python -m job_runner [jobs_dir] [idle_exit_sec]; no idle exit by default
+    args = sys.argv[1:]
+    run_worker(args[0] if args else JOBS_DIR, float(args[1]) if len(args) > 1 else 0)
@@ -0,0 +1,509 @@
+# ============================================================
+# master_store.py
+# Columnar, date-partitioned storage behind MASTER_CSV
+# ============================================================
+
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+try:
+    import fcntl  # Unix only; elsewhere writers are serialized per process
+except ImportError:
+    fcntl = None
+
+from config import (
+    MASTER_CSV,
+    MASTER_STORE_DIR
+)
+from store_io import write_json_atomic, write_parquet_atomic, sha256_file, month_bounds
+from run_metrics import timed
+
+# ------------------------------------------------------------
+# SCHEMA
+# ------------------------------------------------------------
+# Parquet shards hold one calendar month of trading dates each, rows
+# ordered by (SYMBOL, DATE1) like the legacy CSV. Text columns stay
+# strings, DATE1 is a timestamp and everything else is float64.
+#
+# Shard files are immutable. Appends add a new shard per touched month
+# and the manifest is the single commit point: it is replaced
+# atomically, and any file it does not reference is garbage from an
+# interrupted write.
+#
+# Besides the shard list, every commit records what metadata queries
+# need, so they never open a shard:
+#
+#   symbols        symbol universe
+#   dates          {"YYYY-MM-DD": rows}
+#   rows, min_date, max_date
+#   content_hash   sha256 over the shards' own sha256 checksums
+#
+# Rows are symbol-major inside a shard, so a date has no single row
+# offset. Its location is the shards whose own "dates" map lists it;
+# dedupe and date reads open only those and filter on DATE1.
+#
+# Writers run in several processes (app, job worker, benchmarks). Each
+# read-manifest -> write shards -> commit -> collect-garbage sequence
+# holds an exclusive flock on <store>/.lock, so no commit is lost and
+# garbage collection never sees another writer's shards half-way.
+
+TEXT_COLUMNS = ["SYMBOL", "SERIES"]
+DATE_COLUMN = "DATE1"
+SORT_KEY = ["SYMBOL", "DATE1"]
+
+MANIFEST_FILE = "_manifest.json"
+LOCK_FILE = ".lock"
+
+# Months holding more shards than this are merged back into one file
+COMPACT_AFTER_SHARDS = 8
+
+# Parsed manifests for the read-only metadata queries
+_manifest_cache = {}
+_manifest_lock = threading.Lock()
+
+# Write-lock depth per store for this thread (write_master runs inside
+# append_master's lock)
+_held = threading.local()
+_process_write_lock = threading.RLock()
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+@contextmanager
+def _write_lock(store_dir: str):
+    """Exclusive, cross-process lock on the store for one write sequence."""
+    os.makedirs(store_dir, exist_ok=True)
+    key = os.path.abspath(store_dir)
+    depth = getattr(_held, "depth", {})
+    _held.depth = depth
+
+    if depth.get(key):
+        depth[key] += 1
+        try:
+            yield
+        finally:
+            depth[key] -= 1
+        return
+
+    if fcntl is None:
+        with _process_write_lock:
+            depth[key] = 1
+            try:
+                yield
+            finally:
+                depth[key] = 0
+        return
+
+    fd = os.open(os.path.join(store_dir, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        depth[key] = 1
+        try:
+            yield
+        finally:
+            depth[key] = 0
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _shard_name(month, generation: int) -> str:
+    return f"{month}-{generation:06d}.parquet"
+
+
+def _to_numeric(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype("float64")
+    s = (
+        s.astype(str)
+        .str.replace(",", "", regex=False)
+        .str.replace("%", "", regex=False)
+        .str.strip()
+    )
+    return pd.to_numeric(s, errors="coerce").astype("float64")
+
+
+def normalize_master_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Strips headers and casts a raw master/bhavcopy frame to the store schema."""
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.upper()
+
+    if DATE_COLUMN not in df.columns and "DATE" in df.columns:
+        df = df.rename(columns={"DATE": DATE_COLUMN})
+
+    for col in df.columns:
+        if col in TEXT_COLUMNS:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str).str.strip())
+        elif col == DATE_COLUMN:
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(
+                    df[col].astype(str).str.strip(), format="mixed"
+                )
+            df[col] = df[col].astype("datetime64[ns]")
+        else:
+            df[col] = _to_numeric(df[col])
+
+    return df
+
+
+def _read_manifest(store_dir: str) -> dict:
+    with open(master_manifest_path(store_dir)) as f:
+        return json.load(f)
+
+
+def _date_counts(df: pd.DataFrame) -> dict:
+    counts = df[DATE_COLUMN].dt.strftime("%Y-%m-%d").value_counts()
+    return {d: int(n) for d, n in counts.items()}
+
+
+def _empty_manifest(columns) -> dict:
+    return {
+        "columns": list(columns),
+        "generation": 0,
+        "symbols": [],
+        "dates": {},
+        "shards": {}
+    }
+
+
+def _collect_garbage(store_dir: str, manifest: dict):
+    """Removes shard files not referenced by the committed manifest."""
+    live = set(manifest["shards"])
+    for f in os.listdir(store_dir):
+        if f == MANIFEST_FILE:
+            continue
+        if f.endswith(".tmp") or (f.endswith(".parquet") and f not in live):
+            os.remove(os.path.join(store_dir, f))
+
+
+def _summarize(store_dir: str, manifest: dict):
+    """Recomputes the metadata fields from the shard list before a commit."""
+    for name, shard in manifest["shards"].items():
+        if "sha256" not in shard:
+            shard["sha256"] = sha256_file(os.path.join(store_dir, name))
+
+    dates = sorted(d for d, n in manifest["dates"].items() if n)
+    counts = [manifest["dates"][d] for d in dates]
+
+    manifest["dates"] = dict(zip(dates, counts))
+    manifest["rows"] = int(sum(counts))
+    manifest["min_date"] = dates[0] if dates else None
+    manifest["max_date"] = dates[-1] if dates else None
+    manifest["content_hash"] = hashlib.sha256(json.dumps(
+        sorted([n, s["sha256"]] for n, s in manifest["shards"].items())
+    ).encode()).hexdigest()
+
+
+def _commit(store_dir: str, manifest: dict):
+    _summarize(store_dir, manifest)
+    write_json_atomic(master_manifest_path(store_dir), manifest)
+    _collect_garbage(store_dir, manifest)
+
+
+def _add_shards(store_dir: str, manifest: dict, df: pd.DataFrame):
+    """Writes `df` as one new shard per month and registers them in `manifest`."""
+    df = df.sort_values(SORT_KEY, kind="mergesort").reset_index(drop=True)
+    months = df[DATE_COLUMN].dt.to_period("M")
+
+    for month, part in df.groupby(months, sort=True):
+        manifest["generation"] += 1
+        name = _shard_name(month, manifest["generation"])
+        sha = write_parquet_atomic(part, os.path.join(store_dir, name))
+
+        dates = _date_counts(part)
+        manifest["shards"][name] = {
+            "month": str(month),
+            "rows": int(len(part)),
+            "dates": dates,
+            "sha256": sha
+        }
+        for d, n in dates.items():
+            manifest["dates"][d] = manifest["dates"].get(d, 0) + n
+
+    manifest["symbols"] = sorted(
+        set(manifest["symbols"]) | set(df["SYMBOL"].unique())
+    )
+
+# ============================================================
+# STORE STATE
+# ============================================================
+
+def master_manifest_path(store_dir: str = MASTER_STORE_DIR) -> str:
+    """Path of the committed manifest; its mtime changes on every commit."""
+    return os.path.join(store_dir, MANIFEST_FILE)
+
+
+def store_exists(store_dir: str = MASTER_STORE_DIR) -> bool:
+    return os.path.exists(master_manifest_path(store_dir))
+
+
+def master_exists() -> bool:
+    return store_exists() or os.path.exists(MASTER_CSV)
+
+
+def master_manifest(store_dir: str = MASTER_STORE_DIR) -> dict:
+    """
+    The committed manifest, parsed once and kept until the file changes
+    (one stat per call). Shared and read-only: do not modify it.
+    """
+    if not store_exists(store_dir):
+        load_master(columns=["DATE1"], store_dir=store_dir)
+
+    path = os.path.abspath(master_manifest_path(store_dir))
+    with _manifest_lock:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = _manifest_cache.get(path)
+        if entry is not None and entry["stamp"] == stamp:
+            return entry["manifest"]
+
+        manifest = _read_manifest(store_dir)
+        if "content_hash" not in manifest:
+            # Written before the metadata fields existed
+            with _write_lock(store_dir):
+                manifest = _read_manifest(store_dir)
+                if "content_hash" not in manifest:
+                    _commit(store_dir, manifest)
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+
+        _manifest_cache[path] = {"stamp": stamp, "manifest": manifest}
+        return manifest
+
+
+def master_info(store_dir: str = MASTER_STORE_DIR) -> dict:
+    """Row count, date range, sizes and content hash of the store."""
+    m = master_manifest(store_dir)
+    return {
+        "rows": m["rows"],
+        "min_date": m["min_date"],
+        "max_date": m["max_date"],
+        "dates": len(m["dates"]),
+        "symbols": len(m["symbols"]),
+        "shards": len(m["shards"]),
+        "generation": m["generation"],
+        "content_hash": m["content_hash"]
+    }
+
+
+def master_symbols(store_dir: str = MASTER_STORE_DIR) -> set:
+    """Symbol universe of the store, answered from the manifest."""
+    return set(master_manifest(store_dir)["symbols"])
+
+
+def master_date_counts(store_dir: str = MASTER_STORE_DIR) -> dict:
+    """{"YYYY-MM-DD": rows} for every stored trading date, from the manifest."""
+    return dict(master_manifest(store_dir)["dates"])
+
+# ============================================================
+# WRITE
+# ============================================================
+
+def write_master(df: pd.DataFrame, store_dir: str = MASTER_STORE_DIR):
+    """Replaces the store contents with `df`, one shard per month."""
+    os.makedirs(store_dir, exist_ok=True)
+
+    df = normalize_master_frame(df)
+
+    with _write_lock(store_dir):
+        manifest = _empty_manifest(df.columns)
+        if store_exists(store_dir):
+            manifest["generation"] = _read_manifest(store_dir)["generation"]
+
+        _add_shards(store_dir, manifest, df)
+        _commit(store_dir, manifest)
+
+
+def _existing_keys(store_dir: str, manifest: dict, dates) -> pd.MultiIndex:
+    """(SYMBOL, DATE1) keys already stored for `dates`, read from their shards only."""
+    wanted = set(dates)
+    files = [
+        os.path.join(store_dir, name)
+        for name, shard in manifest["shards"].items()
+        if wanted & set(shard["dates"])
+    ]
+
+    ts = pa.array(pd.to_datetime(sorted(wanted)), pa.timestamp("ns"))
+    keys = ds.dataset(files, format="parquet").to_table(
+        columns=SORT_KEY, filter=ds.field(DATE_COLUMN).isin(ts)
+    ).to_pandas()
+
+    return pd.MultiIndex.from_frame(keys[SORT_KEY])
+
+
+def _compact_month(store_dir: str, manifest: dict, month: str):
+    names = sorted(
+        n for n, shard in manifest["shards"].items() if shard["month"] == month
+    )
+    if len(names) <= COMPACT_AFTER_SHARDS:
+        return
+
+    part = ds.dataset(
+        [os.path.join(store_dir, n) for n in names], format="parquet"
+    ).to_table().to_pandas()
+
+    for n in names:
+        for d, c in manifest["shards"].pop(n)["dates"].items():
+            manifest["dates"][d] -= c
+
+    _add_shards(store_dir, manifest, part)
+
+
+@timed("master.append", rows=int)
+def append_master(df: pd.DataFrame, store_dir: str = MASTER_STORE_DIR) -> int:
+    """
+    Appends rows whose (SYMBOL, DATE1) key is not already stored.
+    Only shards holding the incoming dates are consulted, so the cost
+    scales with the new data rather than the history. Returns rows added.
+    """
+    df = normalize_master_frame(df)
+    df = df.drop_duplicates(SORT_KEY, keep="first")
+
+    with _write_lock(store_dir):
+        if not store_exists(store_dir):
+            write_master(df, store_dir)
+            return len(df)
+
+        manifest = _read_manifest(store_dir)
+        columns = manifest["columns"]
+
+        new_dates = set(df[DATE_COLUMN].dt.strftime("%Y-%m-%d"))
+        seen_dates = new_dates & set(manifest["dates"])
+
+        if seen_dates:
+            keys = _existing_keys(store_dir, manifest, seen_dates)
+            df = df[~pd.MultiIndex.from_frame(df[SORT_KEY]).isin(keys)]
+
+        if df.empty:
+            return 0
+
+        df = normalize_master_frame(df.reindex(columns=columns))
+        _add_shards(store_dir, manifest, df)
+
+        for month in sorted(set(df[DATE_COLUMN].dt.to_period("M").astype(str))):
+            _compact_month(store_dir, manifest, month)
+
+        _commit(store_dir, manifest)
+        return len(df)
+
+
+def migrate_master_csv(csv_path: str = MASTER_CSV, store_dir: str = MASTER_STORE_DIR):
+    """One-time conversion of the legacy master CSV into the columnar store."""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Master CSV not found: {csv_path}")
+
+    df = pd.read_csv(csv_path, low_memory=False)
+    write_master(df, store_dir)
+
+    print(f"✅ Migrated {len(df)} rows from {csv_path} into {store_dir}")
+
+
+def export_master_csv(csv_path: str = MASTER_CSV, store_dir: str = MASTER_STORE_DIR):
+    """Writes the store back out as a flat CSV for tools that still need one."""
+    df = load_master(store_dir=store_dir)
+    df.sort_values(SORT_KEY, kind="mergesort").to_csv(csv_path, index=False)
+    return csv_path
+
+# ============================================================
+# READ
+# ============================================================
+
+def _read_store(store_dir, columns, start, end, symbols) -> pd.DataFrame:
+    try:
+        return _read_shards(store_dir, columns, start, end, symbols)
+    except FileNotFoundError:
+        # Another process compacted a month between our manifest read
+        # and the shard open; its new manifest lists the merged shard
+        return _read_shards(store_dir, columns, start, end, symbols)
+
+
+def _read_shards(store_dir, columns, start, end, symbols) -> pd.DataFrame:
+    manifest = master_manifest(store_dir)
+    all_columns = manifest["columns"]
+
+    files = []
+    for name, shard in sorted(manifest["shards"].items()):
+        lo, hi = month_bounds(shard["month"])
+        if start is not None and hi < start:
+            continue
+        if end is not None and lo > end:
+            continue
+        files.append(os.path.join(store_dir, name))
+
+    if columns is None:
+        columns = all_columns
+    columns = [c for c in all_columns if c in set(columns)]
+
+    if not files:
+        return normalize_master_frame(pd.DataFrame(columns=columns))
+
+    flt = None
+    if start is not None:
+        flt = ds.field(DATE_COLUMN) >= pa.scalar(start, pa.timestamp("ns"))
+    if end is not None:
+        e = ds.field(DATE_COLUMN) <= pa.scalar(end, pa.timestamp("ns"))
+        flt = e if flt is None else flt & e
+    if symbols is not None:
+        s = ds.field("SYMBOL").isin(list(symbols))
+        flt = s if flt is None else flt & s
+
+    table = ds.dataset(files, format="parquet").to_table(
+        columns=columns, filter=flt
+    )
+    return table.to_pandas()
+
+
+def _read_csv(csv_path, columns, start, end, symbols) -> pd.DataFrame:
+    usecols = None
+    if columns is not None:
+        wanted = {c.strip().upper() for c in columns} | {DATE_COLUMN, "DATE", "SYMBOL"}
+        usecols = lambda c: c.strip().upper() in wanted
+
+    df = normalize_master_frame(
+        pd.read_csv(csv_path, usecols=usecols, low_memory=False)
+    )
+
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df[DATE_COLUMN] >= start).to_numpy()
+    if end is not None:
+        mask &= (df[DATE_COLUMN] <= end).to_numpy()
+    if symbols is not None:
+        mask &= df["SYMBOL"].isin(list(symbols)).to_numpy()
+
+    df = df[mask].reset_index(drop=True)
+    if columns is not None:
+        df = df[[c for c in df.columns if c in set(columns)]]
+    return df
+
+
+def load_master(columns=None, start=None, end=None, symbols=None,
+                source: str = MASTER_CSV, store_dir: str = MASTER_STORE_DIR) -> pd.DataFrame:
+    """
+    Loads master rows, reading only the requested columns and date range.
+    `source` defaults to MASTER_CSV, which is served from the columnar
+    store (migrated on first use). Any other path is parsed as a CSV.
+    """
+    start = pd.to_datetime(start) if start is not None else None
+    end = pd.to_datetime(end) if end is not None else None
+
+    if os.path.abspath(source) != os.path.abspath(MASTER_CSV):
+        return _read_csv(source, columns, start, end, symbols)
+
+    if not store_exists(store_dir):
+        migrate_master_csv(source, store_dir)
+
+    return _read_store(store_dir, columns, start, end, symbols)
+
+
+if __name__ == "__main__":
+    migrate_master_csv()
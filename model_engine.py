@@ -1,10 +1,14 @@
 # ============================================================
 # model_engine.py
-# Train & save macro-wise models (NO LOGIC CHANGES)
+# Train & save macro-wise models (process pool, hist drift check, warm start)
 # ============================================================
 
-import os
-import joblib
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
 import xgboost as xgb
 import pandas as pd
 
@@ -12,14 +16,169 @@ from config import (
     FEATURES,
     HOLDING_DAYS,
     MIN_TRAIN_ROWS,
-    MODEL_DIR
+    MODEL_DIR,
+    TRAIN_CORES,
+    TRAIN_TREE_METHOD,
+    HIST_VALIDATE,
+    HIST_MIN_RANK_CORR,
+    INCREMENTAL_TREES,
+    INCREMENTAL_MIN_ROWS,
+    MAX_INCREMENTAL_UPDATES,
+    DRIFT_MAX_RMSE_RATIO,
+    HOLDOUT_FRACTION
+)
+from feature_store import load_features
+from model_registry import save_model, load_models, model_meta
+from run_metrics import timed, set_rows
+
+XGB_PARAMS = dict(
+    n_estimators=300,
+    max_depth=6,
+    learning_rate=0.05,
+    subsample=0.8,
+    colsample_bytree=0.8,
+    objective="reg:squarederror",
+    random_state=42,
+    n_jobs=1,
+    tree_method="exact"
 )
 
+# ============================================================
+# SCHEDULER
+# ============================================================
+# Each (macro, tree_method) fit is one job. The core budget is split
+# into workers x XGBoost threads; with a fixed random_state the fitted
+# trees do not depend on the thread count, so results match the
+# sequential n_jobs=1 run. Workers are spawned, not forked, because
+# OpenMP state in a forked child of a process that already ran
+# XGBoost can deadlock.
+
+def _split_cores(n_jobs: int, cores: int):
+    workers = max(1, min(n_jobs, cores))
+    return workers, max(1, cores // workers)
+
+
+def _fit(job):
+    macro, tree_method, threads, X, y = job
+    t0 = time.perf_counter()
+
+    model = xgb.XGBRegressor(**{**XGB_PARAMS, "tree_method": tree_method, "n_jobs": threads})
+    model.fit(X, y)
+
+    # Saved models keep the reference thread setting for scoring
+    model.set_params(n_jobs=XGB_PARAMS["n_jobs"])
+    return macro, tree_method, model, time.perf_counter() - t0
+
+
+def _run_jobs(jobs: list, cores: int) -> list:
+    workers, threads = _split_cores(len(jobs), cores)
+    # Largest groups first so the pool does not end on one long fit
+    jobs = sorted(jobs, key=lambda j: -len(j[2]))
+    jobs = [(m, tm, threads, X, y) for m, tm, X, y in jobs]
+
+    if workers == 1:
+        return [_fit(j) for j in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        return list(pool.map(_fit, jobs))
+
+# ============================================================
+# HIST VS EXACT DRIFT
+# ============================================================
+
+def _drift(hist_model, exact_model, X) -> dict:
+    a = exact_model.predict(X)
+    b = hist_model.predict(X)
+    return {
+        "max_abs_diff": float(np.max(np.abs(a - b))) if len(a) else 0.0,
+        "rank_corr": float(pd.Series(a).corr(pd.Series(b), method="spearman"))
+    }
+
+# ============================================================
+# INCREMENTAL POLICY
+# ============================================================
+# A saved model is continued (INCREMENTAL_TREES more rounds on rows
+# after its train_end watermark) unless a full refit is due: no usable
+# watermark, changed features, MAX_INCREMENTAL_UPDATES reached, or the
+# model's RMSE on the new rows has drifted past DRIFT_MAX_RMSE_RATIO x
+# the holdout RMSE recorded at its last full fit.
+#
+# The holdout RMSE comes from a second fit on all but the last
+# HOLDOUT_FRACTION of sessions, scored on those sessions. Rows whose
+# target window reaches into the holdout are embargoed, so the score is
+# out of sample like the new rows it is compared with; in-sample RMSE
+# is biased low and would force full refits too often. Models saved
+# before the holdout existed fall back to their train_rmse.
+
+def _rmse(model, X, y) -> float:
+    return float(np.sqrt(np.mean((model.predict(X) - y.to_numpy()) ** 2)))
+
+
+def _holdout(d: pd.DataFrame):
+    """(fit rows, holdout rows), or None when too few sessions to split."""
+    dates = np.sort(d["DATE"].unique())
+    n_hold = max(1, int(len(dates) * HOLDOUT_FRACTION))
+    n_fit = len(dates) - n_hold - HOLDING_DAYS
+    if n_fit < 1:
+        return None
+    return d[d["DATE"] < dates[n_fit]], d[d["DATE"] >= dates[-n_hold]]
+
+
+def _plan(d: pd.DataFrame, model, meta: dict):
+    """("incremental", new_rows) | ("full", reason) | ("kept", reason)"""
+    if model is None or not meta.get("train_end"):
+        return "full", "no previous model with a training watermark"
+    if meta.get("features") != list(FEATURES):
+        return "full", "feature list changed"
+
+    updates = meta.get("incremental_updates", 0)
+    if updates >= MAX_INCREMENTAL_UPDATES:
+        return "full", f"{updates} incremental updates since last full fit"
+
+    new = d[d["DATE"] > pd.Timestamp(meta["train_end"])]
+    if len(new) < INCREMENTAL_MIN_ROWS:
+        return "kept", f"only {len(new)} rows past {meta['train_end']}"
+
+    baseline = meta.get("holdout_rmse") or meta.get("train_rmse")
+    if baseline:
+        ratio = _rmse(model, new[FEATURES], new["target"]) / baseline
+        if ratio > DRIFT_MAX_RMSE_RATIO:
+            return "full", f"drift: new-row RMSE {ratio:.2f}x holdout RMSE"
+
+    return "incremental", new
+
+
+def _continue(model, meta: dict, new: pd.DataFrame):
+    t0 = time.perf_counter()
+    tree_method = (meta.get("params") or {}).get("tree_method", XGB_PARAMS["tree_method"])
+
+    inc = xgb.XGBRegressor(**{
+        **XGB_PARAMS, "tree_method": tree_method, "n_estimators": INCREMENTAL_TREES
+    })
+    inc.fit(new[FEATURES], new["target"], xgb_model=model.get_booster())
+    return inc, time.perf_counter() - t0
+
 # ============================================================
 # TRAIN & SAVE MODELS
 # ============================================================
 
-def train_and_save_models(train_df: pd.DataFrame):
+@timed("train")
+def train_and_save_models(train_df: pd.DataFrame = None, as_of=None,
+                          cores: int = TRAIN_CORES,
+                          tree_method: str = TRAIN_TREE_METHOD,
+                          validate_hist: bool = HIST_VALIDATE,
+                          mode: str = "full",
+                          model_dir: str = MODEL_DIR) -> pd.DataFrame:
+    """
+    Without `train_df`, trains on the feature store as of `as_of`.
+    mode="full" refits every macro group; mode="incremental" continues
+    the saved models where the policy above allows. Full fits run
+    concurrently within `cores`. Models go to `model_dir`. Returns one
+    row per macro group.
+    """
+
+    if train_df is None:
+        train_df = load_features(as_of=as_of)
 
     df = train_df.copy()
 
@@ -39,11 +198,13 @@ def train_and_save_models(train_df: pd.DataFrame):
     df = df.dropna(
         subset=FEATURES + ["target", "macro_group"]
     )
+    set_rows(len(df))
 
     # --------------------------------------------------------
     # Train per macro group
     # --------------------------------------------------------
 
+    groups = {}
     for macro in sorted(df["macro_group"].unique()):
 
         d = df[df["macro_group"] == macro]
@@ -51,24 +212,116 @@ def train_and_save_models(train_df: pd.DataFrame):
         if len(d) < MIN_TRAIN_ROWS:
             continue
 
-        model = xgb.XGBRegressor(
-            n_estimators=300,
-            max_depth=6,
-            learning_rate=0.05,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            objective="reg:squarederror",
-            random_state=42,
-            n_jobs=1,
-            tree_method="exact"
-        )
+        groups[macro] = d
+
+    # --------------------------------------------------------
+    # Decide full refit vs incremental per macro
+    # --------------------------------------------------------
+
+    plans = {m: ("full", "full retrain requested") for m in groups}
+    previous = load_models(model_dir) if mode == "incremental" else {}
+
+    if mode == "incremental":
+        for macro, d in groups.items():
+            plans[macro] = _plan(d, previous.get(int(macro)), model_meta(macro, model_dir))
+
+    full = [m for m, (kind, _) in plans.items() if kind == "full"]
+
+    methods = [tree_method]
+    if tree_method == "hist" and validate_hist:
+        methods.append("exact")
+
+    jobs = [(m, tm, groups[m][FEATURES], groups[m]["target"]) for m in full for tm in methods]
+
+    # Out-of-sample baseline for the drift check, fitted alongside
+    splits = {m: _holdout(groups[m]) for m in full}
+    for m, split in splits.items():
+        if split:
+            jobs.append(((m, "holdout"), tree_method, split[0][FEATURES], split[0]["target"]))
+
+    t0 = time.perf_counter()
+    results = _run_jobs(jobs, cores)
+    fitted = {(m, tm): (model, secs) for m, tm, model, secs in results}
+
+    # --------------------------------------------------------
+    # Save (hist falls back to exact if predictions drift)
+    # --------------------------------------------------------
+
+    report = []
+    for macro, d in groups.items():
+        kind, detail = plans[macro]
+
+        if kind == "kept":
+            report.append({"macro_group": macro, "rows": len(d), "mode": "kept",
+                           "reason": detail, "seconds": 0.0})
+            continue
+
+        if kind == "incremental":
+            prev = model_meta(macro, model_dir)
+            model, secs = _continue(previous[int(macro)], prev, detail)
+
+            save_model(model, macro, {
+                **prev,
+                "trained_at": datetime.now().isoformat(timespec="seconds"),
+                "train_end": str(d["DATE"].max().date()),
+                "rows": int(prev.get("rows") or 0) + int(len(detail)),
+                "mode": "incremental",
+                "incremental_updates": prev.get("incremental_updates", 0) + 1,
+                "n_trees": prev.get("n_trees", XGB_PARAMS["n_estimators"]) + INCREMENTAL_TREES,
+                "train_seconds": round(secs, 3)
+            }, model_dir)
+
+            report.append({"macro_group": macro, "rows": len(detail), "mode": "incremental",
+                           "reason": f"+{INCREMENTAL_TREES} trees", "seconds": round(secs, 3)})
+            continue
+
+        model, secs = fitted[(macro, tree_method)]
+        used, drift = tree_method, {}
+
+        if (macro, "exact") in fitted and tree_method != "exact":
+            exact, exact_secs = fitted[(macro, "exact")]
+            drift = _drift(model, exact, d[FEATURES])
+            drift["exact_seconds"] = round(exact_secs, 3)
+            if not drift["rank_corr"] >= HIST_MIN_RANK_CORR:
+                print(f"⚠️ Macro {macro}: hist rank corr {drift['rank_corr']:.4f} "
+                      f"< {HIST_MIN_RANK_CORR}, keeping exact model")
+                model, used, secs = exact, "exact", exact_secs
+
+        holdout_rmse = None
+        if splits[macro]:
+            held, _ = fitted[((macro, "holdout"), tree_method)]
+            test = splits[macro][1]
+            holdout_rmse = _rmse(held, test[FEATURES], test["target"])
+
+        save_model(model, macro, {
+            "trained_at": datetime.now().isoformat(timespec="seconds"),
+            "train_start": str(d["DATE"].min().date()),
+            "train_end": str(d["DATE"].max().date()),
+            "rows": int(len(d)),
+            "features": list(FEATURES),
+            "target": f"{HOLDING_DAYS}-day forward return",
+            "params": {**XGB_PARAMS, "tree_method": used},
+            "mode": "full",
+            "incremental_updates": 0,
+            "n_trees": XGB_PARAMS["n_estimators"],
+            "train_rmse": _rmse(model, d[FEATURES], d["target"]),
+            "holdout_rmse": holdout_rmse,
+            "train_seconds": round(secs, 3),
+            "hist_drift": drift or None
+        }, model_dir)
 
-        model.fit(d[FEATURES], d["target"])
+        report.append({
+            "macro_group": macro, "rows": len(d), "mode": "full", "reason": detail,
+            "tree_method": used, "seconds": round(secs, 3), **drift
+        })
 
-        model_path = os.path.join(
-            MODEL_DIR, f"macro_{float(macro)}.joblib"
-        )
+    wall = time.perf_counter() - t0
+    report = pd.DataFrame(report)
 
-        joblib.dump(model, model_path)
+    workers, threads = _split_cores(len(results), cores)
+    print(f"✅ Models trained & saved successfully "
+          f"({len(groups)} macro groups, {workers} workers x {threads} threads, {wall:.1f}s)")
+    if not report.empty:
+        print(report.to_string(index=False))
 
-    print("✅ Models trained & saved successfully")
+    return report
@@ -0,0 +1,272 @@
+# ============================================================
+# model_registry.py
+# Warm, mtime-validated registry of macro models (native XGBoost)
+# ============================================================
+
+import os
+import re
+import json
+import threading
+from datetime import datetime
+
+import joblib
+import pandas as pd
+import xgboost as xgb
+
+from config import (
+    FEATURES,
+    MODEL_DIR,
+    MODEL_FORMAT
+)
+from store_io import write_json_atomic, sha256_file
+
+# ------------------------------------------------------------
+# LAYOUT
+# ------------------------------------------------------------
+# macro_<id>.<ubj|json>   model in XGBoost's own format
+# macro_<id>.meta.json    training metadata + sha256 of the model file
+#
+# Models are loaded once per process and kept warm. Each lookup only
+# stats the files; a model is re-read when its mtime or size (or its
+# metadata's mtime) changes, and its checksum is verified at that point.
+# A model whose checksum does not match is never served: the copy loaded
+# before it changed is kept if there is one, otherwise it is skipped.
+#
+# Legacy macro_<id>.joblib pickles are converted once per process and
+# then moved to legacy_joblib/, so later loads do not see them again.
+
+MODEL_PATTERN = re.compile(r"^macro_(-?\d+(?:\.\d+)?)\.(ubj|json)$")
+LEGACY_PATTERN = re.compile(r"^macro_(-?\d+(?:\.\d+)?)\.joblib$")
+LEGACY_ARCHIVE_DIR = "legacy_joblib"
+
+_cache = {}
+_lock = threading.Lock()
+
+# Legacy pickles that failed to convert, so they are reported once
+_unconvertible = set()
+
+# Model directories already migrated by this process
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def _stem(macro) -> str:
+    return f"macro_{float(macro)}"
+
+
+def _meta_path(model_dir: str, macro) -> str:
+    return os.path.join(model_dir, f"{_stem(macro)}.meta.json")
+
+
+def _read_meta(model_dir: str, macro) -> dict:
+    path = _meta_path(model_dir, macro)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_meta(model_dir: str, macro, meta: dict):
+    write_json_atomic(_meta_path(model_dir, macro), meta, default=str)
+
+# ============================================================
+# SAVE
+# ============================================================
+
+def save_model(model, macro, meta: dict = None,
+               model_dir: str = MODEL_DIR, fmt: str = MODEL_FORMAT) -> str:
+    """
+    Writes `model` in native format next to its metadata. The model file
+    is swapped in atomically; the checksum in the metadata ties the two.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+
+    path = os.path.join(model_dir, f"{_stem(macro)}.{fmt}")
+    # XGBoost picks the format from the extension, so it must stay last
+    tmp = os.path.join(model_dir, f".{_stem(macro)}.tmp.{fmt}")
+    model.save_model(tmp)
+    sha = sha256_file(tmp)
+    os.replace(tmp, path)
+
+    # A model in the other native format would shadow this one
+    for other in ("ubj", "json"):
+        stale = os.path.join(model_dir, f"{_stem(macro)}.{other}")
+        if other != fmt and os.path.exists(stale):
+            os.remove(stale)
+
+    _write_meta(model_dir, macro, {
+        **(meta or {}),
+        "macro_group": float(macro),
+        "format": fmt,
+        "sha256": sha,
+        "saved_at": datetime.now().isoformat(timespec="seconds"),
+        "xgboost_version": xgb.__version__
+    })
+    return path
+
+
+def _archive_legacy(model_dir: str, f: str):
+    archive = os.path.join(model_dir, LEGACY_ARCHIVE_DIR)
+    os.makedirs(archive, exist_ok=True)
+    os.replace(os.path.join(model_dir, f), os.path.join(archive, f))
+
+
+def migrate_joblib_models(model_dir: str = MODEL_DIR, fmt: str = MODEL_FORMAT) -> int:
+    """
+    Converts legacy macro_*.joblib pickles to the native format and moves
+    them to legacy_joblib/. Pickles that already have a native copy are
+    only archived; ones that fail to convert stay put and are reported once.
+    """
+    if not os.path.isdir(model_dir):
+        return 0
+
+    native = {
+        float(m.group(1)) for m in map(MODEL_PATTERN.match, os.listdir(model_dir)) if m
+    }
+
+    n = 0
+    for f in sorted(os.listdir(model_dir)):
+        m = LEGACY_PATTERN.match(f)
+        if not m:
+            continue
+        if float(m.group(1)) in native:
+            _archive_legacy(model_dir, f)
+            continue
+
+        path = os.path.join(model_dir, f)
+        key = (path, os.path.getmtime(path))
+        if key in _unconvertible:
+            continue
+        try:
+            model = joblib.load(path)
+            features = getattr(model, "feature_names_in_", None)
+            save_model(model, float(m.group(1)), {
+                "trained_at": datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds"),
+                "rows": None,
+                "features": list(features) if features is not None else list(FEATURES),
+                "migrated_from": f
+            }, model_dir, fmt)
+        except Exception as e:
+            print(f"⚠️ Could not convert legacy model {f}: {e}")
+            _unconvertible.add(key)
+            continue
+        _archive_legacy(model_dir, f)
+        n += 1
+
+    if n:
+        print(f"✅ Converted {n} legacy joblib model(s) to .{fmt} (originals in {LEGACY_ARCHIVE_DIR}/)")
+    return n
+
+
+def _migrate_once(model_dir: str):
+    with _migrate_lock:
+        if model_dir in _migrated:
+            return
+        migrate_joblib_models(model_dir)
+        if os.path.isdir(model_dir):
+            _migrated.add(model_dir)
+
+# ============================================================
+# LOAD (WARM)
+# ============================================================
+
+def _load_entry(model_dir: str, f: str, macro: float) -> dict:
+    path = os.path.join(model_dir, f)
+
+    model = xgb.XGBRegressor()
+    model.load_model(path)
+
+    meta = _read_meta(model_dir, macro)
+    if meta.get("sha256") and meta["sha256"] != sha256_file(path):
+        raise RuntimeError("checksum does not match its metadata")
+
+    features = meta.get("features")
+    if features is not None and list(features) != list(FEATURES):
+        raise RuntimeError(f"trained on {features}, expected {FEATURES}")
+
+    return {"model": model, "meta": meta}
+
+
+def load_models(model_dir: str = MODEL_DIR) -> dict:
+    """
+    {macro_id: model} for every model in `model_dir`. Unchanged files are
+    served from memory. A model that fails to load (or to verify) is
+    reported; the copy loaded before it changed is kept, if any.
+    """
+    model_dir = os.path.abspath(model_dir)
+    _migrate_once(model_dir)
+
+    if not os.path.isdir(model_dir):
+        return {}
+
+    models = {}
+    with _lock:
+        seen = set()
+        for f in sorted(os.listdir(model_dir)):
+            m = MODEL_PATTERN.match(f)
+            if not m:
+                continue
+
+            path = os.path.join(model_dir, f)
+            meta = _meta_path(model_dir, float(m.group(1)))
+            st = os.stat(path)
+            stamp = (
+                st.st_mtime_ns, st.st_size,
+                os.stat(meta).st_mtime_ns if os.path.exists(meta) else None
+            )
+            seen.add(path)
+
+            entry = _cache.get(path)
+            if entry is None or entry["stamp"] != stamp:
+                try:
+                    entry = {**_load_entry(model_dir, f, float(m.group(1))), "stamp": stamp}
+                except Exception as e:
+                    reason = str(e).splitlines()[0]
+                    if entry is None:
+                        print(f"⚠️ Skipping model {f}: {reason}")
+                        continue
+                    # Stamp left as is, so the next lookup checks the file again
+                    print(f"⚠️ Keeping previously loaded {f}: {reason}")
+                else:
+                    _cache[path] = entry
+
+            models[int(float(m.group(1)))] = entry["model"]
+
+        for path in [p for p in _cache if os.path.dirname(p) == model_dir and p not in seen]:
+            del _cache[path]
+
+    return models
+
+
+def model_meta(macro, model_dir: str = MODEL_DIR) -> dict:
+    """Metadata of one macro model, {} if it has none."""
+    return _read_meta(model_dir, macro)
+
+
+def model_versions(model_dir: str = MODEL_DIR) -> dict:
+    """{macro_id: sha256} of the model files on disk, from their metadata."""
+    if not os.path.isdir(model_dir):
+        return {}
+    out = {}
+    for f in sorted(os.listdir(model_dir)):
+        m = MODEL_PATTERN.match(f)
+        if m:
+            meta = _read_meta(model_dir, float(m.group(1)))
+            out[str(float(m.group(1)))] = meta.get("sha256") or sha256_file(os.path.join(model_dir, f))
+    return out
+
+
+def model_metadata(model_dir: str = MODEL_DIR) -> pd.DataFrame:
+    """One row of training metadata per loaded model."""
+    model_dir = os.path.abspath(model_dir)
+    load_models(model_dir)
+    with _lock:
+        rows = [
+            {"file": os.path.basename(p), **e["meta"]}
+            for p, e in sorted(_cache.items())
+            if os.path.dirname(p) == model_dir
+        ]
+    return pd.DataFrame(rows)
@@ -1,18 +1,19 @@
 # ============================================================
 # performance_engine.py
-# Model vs Universe performance evaluation (NO LOGIC CHANGES)
+# Model vs Universe performance evaluation (price panel, trading calendar)
 # ============================================================
 
 import pandas as pd
-import numpy as np
 
 from config import (
     HOLDING_DAYS,
-    MASTER_CSV,
     LIVE_TRADES_FILE,
     WEEKLY_ALPHA_FILE,
     MODEL_RETURNS_FILE
 )
+from price_panel import load_price_panel
+from trading_calendar import load_trading_calendar
+from run_metrics import timed
 
 # ============================================================
 # Helper: canonical symbol
@@ -30,6 +31,7 @@ def extract_base_symbol(sym: str) -> str:
 # RUN PERFORMANCE CHECK
 # ============================================================
 
+@timed("performance")
 def run_weekly_performance_check(decision_date):
     """
     Calculates performance relative to a specific Decision Date.
@@ -39,34 +41,29 @@ def run_weekly_performance_check(decision_date):
     decision_date = pd.to_datetime(decision_date)
 
     # --------------------------------------------------------
-    # Load data
+    # Load data (shared price panel, no master scan)
     # --------------------------------------------------------
 
-    df = pd.read_csv(MASTER_CSV, low_memory=False)
-    if "DATE1" in df.columns:
-        df["DATE1"] = pd.to_datetime(df["DATE1"])
-    else:
-        df["DATE1"] = pd.to_datetime(df["DATE"])
+    panel = load_price_panel()
 
     # Load trades generated for this specific Entry Date
     # Note: Trade file naming convention usually uses Entry Date
     # We need to calculate Entry Date first to find the file
-    
-    dates = np.sort(df["DATE1"].unique())
-    decision_idx = np.where(dates == np.datetime64(decision_date))[0]
 
-    if len(decision_idx) == 0:
+    calendar = load_trading_calendar()
+
+    if not calendar.is_observed(decision_date):
         raise RuntimeError(f"Decision date {decision_date.date()} not found in Master Data")
 
     # Calculate Entry and Exit based on Trading Calendar
-    try:
-        entry_ts = dates[decision_idx[0] + 1]
-        exit_ts = dates[decision_idx[0] + HOLDING_DAYS]
-    except IndexError:
+    entry_date = calendar.offset(decision_date, 1)
+    exit_date = calendar.offset(decision_date, HOLDING_DAYS)
+
+    if exit_date > calendar.last_observed:
         raise RuntimeError("Not enough future data points for Entry/Exit calculation")
 
-    entry_date = pd.Timestamp(entry_ts)
-    exit_date = pd.Timestamp(exit_ts)
+    entry_idx = panel.date_index(entry_date)
+    exit_idx = panel.date_index(exit_date)
 
     # Load Trades
     trade_file = LIVE_TRADES_FILE(entry_date.date())
@@ -78,53 +75,22 @@ def run_weekly_performance_check(decision_date):
     symbols_model = trades["SYMBOL"].unique()
 
     # --------------------------------------------------------
-    # Entry prices (AVG_PRICE)
-    # --------------------------------------------------------
-
-    entry_prices = (
-        df[df["DATE1"] == entry_date]
-        [["SYMBOL", "AVG_PRICE"]]
-        .copy()
-    )
-
-    entry_prices["BASE_SYMBOL"] = entry_prices["SYMBOL"].apply(
-        extract_base_symbol
-    )
-
-    entry_prices = (
-        entry_prices
-        .groupby("BASE_SYMBOL", as_index=False)
-        .agg(entry_price=("AVG_PRICE", "mean"))
-    )
-
-    # --------------------------------------------------------
-    # Exit prices (AVG_PRICE)
+    # Entry / exit prices (AVG_PRICE, averaged per base symbol)
     # --------------------------------------------------------
 
-    exit_prices = (
-        df[df["DATE1"] == exit_date]
-        [["SYMBOL", "AVG_PRICE"]]
-        .copy()
-    )
-
-    exit_prices["BASE_SYMBOL"] = exit_prices["SYMBOL"].apply(
-        extract_base_symbol
-    )
-
-    exit_prices = (
-        exit_prices
-        .groupby("BASE_SYMBOL", as_index=False)
-        .agg(exit_price=("AVG_PRICE", "mean"))
-    )
+    entry_price, in_entry = panel.base_prices(entry_idx)
+    exit_price, in_exit = panel.base_prices(exit_idx)
+    both = in_entry[0] & in_exit[0]
 
     # --------------------------------------------------------
     # Compute returns
     # --------------------------------------------------------
 
-    returns = (
-        entry_prices
-        .merge(exit_prices, on="BASE_SYMBOL", how="inner")
-    )
+    returns = pd.DataFrame({
+        "BASE_SYMBOL": panel.base_symbols[both],
+        "entry_price": entry_price[0][both],
+        "exit_price": exit_price[0][both]
+    })
 
     returns["return_5d"] = (
         returns["exit_price"] / returns["entry_price"] - 1
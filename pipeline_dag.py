@@ -0,0 +1,312 @@
+# ============================================================
+# pipeline_dag.py
+# Strategy pipeline as a DAG of input-keyed, checkpointed nodes
+# ============================================================
+
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+from config import (
+    FEATURES,
+    TOP_K,
+    HOLDING_DAYS,
+    MIN_TRAIN_ROWS,
+    TRAIN_TREE_METHOD,
+    HIST_VALIDATE,
+    HIST_MIN_RANK_CORR,
+    INCREMENTAL_TREES,
+    INCREMENTAL_MIN_ROWS,
+    MAX_INCREMENTAL_UPDATES,
+    DRIFT_MAX_RMSE_RATIO,
+    LIVE_TRADES_FILE,
+    BACKTEST_FILE,
+    BACKTEST_RETRAIN_SESSIONS,
+    PIPELINE_DIR
+)
+from store_io import write_json_atomic, sha256_file
+from master_store import load_master, store_exists, master_manifest
+from data_pipeline import run_daily_data_pipeline
+from feature_store import STORE_VERSION, regime_hash, build_feature_store, feature_store_version
+from model_engine import XGB_PARAMS, train_and_save_models
+from model_registry import model_versions
+from trade_engine import live_trade_decision
+from backtest_engine import run_backtest
+from trading_calendar import load_trading_calendar
+from run_metrics import stage
+
+# ------------------------------------------------------------
+# NODES
+# ------------------------------------------------------------
+#   download  bhavcopies -> master                 (runs when requested)
+#   features  master + regime files -> feature store
+#             (corporate cleaning, regime tagging, add_features)
+#   train     features + decision date -> macro models
+#   trade     features + models + decision / entry date -> trade sheet
+#
+# BACKTEST is a second DAG over the same features node:
+#   backtest  features + date range -> walk-forward backtest sheet
+#
+# Each node declares its inputs as a small dict of versions (content
+# hashes of what it reads, plus the params it uses). The sha256 of
+# that dict is compared with the node's checkpoint in
+# <PIPELINE_DIR>/<node>.json; if it matches and the checkpointed
+# output is still what is on disk, the output is reused and the node
+# does not run. A node's output is what its dependents key on.
+#
+# Regime masking at the decision date is a point-in-time read
+# (load_features(as_of=...)) inside train and trade, so a new decision
+# date reuses the cleaned, regime-tagged features and reruns only
+# training (when requested) and scoring.
+
+CHECKPOINT_VERSION = 1
+
+# ============================================================
+# PARAMS / CHECKPOINTS
+# ============================================================
+
+def pipeline_params(decision_date, entry_date=None, download=None, train_mode=None) -> dict:
+    """
+    JSON-safe run parameters. download=(start, end) fetches new data
+    first; train_mode is None (keep models), "full" or "incremental".
+    """
+    return {
+        "decision_date": str(pd.Timestamp(decision_date).date()),
+        "entry_date": str(pd.Timestamp(entry_date).date()) if entry_date is not None else None,
+        "download": list(download) if download else None,
+        "train_mode": train_mode
+    }
+
+
+def backtest_params(start, end) -> dict:
+    """JSON-safe parameters of an out-of-sample backtest over [start, end]."""
+    return {
+        "start": str(pd.Timestamp(start).date()),
+        "end": str(pd.Timestamp(end).date())
+    }
+
+
+def _sha256(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _checkpoint_path(name: str, pipeline_dir: str) -> str:
+    return os.path.join(pipeline_dir, f"{name}.json")
+
+
+def read_checkpoint(name: str, pipeline_dir: str = PIPELINE_DIR):
+    path = _checkpoint_path(name, pipeline_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(name: str, pipeline_dir: str, payload: dict):
+    os.makedirs(pipeline_dir, exist_ok=True)
+    write_json_atomic(_checkpoint_path(name, pipeline_dir), payload)
+
+# ============================================================
+# NODE DEFINITIONS
+# ============================================================
+# inputs(params, up) -> dict, or None when the node has nothing to do
+# run(params, inputs, work_dir) -> output dict
+# current(output) -> True while a checkpointed output is still on disk
+
+class Node:
+    def __init__(self, name, deps, inputs, run, current=None):
+        self.name = name
+        self.deps = deps
+        self.inputs = inputs
+        self.run = run
+        self.current = current
+
+
+# --- download ---
+
+def _download_inputs(params, up):
+    # Never reused: the exchange may have published more days since
+    return {"range": params["download"]} if params["download"] else None
+
+
+def _download_run(params, inputs, work_dir):
+    run_daily_data_pipeline(*params["download"])
+    return {"range": params["download"]}
+
+
+# --- features ---
+
+def _features_inputs(params, up):
+    if not store_exists():
+        load_master(columns=["DATE1"])
+    return {
+        "store_version": STORE_VERSION,
+        "master": master_manifest()["content_hash"],
+        "regimes": regime_hash()
+    }
+
+
+def _features_run(params, inputs, work_dir):
+    return build_feature_store()
+
+
+def _features_current(output):
+    return feature_store_version() == output["data_version"]
+
+
+# --- train ---
+
+def _train_inputs(params, up):
+    if not params["train_mode"]:
+        return None
+    return {
+        "features": up["features"]["data_version"],
+        "as_of": params["decision_date"],
+        "mode": params["train_mode"],
+        "config": [
+            FEATURES, HOLDING_DAYS, MIN_TRAIN_ROWS, XGB_PARAMS,
+            TRAIN_TREE_METHOD, HIST_VALIDATE, HIST_MIN_RANK_CORR,
+            INCREMENTAL_TREES, INCREMENTAL_MIN_ROWS, MAX_INCREMENTAL_UPDATES,
+            DRIFT_MAX_RMSE_RATIO
+        ]
+    }
+
+
+def _train_run(params, inputs, work_dir):
+    report = train_and_save_models(as_of=params["decision_date"], mode=params["train_mode"])
+    path = os.path.join(work_dir, "train_report.csv")
+    report.to_csv(path, index=False)
+    return {"file": path, "macro_groups": int(len(report)), "models": model_versions()}
+
+
+def _train_current(output):
+    return model_versions() == output["models"] and os.path.exists(output["file"])
+
+
+# --- trade ---
+
+def _trade_inputs(params, up):
+    entry = params["entry_date"] or load_trading_calendar().next_session(params["decision_date"])
+    return {
+        "features": up["features"]["data_version"],
+        "models": model_versions(),
+        "decision_date": params["decision_date"],
+        "entry_date": str(pd.Timestamp(entry).date()),
+        "config": [FEATURES, TOP_K]
+    }
+
+
+def _trade_run(params, inputs, work_dir):
+    entry = inputs["entry_date"]
+    trade = live_trade_decision(None, params["decision_date"], entry)
+    path = LIVE_TRADES_FILE(entry)
+    trade.to_csv(path, index=False)
+    return {"file": path, "rows": int(len(trade)), "sha256": sha256_file(path)}
+
+
+def _trade_current(output):
+    return os.path.exists(output["file"]) and sha256_file(output["file"]) == output["sha256"]
+
+
+# --- backtest ---
+
+def _backtest_inputs(params, up):
+    # Walk-forward: the backtest trains its own models, not the registry's
+    return {
+        "features": up["features"]["data_version"],
+        "start": params["start"],
+        "end": params["end"],
+        "config": [FEATURES, TOP_K, HOLDING_DAYS, MIN_TRAIN_ROWS, XGB_PARAMS,
+                   TRAIN_TREE_METHOD, BACKTEST_RETRAIN_SESSIONS]
+    }
+
+
+def _backtest_run(params, inputs, work_dir):
+    result = run_backtest(params["start"], params["end"])
+    path = BACKTEST_FILE(params["start"], params["end"])
+    return {
+        "file": path,
+        "rows": int(len(result)),
+        "alpha_mean": float(result["alpha_mean"].mean()),
+        "sha256": sha256_file(path)
+    }
+
+
+def _backtest_current(output):
+    return os.path.exists(output["file"]) and sha256_file(output["file"]) == output["sha256"]
+
+
+PIPELINE = [
+    Node("download", [], _download_inputs, _download_run),
+    Node("features", ["download"], _features_inputs, _features_run, _features_current),
+    Node("train", ["features"], _train_inputs, _train_run, _train_current),
+    Node("trade", ["features", "train"], _trade_inputs, _trade_run, _trade_current)
+]
+
+BACKTEST = [
+    Node("features", [], _features_inputs, _features_run, _features_current),
+    Node("backtest", ["features"], _backtest_inputs, _backtest_run, _backtest_current)
+]
+
+# ============================================================
+# EXECUTE
+# ============================================================
+
+def run_node(node: Node, params: dict, up: dict, work_dir: str,
+             pipeline_dir: str = PIPELINE_DIR):
+    """
+    ("done" | "reused" | "skipped", output) for one node; `up` holds
+    the outputs of the nodes already run.
+    """
+    with stage(f"pipeline.{node.name}") as m:
+        status, output = _run_node(node, params, up, work_dir, pipeline_dir)
+        m["status"] = status
+    return status, output
+
+
+def _run_node(node: Node, params: dict, up: dict, work_dir: str, pipeline_dir: str):
+    inputs = node.inputs(params, up)
+    if inputs is None:
+        return "skipped", None
+
+    key = _sha256([CHECKPOINT_VERSION, node.name, inputs])
+    old = read_checkpoint(node.name, pipeline_dir)
+    if (
+        old is not None and old["key"] == key and node.current is not None
+        and node.current(old["output"])
+    ):
+        print(f"♻️ {node.name}: inputs unchanged, reusing checkpoint from {old['finished']}")
+        return "reused", old["output"]
+
+    t0 = time.perf_counter()
+    output = node.run(params, inputs, work_dir)
+    _write_checkpoint(node.name, pipeline_dir, {
+        "node": node.name,
+        "key": key,
+        "inputs": inputs,
+        "output": output,
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(time.perf_counter() - t0, 3)
+    })
+    return "done", output
+
+
+def run_pipeline(decision_date, entry_date=None, download=None, train_mode=None,
+                 work_dir: str = PIPELINE_DIR, pipeline_dir: str = PIPELINE_DIR) -> dict:
+    """
+    Runs the DAG in the caller's process, executing only invalidated
+    nodes. Returns {node: {"status": ..., "output": ...}}.
+    """
+    params = pipeline_params(decision_date, entry_date, download, train_mode)
+    os.makedirs(work_dir, exist_ok=True)
+
+    up, out = {}, {}
+    for node in PIPELINE:
+        status, output = run_node(node, params, up, work_dir, pipeline_dir)
+        up[node.name] = output
+        out[node.name] = {"status": status, "output": output}
+    return out
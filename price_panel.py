@@ -0,0 +1,322 @@
+# ============================================================
+# price_panel.py
+# Memory-mapped trading-date x symbol price panel from the master
+# ============================================================
+
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    MASTER_STORE_DIR,
+    PRICE_PANEL_DIR,
+    PANEL_KEEP_GENERATIONS
+)
+from master_store import (
+    load_master,
+    store_exists,
+    master_manifest,
+    master_manifest_path
+)
+from store_io import write_json_atomic, dir_lock, collect_generations
+from run_metrics import timed
+
+# ------------------------------------------------------------
+# LAYOUT
+# ------------------------------------------------------------
+# <PRICE_PANEL_DIR>/_panel.json       master hash, symbols, live generation
+# <PRICE_PANEL_DIR>/g<generation>/    one .npy per array:
+#
+#   dates        datetime64[ns], every master trading date, ascending
+#   present      bool   [date, symbol]  symbol has a master row that day
+#   AVG_PRICE    float64 [date, symbol] (NaN where absent)
+#   CLOSE_PRICE  float64 [date, symbol]
+#
+# Rows are dates because every return lookup reads whole dates. Symbols
+# are ordered by (base symbol, symbol) so each base symbol (_PRE/_POST
+# stripped) is a contiguous run of columns and base prices are one
+# reduceat. The panel is rebuilt when the master manifest changes; a
+# new generation directory is written first and _panel.json switches
+# to it atomically.
+#
+# A daily append only adds dates after the panel's last one. When the
+# master row counts on the panel's dates are unchanged (date_rows) and
+# no new symbol appears, the new generation is the previous arrays plus
+# rows built from the master read from the first new date on, so the
+# master is not re-read and re-pivoted in full.
+#
+# Backtest, performance checks and the job worker all build it, so a
+# build holds store_io.dir_lock(<PRICE_PANEL_DIR>) and re-checks the
+# master hash once the lock is held.
+#
+# Only the newest PANEL_KEEP_GENERATIONS generations are kept. A process
+# that read _panel.json just before a rebuild can still open the previous
+# generation; arrays already memory-mapped stay readable after their
+# files are removed (POSIX unlink semantics).
+
+PANEL_FILE = "_panel.json"
+PANEL_VERSION = 1
+PRICE_FIELDS = ["AVG_PRICE", "CLOSE_PRICE"]
+
+SPLIT_SUFFIX = r"_(PRE|POST)$"
+
+_cache = {}
+_lock = threading.Lock()
+
+# ============================================================
+# PANEL
+# ============================================================
+
+class PricePanel:
+    """
+    Read-only view of one panel generation. Price arrays are memory
+    mapped, so opening a panel costs a few stats whatever its size.
+    """
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.symbols = np.array(meta["symbols"], dtype=object)
+        self.base_symbols = np.array(meta["base_symbols"], dtype=object)
+        self.base_start = np.array(meta["base_start"], dtype=np.int64)
+        self.symbol_index = {s: i for i, s in enumerate(meta["symbols"])}
+
+        self.dates = np.load(os.path.join(path, "dates.npy"))
+        self.present = np.load(os.path.join(path, "present.npy"), mmap_mode="r")
+        self.prices = {
+            f: np.load(os.path.join(path, f"{f}.npy"), mmap_mode="r") for f in PRICE_FIELDS
+        }
+
+    def date_index(self, date) -> int:
+        """Row of `date`, or -1 if it is not a master trading date."""
+        d = np.datetime64(pd.Timestamp(date), "ns")
+        i = int(np.searchsorted(self.dates, d))
+        return i if i < len(self.dates) and self.dates[i] == d else -1
+
+    def base_prices(self, rows, field: str = "AVG_PRICE"):
+        """
+        (prices, present) per base symbol for the date rows `rows`: the
+        mean of the present, non-NaN symbol prices, like a groupby mean.
+        """
+        rows = np.atleast_1d(rows)
+        vals = np.asarray(self.prices[field][rows])
+        pres = np.asarray(self.present[rows])
+
+        if len(self.base_start) == len(self.symbols):
+            return vals, pres
+
+        ok = pres & ~np.isnan(vals)
+        total = np.add.reduceat(np.where(ok, vals, 0.0), self.base_start, axis=1)
+        count = np.add.reduceat(ok, self.base_start, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+        return mean, np.logical_or.reduceat(pres, self.base_start, axis=1)
+
+    def returns(self, entry_rows, exit_rows, field: str = "AVG_PRICE"):
+        """
+        (r, in_both) per base symbol for each entry/exit row pair; in_both
+        marks base symbols present on both dates (the return universe).
+        """
+        p_entry, in_entry = self.base_prices(entry_rows, field)
+        p_exit, in_exit = self.base_prices(exit_rows, field)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = p_exit / p_entry - 1
+        return r, in_entry & in_exit
+
+    def series(self, symbol: str, field: str = "CLOSE_PRICE") -> pd.Series:
+        """Price history of one master symbol, indexed by date."""
+        j = self.symbol_index.get(symbol)
+        if j is None:
+            return pd.Series(dtype="float64", name=field)
+        pres = np.asarray(self.present[:, j])
+        return pd.Series(
+            np.asarray(self.prices[field][:, j])[pres],
+            index=pd.DatetimeIndex(self.dates[pres], name="DATE1"),
+            name=field
+        )
+
+# ============================================================
+# BUILD
+# ============================================================
+
+def _master_hash(master_dir: str) -> str:
+    content = master_manifest(master_dir)["content_hash"]
+    return hashlib.sha256(json.dumps([PANEL_VERSION, content]).encode()).hexdigest()
+
+
+def _read_panel_meta(panel_dir: str):
+    path = os.path.join(panel_dir, PANEL_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_array(path: str, a: np.ndarray):
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, a)
+    os.replace(tmp, path)
+
+
+@timed("price_panel.build")
+def build_price_panel(panel_dir: str = PRICE_PANEL_DIR,
+                      master_dir: str = MASTER_STORE_DIR) -> dict:
+    """
+    Rebuilds the panel from the master if the master changed since the
+    last build. Returns the committed panel metadata.
+    """
+    if not store_exists(master_dir):
+        load_master(columns=["DATE1"], store_dir=master_dir)
+
+    master_hash = _master_hash(master_dir)
+    old = _read_panel_meta(panel_dir)
+    if old is not None and old["master_hash"] == master_hash:
+        return old
+
+    with dir_lock(panel_dir):
+        # Another process may have built it while this one waited
+        master_hash = _master_hash(master_dir)
+        old = _read_panel_meta(panel_dir)
+        if old is not None and old["master_hash"] == master_hash:
+            return old
+        return _build(panel_dir, master_dir, master_hash, old)
+
+
+def _wide(df: pd.DataFrame) -> pd.DataFrame:
+    grouped = df.groupby(["DATE1", "SYMBOL"], sort=False)
+    wide = grouped[PRICE_FIELDS].mean()
+    wide["_n"] = grouped.size()
+    return wide.unstack("SYMBOL").sort_index()
+
+
+def _date_rows_hash(manifest: dict, dates) -> str:
+    """Fingerprint of the master row counts on `dates` (YYYY-MM-DD strings)."""
+    counts = [manifest["dates"].get(d, 0) for d in dates]
+    return hashlib.sha256(json.dumps([list(dates), counts]).encode()).hexdigest()
+
+
+def _day_strings(dates: np.ndarray) -> list:
+    return [str(d)[:10] for d in dates.astype("datetime64[D]")]
+
+
+def _extension(panel_dir: str, master_dir: str, old):
+    """
+    Rows for master dates past the panel's last date when that is all
+    that changed, else None. Master rows are never rewritten (appends
+    only add keys), so unchanged row counts on the panel's dates mean
+    unchanged prices.
+    """
+    if old is None or old["version"] != PANEL_VERSION or "date_rows" not in old:
+        return None
+    path = os.path.join(panel_dir, old["dir"])
+    if not os.path.isdir(path):
+        return None
+
+    manifest = master_manifest(master_dir)
+    dates = np.load(os.path.join(path, "dates.npy"))
+    if not len(dates) or _date_rows_hash(manifest, _day_strings(dates)) != old["date_rows"]:
+        return None
+
+    # A back-filled date inside the panel's span needs a full rebuild
+    last = pd.Timestamp(dates[-1])
+    if sum(d <= str(last.date()) for d in manifest["dates"]) != len(dates):
+        return None
+
+    df = load_master(columns=["SYMBOL", "DATE1"] + PRICE_FIELDS, start=last + pd.Timedelta(days=1),
+                     store_dir=master_dir)
+    if df.empty or not set(df["SYMBOL"]) <= set(old["symbols"]):
+        return None
+    return path, dates, df
+
+
+def _build(panel_dir: str, master_dir: str, master_hash: str, old) -> dict:
+    extension = _extension(panel_dir, master_dir, old)
+
+    if extension is None:
+        df = load_master(columns=["SYMBOL", "DATE1"] + PRICE_FIELDS, store_dir=master_dir)
+        wide = _wide(df)
+
+        symbols = pd.Index(wide["_n"].columns)
+        bases = symbols.str.replace(SPLIT_SUFFIX, "", regex=True)
+        order = np.lexsort((symbols.to_numpy(), bases.to_numpy()))
+        symbols, bases = symbols[order], bases[order]
+        base_start = np.flatnonzero(np.r_[True, bases[1:] != bases[:-1]]) if len(bases) else np.array([], dtype=np.int64)
+
+        dates = wide.index.to_numpy(dtype="datetime64[ns]")
+        present = wide["_n"][symbols].notna().to_numpy()
+        prices = {f: wide[f][symbols].to_numpy(dtype=np.float64) for f in PRICE_FIELDS}
+        base_symbols = list(bases[base_start])
+    else:
+        # New dates only: the symbol layout is unchanged, rows are appended
+        path, old_dates, df = extension
+        wide = _wide(df)
+        symbols = pd.Index(old["symbols"])
+        base_start, base_symbols = np.array(old["base_start"], dtype=np.int64), old["base_symbols"]
+
+        dates = np.concatenate([old_dates, wide.index.to_numpy(dtype="datetime64[ns]")])
+        present = np.concatenate([
+            np.load(os.path.join(path, "present.npy"), mmap_mode="r"),
+            wide["_n"].reindex(columns=symbols).notna().to_numpy()
+        ])
+        prices = {f: np.concatenate([
+            np.load(os.path.join(path, f"{f}.npy"), mmap_mode="r"),
+            wide[f].reindex(columns=symbols).to_numpy(dtype=np.float64)
+        ]) for f in PRICE_FIELDS}
+
+    generation = (old["generation"] if old else 0) + 1
+    live = f"g{generation:06d}"
+    out = os.path.join(panel_dir, live)
+    os.makedirs(out, exist_ok=True)
+
+    _save_array(os.path.join(out, "dates.npy"), dates)
+    _save_array(os.path.join(out, "present.npy"), present)
+    for f in PRICE_FIELDS:
+        _save_array(os.path.join(out, f"{f}.npy"), prices[f])
+
+    meta = {
+        "version": PANEL_VERSION,
+        "master_hash": master_hash,
+        "generation": generation,
+        "dir": live,
+        "dates": int(len(dates)),
+        "date_rows": _date_rows_hash(master_manifest(master_dir), _day_strings(dates)),
+        "symbols": list(symbols),
+        "base_symbols": base_symbols,
+        "base_start": [int(i) for i in base_start]
+    }
+    write_json_atomic(os.path.join(panel_dir, PANEL_FILE), meta)
+    collect_generations(panel_dir, generation, PANEL_KEEP_GENERATIONS)
+
+    how = "built" if extension is None else f"extended by {len(dates) - len(extension[1])} dates"
+    print(f"✅ Price panel {how}: {meta['dates']} dates x {len(symbols)} symbols")
+    return meta
+
+# ============================================================
+# LOAD (WARM)
+# ============================================================
+
+def load_price_panel(panel_dir: str = PRICE_PANEL_DIR,
+                     master_dir: str = MASTER_STORE_DIR) -> PricePanel:
+    """
+    The current panel, rebuilt first if the master changed. While the
+    master manifest is unchanged the open panel is returned after one stat.
+    """
+    panel_dir, master_dir = os.path.abspath(panel_dir), os.path.abspath(master_dir)
+    key = (panel_dir, master_dir)
+
+    with _lock:
+        path = master_manifest_path(master_dir)
+        stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+        entry = _cache.get(key)
+        if entry is not None and stamp is not None and entry["stamp"] == stamp:
+            return entry["panel"]
+
+        meta = build_price_panel(panel_dir, master_dir)
+        panel = PricePanel(os.path.join(panel_dir, meta["dir"]), meta)
+        _cache[key] = {"stamp": os.stat(path).st_mtime_ns, "panel": panel}
+        return panel
@@ -0,0 +1,304 @@
+# ============================================================
+# raw_cache.py
+# Content-addressed cache of raw bhavcopy days
+# ============================================================
+
+import os
+import io
+import json
+import glob
+import shutil
+import tempfile
+import zipfile
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl  # Unix only; elsewhere the index is guarded per process
+except ImportError:
+    fcntl = None
+
+from config import (
+    RAW_CACHE_DIR,
+    LIVE_BHAVCOPY_DIR,
+    MONITOR_DIR
+)
+from bhav_downloader import download_bhavcopies
+from store_io import write_json_atomic, sha256_file
+from run_metrics import timed
+
+# ------------------------------------------------------------
+# LAYOUT
+# ------------------------------------------------------------
+# objects/<sha[:2]>/<sha>   raw file bytes (csv or zip), immutable
+# index.json                trading day -> object, and requested
+#                           calendar date -> trading day it resolved to
+#
+# NSE answers a request for a weekend/holiday with the previous
+# session's file, so objects are keyed by the DATE1 found inside the
+# file, and the request map remembers what each calendar date served.
+#
+# Objects are hashed once, when they are stored; the index records
+# their size and mtime, and a lookup, or a re-ingest of the same file,
+# only stats the object against them.
+#
+# index.json is updated from the app and the job worker, so every
+# read-modify-write holds an flock on <cache>/.lock. Downloads run
+# outside it; the index is re-read before their results are merged.
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+LEGACY_DIRS = [LIVE_BHAVCOPY_DIR, MONITOR_DIR]
+
+_lock = threading.Lock()
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+@contextmanager
+def _index_lock(cache_dir: str):
+    """Exclusive, cross-process lock on index.json."""
+    os.makedirs(cache_dir, exist_ok=True)
+    if fcntl is None:
+        with _lock:
+            yield
+        return
+
+    fd = os.open(os.path.join(cache_dir, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _day_key(d) -> str:
+    return pd.Timestamp(d).strftime("%Y-%m-%d")
+
+
+def _object_path(sha: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, "objects", sha[:2], sha)
+
+
+def _read_index(cache_dir: str) -> dict:
+    path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {"days": {}, "requests": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_index(cache_dir: str, index: dict):
+    write_json_atomic(os.path.join(cache_dir, INDEX_FILE), index)
+
+
+def open_raw_csv(path: str):
+    """Binary handle on the bhavcopy CSV inside `path` (plain file or zip)."""
+    if zipfile.is_zipfile(path):
+        # The member keeps the archive file open until it is closed itself
+        with zipfile.ZipFile(path) as z:
+            csvs = [f for f in z.namelist() if f.lower().endswith(".csv")]
+            if not csvs:
+                raise ValueError(f"No CSV inside {path}")
+            return z.open(csvs[0])
+    return open(path, "rb")
+
+
+def trading_date_of(path: str) -> pd.Timestamp:
+    """Reads the DATE1 of the first data row of a raw bhavcopy file."""
+    with open_raw_csv(path) as f:
+        head = pd.read_csv(io.BytesIO(f.read(64 * 1024)), nrows=1, skipinitialspace=True)
+    head.columns = head.columns.str.strip().str.upper()
+    col = "DATE1" if "DATE1" in head.columns else "DATE"
+    return pd.Timestamp(pd.to_datetime(str(head[col].iloc[0]).strip()))
+
+# ============================================================
+# INGEST
+# ============================================================
+
+def _ingest(path: str, index: dict, cache_dir: str) -> str:
+    """Stores `path` as an object and returns its trading day key."""
+    day = _day_key(trading_date_of(path))
+    sha = sha256_file(path)
+    obj = _object_path(sha, cache_dir)
+
+    # A stamped object is trusted; anything else is hashed before reuse
+    entry = index["days"].get(day, {})
+    stored = entry.get("sha256") == sha and _verified_path(day, index, cache_dir) is not None
+
+    if not stored and (not os.path.exists(obj) or sha256_file(obj) != sha):
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        tmp = f"{obj}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        if sha256_file(tmp) != sha:
+            os.remove(tmp)
+            raise OSError(f"copy of {path} does not match its checksum")
+        os.replace(tmp, obj)
+
+    st = os.stat(obj)
+    index["days"][day] = {
+        "sha256": sha,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "name": os.path.basename(path).split("_", 1)[-1]
+    }
+    return day
+
+
+def _import_paths(paths, index: dict, cache_dir: str) -> int:
+    n = 0
+    for p in paths:
+        try:
+            req = pd.to_datetime(os.path.basename(p).split("_")[0], format="%d-%b-%Y")
+        except ValueError:
+            continue  # not a '<dd-Mon-yyyy>_<file>' download
+        try:
+            index["requests"][_day_key(req)] = {"day": _ingest(p, index, cache_dir)}
+            n += 1
+        except Exception as e:
+            print(f"⚠️ Could not import {p}: {e}")
+    return n
+
+
+def import_dir(src_dir: str, cache_dir: str = RAW_CACHE_DIR) -> int:
+    """Adopts already-downloaded files (named '<dd-Mon-yyyy>_<file>') into the cache."""
+    paths = sorted(glob.glob(os.path.join(src_dir, "*_*")))
+    if not paths:
+        return 0
+
+    with _index_lock(cache_dir):
+        index = _read_index(cache_dir)
+        n = _import_paths(paths, index, cache_dir)
+        _write_index(cache_dir, index)
+    return n
+
+
+def _adopt_legacy_dirs(cache_dir: str):
+    if os.path.exists(os.path.join(cache_dir, INDEX_FILE)):
+        return
+    with _index_lock(cache_dir):
+        if os.path.exists(os.path.join(cache_dir, INDEX_FILE)):
+            return
+        index = {"days": {}, "requests": {}}
+        for d in LEGACY_DIRS:
+            if os.path.isdir(d):
+                _import_paths(sorted(glob.glob(os.path.join(d, "*_*"))), index, cache_dir)
+        _write_index(cache_dir, index)
+
+# ============================================================
+# LOOKUP
+# ============================================================
+
+def _verified_path(day: str, index: dict, cache_dir: str):
+    """Object of `day` if it is unchanged since it was stored (one stat)."""
+    entry = index["days"].get(day)
+    if entry is None:
+        return None
+    obj = _object_path(entry["sha256"], cache_dir)
+    try:
+        st = os.stat(obj)
+    except FileNotFoundError:
+        return None
+    if st.st_size != entry["size"] or st.st_mtime_ns != entry.get("mtime_ns"):
+        return None
+    return obj
+
+
+def _stamp_unstamped(index: dict, cache_dir: str) -> bool:
+    """
+    Hashes, once, objects indexed before entries carried an mtime and
+    records it; corrupt ones are removed and fetched again. True if the
+    index changed.
+    """
+    changed = False
+    for entry in index["days"].values():
+        if "mtime_ns" in entry:
+            continue
+        obj = _object_path(entry["sha256"], cache_dir)
+        if not os.path.exists(obj):
+            continue
+        if sha256_file(obj) == entry["sha256"]:
+            entry["mtime_ns"] = os.stat(obj).st_mtime_ns
+            changed = True
+        else:
+            os.remove(obj)
+    return changed
+
+
+def _is_final(req: str, entry: dict, today: str) -> bool:
+    """Past calendar dates never change; today is final once its own file is in."""
+    if req < today:
+        return True
+    return entry.get("day") == req
+
+
+def _needs_fetch(req: str, index: dict, cache_dir: str, today: str) -> bool:
+    entry = index["requests"].get(req)
+    if entry is None or not _is_final(req, entry, today):
+        return True
+    return "day" in entry and _verified_path(entry["day"], index, cache_dir) is None
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+@timed("download", rows=len)
+def ensure_days(dates, cache_dir: str = RAW_CACHE_DIR) -> dict:
+    """
+    Makes sure every requested calendar date is resolved in the cache,
+    downloading only the ones that are not. Returns
+    {trading day (Timestamp): object path} for everything the dates
+    resolved to, in date order.
+    """
+    _adopt_legacy_dirs(cache_dir)
+
+    reqs = [_day_key(d) for d in dates]
+    today = _day_key(pd.Timestamp.now().normalize())
+
+    with _index_lock(cache_dir):
+        index = _read_index(cache_dir)
+        if _stamp_unstamped(index, cache_dir):
+            _write_index(cache_dir, index)
+        todo = [r for r in reqs if _needs_fetch(r, index, cache_dir, today)]
+
+    if todo:
+        staging = tempfile.mkdtemp(dir=cache_dir, prefix="staging-")
+        try:
+            report = download_bhavcopies([pd.Timestamp(r) for r in todo], staging)
+
+            with _index_lock(cache_dir):
+                # Another process may have committed while we downloaded
+                index = _read_index(cache_dir)
+                for r, row in zip(todo, report.itertuples()):
+                    if row.status == "ok":
+                        try:
+                            index["requests"][r] = {"day": _ingest(row.path, index, cache_dir)}
+                        except Exception as e:
+                            print(f"Unreadable bhavcopy for {r}: {e}")
+                    elif row.status == "missing" and r < today:
+                        index["requests"][r] = {"missing": True}
+                _write_index(cache_dir, index)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    out = {}
+    with _index_lock(cache_dir):
+        for r in reqs:
+            day = index["requests"].get(r, {}).get("day")
+            if day is None or day in out:
+                continue
+            path = _verified_path(day, index, cache_dir)
+            if path is not None:
+                out[day] = path
+
+    return {pd.Timestamp(d): out[d] for d in sorted(out)}
+
+
+def cached_days(cache_dir: str = RAW_CACHE_DIR) -> list:
+    """Trading days currently held in the cache."""
+    return sorted(pd.Timestamp(d) for d in _read_index(cache_dir)["days"])
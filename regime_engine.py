@@ -1,26 +1,106 @@
 import pandas as pd
 import numpy as np
 
-def integrate_regimes(df, regime_csv, macro_csv, cutoff_date):
+from run_metrics import timed
+
+# ============================================================
+# REGIME TABLE VALIDATION
+# ============================================================
+
+def validate_regime_table(reg: pd.DataFrame) -> list:
     """
-    Integrates regime data. 
-    cutoff_date: The specific decision date (pd.Timestamp) from the UI.
+    Checks the regime intervals (inclusive on both ends) and returns a
+    list of human-readable issues; empty when the table is clean.
+    A single shared boundary day between consecutive regimes is normal
+    for the breakpoint tables and is not reported.
     """
+    issues = []
+
+    bad = reg[reg["end_date"] < reg["start_date"]]
+    for rid in bad["regime_id"]:
+        issues.append(f"regime {rid}: end_date before start_date")
+
+    ok = reg.drop(bad.index).sort_values("start_date", kind="mergesort")
+    if ok.empty:
+        return issues
+
+    iv = pd.IntervalIndex.from_arrays(ok["start_date"], ok["end_date"], closed="both")
+    ids = ok["regime_id"].to_numpy()
+    one_day = pd.Timedelta(days=1)
+
+    # Overlap of more than one day between neighbours
+    if iv.is_overlapping:
+        deep = iv.left[1:] < iv.right[:-1]
+        for i in np.flatnonzero(deep) + 1:
+            issues.append(f"regime {ids[i]} overlaps regime {ids[i - 1]} by more than a boundary day")
+
+    # Calendar days covered by no regime
+    gap = iv.left[1:] > iv.right[:-1] + one_day
+    for i in np.flatnonzero(gap) + 1:
+        issues.append(f"gap between regime {ids[i - 1]} and {ids[i]}: "
+                      f"{iv.right[i - 1].date()} -> {iv.left[i].date()}")
+
+    return issues
+
+
+def load_regime_table(regime_csv) -> pd.DataFrame:
+    """Regime table with start_date / end_date parsed."""
     reg = pd.read_csv(regime_csv)
-    mac = pd.read_csv(macro_csv)
     reg["start_date"] = pd.to_datetime(reg["start_date"])
     reg["end_date"] = pd.to_datetime(reg["end_date"])
+    return reg
+
+# ============================================================
+# DATE -> REGIME LOOKUP
+# ============================================================
+
+def _lookup_regimes(dates: np.ndarray, reg: pd.DataFrame) -> np.ndarray:
+    """
+    Regime id for each date: the first row in table order whose
+    [start_date, end_date] contains it, NaN if none does.
+    """
+    starts = reg["start_date"].to_numpy()
+    ends = reg["end_date"].to_numpy()
+
+    # dates x regimes membership; argmax picks the first match in table order
+    hit = (starts[None, :] <= dates[:, None]) & (ends[None, :] >= dates[:, None])
+    found = hit.any(axis=1)
+
+    out = np.full(len(dates), np.nan)
+    out[found] = reg["regime_id"].to_numpy()[hit[found].argmax(axis=1)]
+    return out
+
+# ============================================================
+# INTEGRATE
+# ============================================================
+
+@timed("regimes", rows=len)
+def integrate_regimes(df, regime_csv, macro_csv, cutoff_date):
+    """
+    Integrates regime data.
+    cutoff_date: The specific decision date (pd.Timestamp) from the UI.
+    """
+    # Validated once per regime-file version by the feature store build
+    reg = load_regime_table(regime_csv)
+    mac = pd.read_csv(macro_csv)
 
     # Ensure cutoff is timestamp
     cutoff_date = pd.to_datetime(cutoff_date)
 
-    def map_reg(d):
-        # Use the passed argument, not the config constant
-        if d > cutoff_date:
-            return np.nan
-        r = reg[(reg.start_date <= d) & (reg.end_date >= d)]
-        return r.regime_id.iloc[0] if len(r) else np.nan
+    # One lookup per distinct date, broadcast back to rows.
+    # Dates after the cutoff (and NaT) get no regime.
+    codes, uniq = pd.factorize(df["DATE"])
+    uniq = pd.DatetimeIndex(uniq)
+
+    regime_by_date = np.full(len(uniq), np.nan)
+    visible = np.asarray(uniq <= cutoff_date)
+    regime_by_date[visible] = _lookup_regimes(uniq.to_numpy()[visible], reg)
+
+    regime = np.where(codes >= 0, regime_by_date[np.maximum(codes, 0)], np.nan)
+    regime = pd.Series(regime, index=df.index)
+    if len(regime) and regime.notna().all():
+        regime = regime.astype(reg["regime_id"].dtype)
 
-    df["regime"] = df["DATE"].apply(map_reg)
+    df["regime"] = regime
     df["macro_group"] = df["regime"].map(mac.set_index("regime_id")["macro_group"])
-    return df
\ No newline at end of file
+    return df
@@ -0,0 +1,291 @@
+# ============================================================
+# run_metrics.py
+# Per-stage wall / CPU / memory / row metrics written to LOG_FILE
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource  # Unix only; CPU of children and peak RSS need it
+except ImportError:
+    resource = None
+
+from config import (
+    LOG_FILE,
+    LOG_MAX_BYTES,
+    PROFILE_STAGE,
+    PROFILE_DIR
+)
+
+# ------------------------------------------------------------
+# RECORDS
+# ------------------------------------------------------------
+# One JSON object per line in LOG_FILE for every finished stage:
+#
+#   run, stage, parent, depth, status, started, ts (end), wall_s,
+#   cpu_s, thread_cpu_s, rows, peak_rss_mb, peak_rss_growth_mb, pid
+#   [+ error, profile, traced_peak_mb, caller fields]
+#
+# cpu_s covers every thread of the process plus child processes reaped
+# during the stage (spawned training workers, pool threads), so stages
+# running at the same time in other threads are counted in each other's
+# cpu_s. thread_cpu_s is the stage's own thread only. peak_rss_mb is the
+# process high-water mark when the stage ends; peak_rss_growth_mb is
+# how far this stage raised it. Each line is one append, so stages in
+# several processes can share the file.
+#
+# Stages inherit the run of their enclosing stage. Outside begin_run()
+# every top-level stage starts a run of its own.
+
+PROFILE_TOP = 30
+
+_local = threading.local()
+_write_lock = threading.Lock()
+_state = {"run": None, "profile": PROFILE_STAGE}
+
+# ============================================================
+# RUNS / SETTINGS
+# ============================================================
+
+def _new_run_id() -> str:
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def begin_run(run_id: str = None) -> str:
+    """Groups every following stage of this process under `run_id`."""
+    _state["run"] = run_id or _new_run_id()
+    return _state["run"]
+
+
+def set_profile_stage(name):
+    """Captures stage `name` with cProfile + tracemalloc from now on (None: off)."""
+    _state["profile"] = name or None
+
+# ============================================================
+# PROBES
+# ============================================================
+
+def _cpu_seconds() -> float:
+    t = time.process_time()
+    if resource is not None:
+        c = resource.getrusage(resource.RUSAGE_CHILDREN)
+        t += c.ru_utime + c.ru_stime
+    return t
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+# ============================================================
+# PROFILE CAPTURE
+# ============================================================
+
+def _start_profile(name: str):
+    if name != _state["profile"] or getattr(_local, "profiling", False):
+        return None
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(10)
+    tracemalloc.reset_peak()
+
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        # Another profiler is already active in this process
+        prof = None
+
+    _local.profiling = True
+    return {"prof": prof, "tracing": started_tracing, "snap": tracemalloc.take_snapshot()}
+
+
+def _stop_profile(capture: dict, run: str, name: str) -> dict:
+    _local.profiling = False
+    if capture["prof"] is not None:
+        capture["prof"].disable()
+
+    snap = tracemalloc.take_snapshot()
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    if capture["tracing"]:
+        tracemalloc.stop()
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{run}-{name}-{datetime.now():%H%M%S%f}")
+
+    with open(f"{base}.txt", "w", encoding="utf-8") as f:
+        if capture["prof"] is not None:
+            capture["prof"].dump_stats(f"{base}.prof")
+            f.write(f"# cProfile: top {PROFILE_TOP} by cumulative time\n")
+            pstats.Stats(capture["prof"], stream=f).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        f.write(f"# tracemalloc: peak {traced_peak / 1024 ** 2:.1f} MB, "
+                f"top {PROFILE_TOP} allocation sites still held at stage end\n")
+        for d in snap.compare_to(capture["snap"], "lineno")[:PROFILE_TOP]:
+            f.write(f"{d}\n")
+
+    return {"profile": f"{base}.txt", "traced_peak_mb": round(traced_peak / 1024 ** 2, 1)}
+
+# ============================================================
+# STAGES
+# ============================================================
+
+def _write(record: dict):
+    line = json.dumps(record, default=str) + "\n"
+    with _write_lock:
+        try:
+            if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) > LOG_MAX_BYTES:
+                os.replace(LOG_FILE, f"{LOG_FILE}.1")
+            with open(LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"⚠️ Could not write run metrics: {e}")
+
+
+@contextmanager
+def stage(name: str, rows=None, **fields):
+    """
+    Measures the enclosed block as stage `name` and logs it when the
+    block ends. The yielded dict takes late values: m["rows"] = len(df).
+    """
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    run = _state["run"] or (parent["run"] if parent else _new_run_id())
+
+    m = {"run": run, "rows": rows, **fields}
+    stack.append({"run": run, "stage": name, "m": m})
+
+    capture = _start_profile(name)
+    started = datetime.now()
+    t0, c0, r0 = time.perf_counter(), _cpu_seconds(), _peak_rss_mb()
+    tc0 = time.thread_time()
+    status, error = "ok", None
+    try:
+        yield m
+    except Exception as e:
+        status, error = "error", f"{type(e).__name__}: {e}"[:500]
+        raise
+    except BaseException as e:
+        status, error = "interrupted", type(e).__name__
+        raise
+    finally:
+        wall, cpu, r1 = time.perf_counter() - t0, _cpu_seconds() - c0, _peak_rss_mb()
+        thread_cpu = time.thread_time() - tc0
+        stack.pop()
+
+        # Callers may report a finer status ("reused"); failures win
+        noted = m.pop("status", None)
+        if error is None and noted:
+            status = noted
+
+        record = {
+            "run": run,
+            "stage": name,
+            "parent": parent["stage"] if parent else None,
+            "depth": len(stack),
+            "status": status,
+            "started": started.isoformat(timespec="milliseconds"),
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "thread_cpu_s": round(thread_cpu, 4),
+            "rows": None if m.get("rows") is None else int(m["rows"]),
+            "peak_rss_mb": None if r1 is None else round(r1, 1),
+            "peak_rss_growth_mb": None if r1 is None else round(r1 - r0, 1),
+            "pid": os.getpid(),
+            **{k: v for k, v in m.items() if k not in ("run", "rows")}
+        }
+        if error:
+            record["error"] = error
+        if capture is not None:
+            record.update(_stop_profile(capture, run, name))
+        _write(record)
+
+
+def timed(name: str, rows=None):
+    """Decorator form of stage(); rows(result) gives the row count."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with stage(name) as m:
+                out = fn(*args, **kwargs)
+                if rows is not None and m.get("rows") is None:
+                    m["rows"] = rows(out)
+                return out
+        return inner
+    return wrap
+
+
+def set_rows(n):
+    """Row count of the innermost open stage of this thread."""
+    stack = _stack()
+    if stack:
+        stack[-1]["m"]["rows"] = n
+
+# ============================================================
+# READ
+# ============================================================
+
+def load_run_metrics(runs: int = 20, log_file: str = LOG_FILE) -> pd.DataFrame:
+    """Stage records of the `runs` most recent runs, in start order."""
+    records = []
+    for path in (f"{log_file}.1", log_file):
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(rec, dict) and "stage" in rec and "run" in rec:
+                    records.append(rec)
+
+    df = pd.DataFrame(records)
+    if df.empty:
+        return df
+
+    df["started"] = pd.to_datetime(df["started"])
+    df["ts"] = pd.to_datetime(df["ts"])
+    first = df.groupby("run")["started"].min().sort_values()
+    df = df[df["run"].isin(first.index[-runs:])]
+    return df.sort_values(["started", "depth"], kind="mergesort").reset_index(drop=True)
+
+
+def summarize_runs(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per run: start, wall time of its top-level stages, errors, peak RSS."""
+    if df.empty:
+        return pd.DataFrame()
+    top = df[df["depth"] == 0]
+    g = df.groupby("run", sort=False)
+    out = pd.DataFrame({
+        "started": g["started"].min(),
+        "wall_s": top.groupby("run")["wall_s"].sum(),
+        "cpu_s": top.groupby("run")["cpu_s"].sum(),
+        "stages": top.groupby("run")["stage"].agg(" → ".join),
+        "errors": g["status"].agg(lambda s: int((s == "error").sum())),
+        "peak_rss_mb": g["peak_rss_mb"].max()
+    })
+    return out.sort_values("started").reset_index()
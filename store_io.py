@@ -0,0 +1,137 @@
+# ============================================================
+# store_io.py
+# Durable file writes and checksums shared by the on-disk stores
+# ============================================================
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import fcntl  # Unix only; elsewhere builders are serialized per process
+except ImportError:
+    fcntl = None
+
+# ------------------------------------------------------------
+# Writes go to "<path>.tmp", are fsync'd, then os.replace'd into place,
+# so a reader sees either the old file or the complete new one. Stores
+# treat leftover *.tmp files as garbage. JSON files may have writers in
+# several processes (job files, worker heartbeat), so their temporary
+# name carries the pid.
+#
+# Derived stores (price panel, symbol history) are rebuilt into a new
+# g<generation>/ directory and switched to by an atomic metadata write.
+# Builders hold dir_lock(<store>) for the whole check -> build -> commit
+# sequence, and only the newest generations are kept, so a reader that
+# has just read the metadata can still open the previous one.
+
+LOCK_FILE = ".lock"
+
+_process_lock = threading.RLock()
+
+# ============================================================
+# DURABLE WRITES
+# ============================================================
+
+def fsync_dir(path: str):
+    """Flushes a directory entry (rename) to disk; no-op where unsupported."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(path: str, payload: dict, default=None, sort_keys: bool = True,
+                      indent=1):
+    """indent=None writes one line through the C encoder (large machine-read files)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(json.dumps(payload, indent=indent, sort_keys=sort_keys, default=default))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def write_npz_atomic(path: str, **arrays):
+    """Writes `arrays` to `path` atomically as a compressed .npz."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def write_parquet_atomic(df: pd.DataFrame, path: str) -> str:
+    """Writes `df` to `path` atomically (zstd Parquet); returns the file's sha256."""
+    tmp = f"{path}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with open(tmp, "wb") as f:
+        pq.write_table(table, f, compression="zstd")
+        f.flush()
+        os.fsync(f.fileno())
+    sha = sha256_file(tmp)
+    os.replace(tmp, path)
+    return sha
+
+# ============================================================
+# GENERATIONS
+# ============================================================
+
+@contextmanager
+def dir_lock(path: str):
+    """Exclusive, cross-process lock on the store directory `path`."""
+    os.makedirs(path, exist_ok=True)
+    if fcntl is None:
+        with _process_lock:
+            yield
+        return
+
+    fd = os.open(os.path.join(path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def collect_generations(path: str, generation: int, keep: int):
+    """Removes g<N>/ directories older than the newest `keep` up to `generation`."""
+    oldest = generation - keep + 1
+    for f in os.listdir(path):
+        full = os.path.join(path, f)
+        if os.path.isdir(full) and f[:1] == "g" and f[1:].isdigit() and int(f[1:]) < oldest:
+            shutil.rmtree(full, ignore_errors=True)
+
+# ============================================================
+# CHECKSUMS / PARTITIONS
+# ============================================================
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def month_bounds(month: str):
+    """(first, last instant) of a "YYYY-MM" partition."""
+    month = pd.Period(month, freq="M")
+    return month.start_time, month.end_time
@@ -0,0 +1,226 @@
+# ============================================================
+# symbol_history.py
+# Per-symbol row index over the master shards for single-symbol reads
+# ============================================================
+
+import os
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import (
+    MASTER_STORE_DIR,
+    SYMBOL_HISTORY_DIR
+)
+from master_store import (
+    load_master,
+    store_exists,
+    master_manifest,
+    normalize_master_frame,
+    master_manifest_path
+)
+from store_io import write_json_atomic, dir_lock, collect_generations, month_bounds
+from run_metrics import timed
+
+# ------------------------------------------------------------
+# LAYOUT
+# ------------------------------------------------------------
+# <SYMBOL_HISTORY_DIR>/_history.json   master content hash, columns,
+#                                      {shard: {month, runs: {symbol: [offset, rows]}}}
+#
+# Master shards are immutable and ordered by (SYMBOL, DATE1), so a
+# symbol's rows in a shard are one contiguous run. The index records
+# that run for every live shard; a symbol's history is one slice per
+# shard that holds it, narrowed to [start, end] with a searchsorted.
+#
+# The index is keyed to the master's content hash. An append only adds
+# shards, so an update reads the SYMBOL column of the shards the index
+# does not know yet and drops the ones the manifest no longer lists
+# (compacted months); its cost follows the new data, not the history.
+#
+# Each process decodes a shard once, on the first read that needs it,
+# and keeps the table until the shard leaves the manifest.
+#
+# The app and the job worker both update it, so an update holds
+# store_io.dir_lock(<SYMBOL_HISTORY_DIR>) and re-checks the hash once
+# the lock is held.
+
+HISTORY_FILE = "_history.json"
+HISTORY_VERSION = 2
+
+_cache = {}
+_tables = {}
+_lock = threading.Lock()
+
+# ============================================================
+# BUILD
+# ============================================================
+
+def _read_meta(history_dir: str):
+    path = os.path.join(history_dir, HISTORY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _current(history_dir: str, master_dir: str):
+    """(master manifest, committed metadata, whether it is up to date)."""
+    manifest = master_manifest(master_dir)
+    old = _read_meta(history_dir)
+    fresh = (old is not None and old["version"] == HISTORY_VERSION
+             and old["master_hash"] == manifest["content_hash"])
+    return manifest, old, fresh
+
+
+def _symbol_runs(path: str) -> dict:
+    sym = pq.read_table(path, columns=["SYMBOL"]).column("SYMBOL").to_numpy(zero_copy_only=False)
+    starts = np.flatnonzero(np.r_[True, sym[1:] != sym[:-1]]) if len(sym) else np.array([], dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(sym)])
+    return {str(sym[i]): [int(i), int(n)] for i, n in zip(starts, sizes)}
+
+
+@timed("symbol_history.build")
+def build_symbol_history(history_dir: str = SYMBOL_HISTORY_DIR,
+                         master_dir: str = MASTER_STORE_DIR) -> dict:
+    """
+    Brings the index up to the current master, indexing only shards
+    added since the last update. Returns the committed metadata.
+    """
+    if not store_exists(master_dir):
+        load_master(columns=["DATE1"], store_dir=master_dir)
+
+    manifest, old, fresh = _current(history_dir, master_dir)
+    if fresh:
+        return old
+
+    with dir_lock(history_dir):
+        # Another process may have updated it while this one waited
+        manifest, old, fresh = _current(history_dir, master_dir)
+        if fresh:
+            return old
+        return _build(history_dir, master_dir, manifest, old)
+
+
+def _build(history_dir: str, master_dir: str, manifest: dict, old) -> dict:
+    known = old["shards"] if old and old["version"] == HISTORY_VERSION else {}
+    shards = {}
+    for name, shard in sorted(manifest["shards"].items()):
+        if name not in known:
+            known[name] = {"month": shard["month"],
+                           "runs": _symbol_runs(os.path.join(master_dir, name))}
+        shards[name] = known[name]
+
+    meta = {
+        "version": HISTORY_VERSION,
+        "master_hash": manifest["content_hash"],
+        "columns": list(manifest["columns"]),
+        "shards": shards
+    }
+    # One run per symbol per shard: compact encoding, not indented
+    write_json_atomic(os.path.join(history_dir, HISTORY_FILE), meta, indent=None)
+
+    if old and old["version"] == 1:
+        # Clustered copies written by version 1
+        collect_generations(history_dir, old["generation"], 0)
+
+    print(f"✅ Symbol history indexed: {len(shards)} shards, {manifest['rows']} rows")
+    return meta
+
+# ============================================================
+# READ (WARM)
+# ============================================================
+
+def _open(history_dir: str, master_dir: str) -> dict:
+    """Index for the current master; one stat while it is unchanged."""
+    history_dir, master_dir = os.path.abspath(history_dir), os.path.abspath(master_dir)
+    key = (history_dir, master_dir)
+
+    with _lock:
+        path = master_manifest_path(master_dir)
+        stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+        entry = _cache.get(key)
+        if entry is not None and stamp is not None and entry["stamp"] == stamp:
+            return entry["meta"]
+
+        meta = build_symbol_history(history_dir, master_dir)
+
+        # Shards gone from the manifest are never read again
+        live = {os.path.join(master_dir, n) for n in meta["shards"]}
+        stale = [p for p in _tables if os.path.dirname(p) == master_dir and p not in live]
+        for p in stale:
+            del _tables[p]
+
+        _cache[key] = {"stamp": os.stat(path).st_mtime_ns, "meta": meta}
+        return meta
+
+
+def _table(path: str) -> pa.Table:
+    with _lock:
+        table = _tables.get(path)
+    if table is None:
+        table = pq.read_table(path, memory_map=True)
+        with _lock:
+            _tables[path] = table
+    return table
+
+
+def _slices(meta: dict, master_dir: str, symbol: str, start, end) -> list:
+    master_dir = os.path.abspath(master_dir)
+    bounded = start is not None or end is not None
+    parts = []
+    for name, shard in sorted(meta["shards"].items()):
+        run = shard["runs"].get(symbol)
+        if run is None:
+            continue
+        if bounded:
+            lo, hi = month_bounds(shard["month"])
+            if (start is not None and hi < start) or (end is not None and lo > end):
+                continue
+
+        part = _table(os.path.join(master_dir, name)).slice(*run)
+        if bounded:
+            dates = part.column("DATE1").to_numpy()
+            a = np.searchsorted(dates, np.datetime64(start, "ns")) if start is not None else 0
+            b = np.searchsorted(dates, np.datetime64(end, "ns"), side="right") if end is not None else len(dates)
+            part = part.slice(a, max(0, b - a))
+        parts.append(part)
+    return parts
+
+
+def load_symbol_history(symbol: str, start=None, end=None, columns=None,
+                        history_dir: str = SYMBOL_HISTORY_DIR,
+                        master_dir: str = MASTER_STORE_DIR) -> pd.DataFrame:
+    """
+    Master rows of `symbol` with DATE1 in [start, end], sorted by date.
+    Reads one slice per month shard holding the symbol, never a whole
+    master scan.
+    """
+    start = pd.to_datetime(start) if start is not None else None
+    end = pd.to_datetime(end) if end is not None else None
+
+    meta = _open(history_dir, master_dir)
+    try:
+        parts = _slices(meta, master_dir, symbol, start, end)
+    except FileNotFoundError:
+        # Another process compacted a month after our index read; the
+        # index for its new manifest lists the merged shard
+        meta = _open(history_dir, master_dir)
+        parts = _slices(meta, master_dir, symbol, start, end)
+
+    all_columns = meta["columns"]
+    columns = all_columns if columns is None else [c for c in all_columns if c in set(columns)]
+
+    if not parts:
+        return normalize_master_frame(pd.DataFrame(columns=columns))
+
+    table = pa.concat_tables(parts)
+    if len(parts) > 1:
+        # Late rows for a month land in a later shard of that month
+        table = table.take(pa.array(np.argsort(table.column("DATE1").to_numpy(), kind="stable")))
+    return table.select(columns).to_pandas()
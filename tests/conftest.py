@@ -0,0 +1,19 @@
+# ============================================================
+# tests/conftest.py
+# Modules live at the repo root; make them importable from tests/
+# ============================================================
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _metrics_log(tmp_path_factory, monkeypatch):
+    """Stage metrics go to a per-test log instead of logs/daily_run.log."""
+    import run_metrics
+    log_dir = tmp_path_factory.mktemp("logs")
+    monkeypatch.setattr(run_metrics, "LOG_FILE", str(log_dir / "daily_run.log"))
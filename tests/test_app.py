@@ -0,0 +1,76 @@
+# ============================================================
+# tests/test_app.py
+# App reruns read the master through the st.cache_data layer
+# ============================================================
+
+import os
+import time
+
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import app_data
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+@pytest.fixture
+def reads(tmp_path, monkeypatch):
+    """Counts of the master reads behind app_data; the manifest is a tmp file."""
+    manifest = tmp_path / "_manifest.json"
+    manifest.write_text("{}")
+    counts = {"range": 0, "symbols": 0, "history": 0}
+
+    def get_master_date_range(store_dir):
+        counts["range"] += 1
+        return "01-Jan-2024", "31-Jan-2024"
+
+    def master_symbols(store_dir):
+        counts["symbols"] += 1
+        return {"BBB", "AAA"}
+
+    def load_symbol_history(symbol, history_dir, master_dir):
+        counts["history"] += 1
+        return pd.DataFrame({"DATE1": pd.bdate_range("2024-01-01", periods=3),
+                             "CLOSE_PRICE": [1.0, 2.0, 3.0]})
+
+    monkeypatch.setattr(app_data, "master_manifest_path", lambda store_dir: str(manifest))
+    monkeypatch.setattr(app_data, "get_master_date_range", get_master_date_range)
+    monkeypatch.setattr(app_data, "master_symbols", master_symbols)
+    monkeypatch.setattr(app_data, "load_symbol_history", load_symbol_history)
+
+    st.cache_data.clear()
+    yield counts, manifest
+    st.cache_data.clear()
+
+
+def test_second_rerun_does_not_reload_the_master(reads):
+    counts, manifest = reads
+    at = AppTest.from_file(APP, default_timeout=120).run()
+    assert not at.exception
+    assert at.selectbox(key="sel_master").value == "AAA"
+    assert counts == {"range": 1, "symbols": 1, "history": 1}
+
+    at.run()
+    assert counts == {"range": 1, "symbols": 1, "history": 1}
+
+    # Another symbol is one more history read; going back is a hit
+    at.selectbox(key="sel_master").select("BBB").run()
+    at.selectbox(key="sel_master").select("AAA").run()
+    assert counts == {"range": 1, "symbols": 1, "history": 2}
+
+
+def test_master_commit_invalidates_the_cache(reads):
+    counts, manifest = reads
+    at = AppTest.from_file(APP, default_timeout=120).run()
+
+    # A commit replaces the manifest
+    stamp = os.stat(manifest).st_mtime_ns
+    manifest.write_text('{"generation": 2}')
+    os.utime(manifest, ns=(time.time_ns(), stamp + 10**9))
+    at.run()
+
+    assert not at.exception
+    assert counts == {"range": 2, "symbols": 2, "history": 2}
@@ -0,0 +1,202 @@
+# ============================================================
+# tests/test_backtest_engine.py
+# Walk-forward backtest vs live trading and the performance check
+# ============================================================
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest_engine
+import model_engine
+import performance_engine
+import price_panel
+import run_metrics
+import trade_engine
+import trading_calendar
+from config import FEATURES, HOLDING_DAYS, REGIME_TABLE, MACRO_MAP
+from backtest_engine import run_backtest, _picks
+from master_store import write_master, load_master
+from corporate_cleaner import clean_corporate_frame
+from regime_engine import integrate_regimes
+from feature_engineer import add_features
+from model_registry import model_meta, model_versions
+from benchmarks.synthetic import make_master
+
+START, END, EVERY = "2020-09-01", "2020-11-20", 21
+
+
+@pytest.fixture(scope="module")
+def world(tmp_path_factory):
+    """A year of 2020 master, its features, and one walk-forward run."""
+    root = tmp_path_factory.mktemp("backtest")
+    dirs = {k: str(root / k) for k in ("master", "panel", "snapshots", "results")}
+    os.makedirs(dirs["results"])
+
+    def panel(panel_dir=dirs["panel"], master_dir=dirs["master"]):
+        return price_panel.load_price_panel(panel_dir, master_dir)
+
+    with pytest.MonkeyPatch.context() as mp:
+        # Runs before the per-test metrics log redirect in conftest
+        mp.setattr(run_metrics, "LOG_FILE", str(root / "daily_run.log"))
+
+        write_master(make_master(n_symbols=12, n_years=1, n_events=1, n_bad_ticks=0,
+                                 start="2020-01-01", seed=4), dirs["master"])
+        feats = clean_corporate_frame(load_master(store_dir=dirs["master"]))
+        feats = add_features(integrate_regimes(feats, REGIME_TABLE, MACRO_MAP, pd.Timestamp.max))
+
+        mp.setattr(backtest_engine, "load_price_panel", panel)
+        mp.setattr(backtest_engine, "PRICE_PANEL_DIR", dirs["panel"])
+        mp.setattr(model_engine, "MIN_TRAIN_ROWS", 400)
+        result = run_backtest(START, END, df_feat=feats, save=False,
+                              retrain_every=EVERY, snapshot_dir=dirs["snapshots"])
+        yield {"dirs": dirs, "feats": feats, "result": result, "panel": panel}
+
+
+def _window_dir(world, decision) -> str:
+    """Snapshot that scored `decision`: the latest window start <= it."""
+    starts = sorted(f for f in os.listdir(world["dirs"]["snapshots"]))
+    start = [s for s in starts if pd.Timestamp(s) <= decision][-1]
+    return os.path.join(world["dirs"]["snapshots"], start)
+
+
+def _sample(result):
+    # First date of each window and the last date of the run
+    rows = result.iloc[list(range(0, len(result), EVERY)) + [len(result) - 1]]
+    return rows.itertuples()
+
+# ============================================================
+# WALK-FORWARD
+# ============================================================
+
+def test_every_window_has_its_own_models(world):
+    result = world["result"]
+    dates = world["panel"]().dates
+    decisions = dates[(dates >= np.datetime64(START)) & (dates <= np.datetime64(END))]
+
+    assert list(result["decision_date"]) == list(pd.DatetimeIndex(decisions))
+    windows = sorted(os.listdir(world["dirs"]["snapshots"]))
+    assert windows == [str(pd.Timestamp(d).date()) for d in decisions[::EVERY]]
+
+
+def test_training_stops_holding_days_before_the_window(world):
+    dates = world["panel"]().dates
+    for start in sorted(os.listdir(world["dirs"]["snapshots"])):
+        model_dir = os.path.join(world["dirs"]["snapshots"], start)
+        w = int(np.searchsorted(dates, np.datetime64(start)))
+        embargo = pd.Timestamp(dates[w - HOLDING_DAYS])
+
+        feats = world["feats"].dropna(subset=FEATURES)
+        macros = model_versions(model_dir)
+        assert macros
+        for m in macros:
+            # Each group trains up to its last row with a known exit price
+            rows = feats[(feats["macro_group"] == float(m)) & (feats["DATE"] <= embargo)]
+            assert pd.Timestamp(model_meta(m, model_dir)["train_end"]) == rows["DATE"].max()
+
+
+def test_rerun_reuses_window_models(world, monkeypatch):
+    monkeypatch.setattr(backtest_engine, "load_price_panel", world["panel"])
+    monkeypatch.setattr(backtest_engine, "PRICE_PANEL_DIR", world["dirs"]["panel"])
+    monkeypatch.setattr(model_engine, "MIN_TRAIN_ROWS", 400)
+    monkeypatch.setattr(backtest_engine, "train_and_save_models",
+                        lambda **kw: pytest.fail("retrained an unchanged window"))
+
+    again = run_backtest(START, END, df_feat=world["feats"], save=False,
+                         retrain_every=EVERY, snapshot_dir=world["dirs"]["snapshots"])
+    pd.testing.assert_frame_equal(again, world["result"])
+
+
+def test_window_key_covers_only_rows_up_to_its_start(world):
+    first = sorted(os.listdir(world["dirs"]["snapshots"]))[0]
+    key = backtest_engine._training_key
+    feats = world["feats"]
+    before = feats[feats["DATE"] <= first]
+
+    changed = before.copy()
+    changed.loc[changed.index[-1], "CLOSE_PRICE"] *= 2
+    assert key(changed) != key(before)
+
+    # Rows after the window start never enter its key
+    later = feats.copy()
+    later.loc[later["DATE"] > first, "CLOSE_PRICE"] *= 2
+    assert key(later[later["DATE"] <= first]) == key(before)
+
+# ============================================================
+# PARITY WITH LIVE TRADING / PERFORMANCE CHECK
+# ============================================================
+
+def test_picks_match_live_trade_decision(world, monkeypatch):
+    for row in _sample(world["result"]):
+        monkeypatch.setattr(trade_engine, "MODEL_DIR", _window_dir(world, row.decision_date))
+        trade = trade_engine.live_trade_decision(world["feats"], row.decision_date, row.entry_date)
+
+        assert trade["cluster"].iloc[0] == row.champion
+        assert "|".join(sorted(trade["SYMBOL"])) == row.symbols
+
+
+def test_returns_match_performance_check(world, monkeypatch):
+    d = world["dirs"]
+    monkeypatch.setattr(performance_engine, "load_price_panel", world["panel"])
+    monkeypatch.setattr(performance_engine, "load_trading_calendar",
+                        lambda: trading_calendar.load_trading_calendar(d["master"]))
+    for name in ("LIVE_TRADES_FILE", "WEEKLY_ALPHA_FILE", "MODEL_RETURNS_FILE"):
+        monkeypatch.setattr(performance_engine, name,
+                            lambda day, name=name: os.path.join(d["results"], f"{name}_{day}.csv"))
+
+    for row in _sample(world["result"]):
+        pd.DataFrame({"SYMBOL": row.symbols.split("|")}).to_csv(
+            performance_engine.LIVE_TRADES_FILE(row.entry_date.date()), index=False
+        )
+        summary, _ = performance_engine.run_weekly_performance_check(row.decision_date)
+        got = summary.set_index("Metric")["Value"]
+
+        assert got["Entry Date"] == str(row.entry_date.date())
+        assert got["Exit Date"] == str(row.exit_date.date())
+        np.testing.assert_allclose(
+            [got["Universe Mean Return"], got["Universe Median Return"],
+             got["Model Mean Return"], got["Model Median Return"],
+             got["Universe Win Rate"], got["Model Win Rate"]],
+            [row.universe_mean, row.universe_median, row.model_mean, row.model_median,
+             row.universe_win_rate, row.model_win_rate],
+            rtol=1e-12
+        )
+
+# ============================================================
+# CHAMPION SELECTION
+# ============================================================
+
+class ScriptedModel:
+    """Predicts a fixed column of a lookup table (NaN allowed)."""
+
+    def __init__(self, preds):
+        self.preds = np.asarray(preds, dtype=np.float32)
+
+    def get_booster(self):
+        return self
+
+    def inplace_predict(self, X):
+        return self.preds
+
+
+def test_dates_no_model_scored_are_dropped(capsys):
+    snap = pd.DataFrame({
+        "SYMBOL": ["A", "B", "A", "B", "A", "B"],
+        "DATE": pd.to_datetime(["2024-01-01"] * 2 + ["2024-01-02"] * 2 + ["2024-01-03"] * 2),
+        **{f: 0.0 for f in FEATURES}
+    })
+    nan = np.nan
+    models = {
+        0: ScriptedModel([0.1, 0.2, nan, nan, nan, nan]),
+        1: ScriptedModel([0.0, 0.0, 0.5, 0.4, nan, nan]),
+    }
+
+    dates, champions, rows = _picks(snap, models)
+
+    # 01-03 has no finite score anywhere; 01-02 only from model 1
+    assert list(dates) == list(pd.to_datetime(["2024-01-01", "2024-01-02"]))
+    assert list(champions) == [0, 1]
+    assert sorted(rows) == [0, 1, 2, 3]
+    assert "dropped" in capsys.readouterr().out
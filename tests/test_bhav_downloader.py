@@ -0,0 +1,306 @@
+# ============================================================
+# tests/test_bhav_downloader.py
+# download_bhavcopies against a local stub HTTP server
+# ============================================================
+
+import os
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import bhav_downloader
+from bhav_downloader import download_bhavcopies, RateLimiter
+
+BODY = b"PK\x03\x04 stub bhavcopy"
+
+# ------------------------------------------------------------
+# STUB SERVER
+# ------------------------------------------------------------
+# Each date in the report URL picks a script of responses (dates not
+# listed are served); the last entry repeats once the script runs out.
+#
+#   200     file with a Content-Disposition name
+#   404     not published
+#   429     throttled, then served
+#   403     stale cookies: served only after a new homepage warm-up
+#   empty   200 with no body
+#   500     always failing
+
+SCRIPTS = {
+    "01-Jan-2024": [200],
+    "02-Jan-2024": [404],
+    "03-Jan-2024": [429, 429, 200],
+    "04-Jan-2024": [403, 200],
+    "05-Jan-2024": ["empty"],
+    "06-Jan-2024": [500],
+}
+
+
+class StubNSE:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = {}          # date -> number of report requests
+        self.starts = []        # monotonic time of every report request
+        self.warmups = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/":
+                    with stub.lock:
+                        stub.warmups += 1
+                    self._send(200, b"<html></html>")
+                    return
+
+                date = parse_qs(url.query)["date"][0]
+                with stub.lock:
+                    stub.starts.append(time.monotonic())
+                    n = stub.hits.get(date, 0)
+                    stub.hits[date] = n + 1
+                script = SCRIPTS.get(date, [200])
+                code = script[min(n, len(script) - 1)]
+
+                if code == 200:
+                    self._send(200, BODY, {"Content-Disposition": 'attachment; filename="bhav.zip"'})
+                elif code == "empty":
+                    self._send(200, b"")
+                else:
+                    self._send(code, b"")
+
+            def _send(self, code, body, headers=None):
+                self.send_response(code)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    with StubNSE() as s:
+        yield s
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Records every jittered backoff draw and sleeps none of it."""
+    draws = []
+
+    def uniform(lo, hi):
+        draws.append((lo, hi))
+        return 0.0
+
+    monkeypatch.setattr(bhav_downloader.random, "uniform", uniform)
+    return draws
+
+
+def _download(stub, tmp_path, dates, **kw):
+    kw = {"max_workers": 4, "rate_per_sec": 50, "retries": 3, "backoff": 0.5, **kw}
+    report = download_bhavcopies(dates, str(tmp_path), base_url=stub.base_url, **kw)
+    return report.set_index("date")
+
+# ============================================================
+# REPORT
+# ============================================================
+
+def test_per_date_report(stub, tmp_path, no_backoff):
+    report = _download(stub, tmp_path, list(SCRIPTS))
+
+    assert list(report.index) == list(SCRIPTS)
+    assert report["status"].to_dict() == {
+        "01-Jan-2024": "ok",
+        "02-Jan-2024": "missing",
+        "03-Jan-2024": "ok",
+        "04-Jan-2024": "ok",
+        "05-Jan-2024": "missing",
+        "06-Jan-2024": "error",
+    }
+
+    ok = report.loc["01-Jan-2024"]
+    assert ok["path"] == os.path.join(str(tmp_path), "01-Jan-2024_bhav.zip")
+    with open(ok["path"], "rb") as f:
+        assert f.read() == BODY
+    assert ok["http_status"] == 200 and pd.isna(ok["error"])
+
+    assert report.loc["02-Jan-2024", "http_status"] == 404
+    assert report.loc["05-Jan-2024", "error"] == "empty response"
+    assert report.loc["06-Jan-2024", "http_status"] == 500
+    assert "500" in report.loc["06-Jan-2024", "error"]
+
+    # Only finished files are left in the directory
+    assert sorted(os.listdir(tmp_path)) == [
+        "01-Jan-2024_bhav.zip", "03-Jan-2024_bhav.zip", "04-Jan-2024_bhav.zip"
+    ]
+
+
+def test_timestamps_and_empty_batch(stub, tmp_path):
+    report = _download(stub, tmp_path, [pd.Timestamp("2024-01-01")])
+    assert report.loc["01-Jan-2024", "status"] == "ok"
+
+    empty = download_bhavcopies([], str(tmp_path), base_url=stub.base_url)
+    assert empty.empty and list(empty.columns) == bhav_downloader.REPORT_COLUMNS
+
+# ============================================================
+# RETRIES / BACKOFF
+# ============================================================
+
+def test_retry_counts(stub, tmp_path, no_backoff):
+    report = _download(stub, tmp_path, list(SCRIPTS), retries=3)
+
+    assert report["attempts"].to_dict() == {
+        "01-Jan-2024": 1,
+        "02-Jan-2024": 1,       # 404 is final
+        "03-Jan-2024": 3,       # two 429s, then served
+        "04-Jan-2024": 2,       # 403, re-warm, served
+        "05-Jan-2024": 1,       # empty body is final
+        "06-Jan-2024": 4,       # 1 + retries
+    }
+    assert stub.hits == report["attempts"].to_dict()
+
+
+def test_rewarm_on_forbidden(stub, tmp_path, no_backoff):
+    _download(stub, tmp_path, ["04-Jan-2024"])
+    # Initial warm-up plus one after the 403
+    assert stub.warmups == 2
+
+    stub.warmups = 0
+    _download(stub, tmp_path, ["03-Jan-2024"])
+    # 429 is throttling, not stale cookies
+    assert stub.warmups == 1
+
+
+def test_jittered_exponential_backoff(stub, tmp_path, no_backoff):
+    _download(stub, tmp_path, ["06-Jan-2024"], retries=3, backoff=0.5)
+
+    # Full jitter: uniform(0, backoff * 2**attempt), none after the last try
+    assert no_backoff == [(0, 0.5), (0, 1.0), (0, 2.0)]
+
+
+# ============================================================
+# RATE LIMIT
+# ============================================================
+
+@pytest.fixture
+def slots(monkeypatch):
+    """Slots granted by every RateLimiter.wait, in call order."""
+    granted = []
+    lock = threading.Lock()
+    real = RateLimiter.wait
+
+    def wait(self):
+        slot = real(self)
+        with lock:
+            granted.append(slot)
+        return slot
+
+    monkeypatch.setattr(RateLimiter, "wait", wait)
+    return granted
+
+
+def _spacing(granted):
+    slots = sorted(granted)
+    return min(b - a for a, b in zip(slots, slots[1:]))
+
+
+def test_rate_limit_across_threads(stub, tmp_path, no_backoff, slots):
+    rate = 10.0
+    dates = [f"{d:02d}-Feb-2024" for d in range(1, 9)] + ["03-Jan-2024", "06-Jan-2024"]
+    _download(stub, tmp_path, dates, max_workers=4, rate_per_sec=rate, retries=2)
+
+    # Every request start (retries included) waits for a slot, across threads
+    assert len(slots) == len(stub.starts) == 8 + 3 + 3
+    assert _spacing(slots) >= 1 / rate - 1e-9
+
+
+def test_concurrent_batches_share_the_rate_limit(stub, tmp_path, no_backoff, slots):
+    rate = 10.0
+    batches = [[f"{d:02d}-Feb-2024" for d in range(1, 6)],
+               [f"{d:02d}-Mar-2024" for d in range(1, 6)]]
+
+    threads = [
+        threading.Thread(target=_download, args=(stub, tmp_path / str(i), dates),
+                         kwargs={"rate_per_sec": rate})
+        for i, dates in enumerate(batches)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    # Two calls against one host draw from a single budget
+    assert len(slots) == len(stub.starts) == 10
+    assert _spacing(slots) >= 1 / rate - 1e-9
+
+
+def test_overlapping_batches_keep_the_strictest_rate():
+    limiter = bhav_downloader.rate_limiter("http://host-a")
+    assert bhav_downloader.rate_limiter("http://host-a") is limiter
+    assert bhav_downloader.rate_limiter("http://host-b") is not limiter
+
+    with limiter.batch(2.0):
+        with limiter.batch(50.0):
+            # A faster batch joining does not speed the slow one up
+            assert limiter.interval == 1 / 2.0
+        with limiter.batch(1.0):
+            assert limiter.interval == 1 / 1.0
+        assert limiter.interval == 1 / 2.0
+
+
+def test_rate_limiter_slots():
+    limiter = RateLimiter(20.0)
+    t0 = time.monotonic()
+    for _ in range(5):
+        limiter.wait()
+    assert time.monotonic() - t0 >= 4 / 20 - 0.01
+
+    unlimited = RateLimiter(0)
+    t0 = time.monotonic()
+    for _ in range(100):
+        unlimited.wait()
+    assert time.monotonic() - t0 < 0.1
+
+# ============================================================
+# LOCAL WRITE FAILURES
+# ============================================================
+
+def test_write_failure_is_reported_not_raised(stub, tmp_path, no_backoff, monkeypatch):
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if "01-Jan-2024" in src:
+            raise OSError(28, "No space left on device")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(bhav_downloader.os, "replace", replace)
+    report = _download(stub, tmp_path, ["01-Jan-2024", "03-Jan-2024"])
+
+    failed = report.loc["01-Jan-2024"]
+    assert failed["status"] == "error"
+    assert "No space left" in failed["error"]
+    assert failed["attempts"] == 1 and pd.isna(failed["path"])
+
+    # The batch still finished, and no stale .part file is left
+    assert report.loc["03-Jan-2024", "status"] == "ok"
+    assert sorted(os.listdir(tmp_path)) == ["03-Jan-2024_bhav.zip"]
@@ -0,0 +1,124 @@
+# ============================================================
+# tests/test_bhav_parser.py
+# Arrow bhavcopy parser vs the pandas read_csv + normalization it replaced
+# ============================================================
+
+import zipfile
+
+import pandas as pd
+import pytest
+
+import bhav_parser
+from bhav_parser import parse_bhavcopy, parse_bhavcopies, BHAV_SCHEMA
+from master_store import normalize_master_frame
+from raw_cache import open_raw_csv
+
+HEADER = ("SYMBOL, SERIES, DATE1, PREV_CLOSE, OPEN_PRICE, HIGH_PRICE, LOW_PRICE, LAST_PRICE, "
+          "CLOSE_PRICE, AVG_PRICE, TTL_TRD_QNTY, TURNOVER_LACS, NO_OF_TRADES, DELIV_QTY, DELIV_PER\n")
+
+# Padded values as NSE writes them; BE / GS rows carry "-" for delivery
+ROWS = [
+    "ABC, EQ, {d}, 100.00, 101.50, 103.00, 99.25, 102.00, 102.10, 101.73, 56691, 57.67, 1917, 33402, 58.92",
+    "ABC, BE, {d}, 99.59, 100.00, 103.00, 95.50, 98.00, 96.16, 97.97, 22592, 22.13, 298, -, -",
+    "XYZ, EQ, {d}, 2500.00, 2490.10, 2533.00, 2480.00, 2521.15, 2520.40, 2510.08, 1204, 30.22, 450, 800, 66.45",
+    "1018GS2026, GS, {d}, 106.00, 104.85, 106.00, 104.85, 104.94, 104.94, 105.95, 226, 0.24, 6, 225, 99.56",
+    "PQR, EQ, {d}, 12.05, 12.10, 12.40, 11.90, 12.00, 12.05, 12.11, 0, 0.00, 0, -, -",
+]
+
+DAYS = ["01-Mar-2024", "04-Mar-2024", "05-Mar-2024"]
+
+
+def _day_file(folder, day, zipped=False):
+    text = HEADER + "".join(r.format(d=day) + "\n" for r in ROWS)
+    name = f"{day}_sec_bhavdata_full.csv"
+    if not zipped:
+        path = folder / name
+        path.write_text(text)
+        return str(path)
+    path = folder / f"{day}_sec_bhavdata_full.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr(name, text)
+    return str(path)
+
+
+def _pandas_parse(path):
+    """What data_pipeline did per file before the Arrow parser."""
+    with open_raw_csv(path) as f:
+        df = pd.read_csv(f, low_memory=False)
+    return normalize_master_frame(df)
+
+
+@pytest.fixture
+def files(tmp_path):
+    return [_day_file(tmp_path, d) for d in DAYS]
+
+# ============================================================
+# SINGLE FILE
+# ============================================================
+
+@pytest.mark.parametrize("zipped", [False, True], ids=["csv", "zip"])
+def test_matches_pandas_parse(tmp_path, zipped):
+    path = _day_file(tmp_path, DAYS[0], zipped=zipped)
+    pd.testing.assert_frame_equal(parse_bhavcopy(path), _pandas_parse(path))
+
+
+def test_columns_are_typed_by_the_schema(files):
+    df = parse_bhavcopy(files[0])
+
+    assert list(df.columns) == list(BHAV_SCHEMA)
+    assert df["DATE1"].dtype == "datetime64[ns]"
+    assert (df["DATE1"] == pd.Timestamp("2024-03-01")).all()
+    for c in BHAV_SCHEMA:
+        if c not in ("SYMBOL", "SERIES", "DATE1"):
+            assert df[c].dtype == "float64", c
+
+    # Padding stripped, "-" read as missing
+    assert df["SERIES"].tolist() == ["EQ", "BE", "EQ", "GS", "EQ"]
+    be = df[df["SERIES"] == "BE"].iloc[0]
+    assert pd.isna(be["DELIV_QTY"]) and pd.isna(be["DELIV_PER"])
+
+
+def test_symbol_and_series_pushdown(files):
+    ref = _pandas_parse(files[0])
+    ref = ref[ref["SYMBOL"].isin(["ABC", "PQR", "NOPE"]) & (ref["SERIES"] == "EQ")]
+
+    got = parse_bhavcopy(files[0], usecols=["DATE1", "CLOSE_PRICE"],
+                         symbols={"ABC", "PQR", "NOPE"}, series={"EQ"})
+
+    # Filter columns not asked for are dropped after the filter
+    assert list(got.columns) == ["DATE1", "CLOSE_PRICE"]
+    pd.testing.assert_frame_equal(got, ref[["DATE1", "CLOSE_PRICE"]].reset_index(drop=True))
+
+    assert parse_bhavcopy(files[0], symbols=[]).empty
+
+# ============================================================
+# MANY FILES
+# ============================================================
+
+def test_batch_matches_per_file_concat(files):
+    ref = pd.concat([_pandas_parse(p) for p in files], ignore_index=True)
+    pd.testing.assert_frame_equal(parse_bhavcopies(files, processes=1), ref)
+
+
+def test_process_pool_matches_in_process(tmp_path, files, monkeypatch):
+    files = files + [_day_file(tmp_path, "06-Mar-2024", zipped=True)]
+    bad = tmp_path / "07-Mar-2024_sec_bhavdata_full.zip"
+    bad.write_bytes(b"PK\x03\x04 truncated")
+
+    pools = []
+    real = bhav_parser.ProcessPoolExecutor
+
+    def pool(*args, **kw):
+        pools.append(kw.get("max_workers"))
+        return real(*args, **kw)
+
+    monkeypatch.setattr(bhav_parser, "ProcessPoolExecutor", pool)
+    monkeypatch.setattr(bhav_parser, "PARSE_POOL_MIN_FILES", 2)
+
+    serial = parse_bhavcopies(files + [str(bad)], symbols={"ABC", "XYZ"}, processes=1)
+    pooled = parse_bhavcopies(files + [str(bad)], symbols={"ABC", "XYZ"}, processes=2)
+
+    # Unreadable files are skipped on both paths; order follows `paths`
+    assert pools == [2]
+    assert len(serial) == 3 * len(files)
+    pd.testing.assert_frame_equal(pooled, serial)
@@ -0,0 +1,115 @@
+# ============================================================
+# tests/test_corporate_cleaner.py
+# Vectorized cleaner vs the legacy loop; event ledger vs full scans
+# ============================================================
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from corporate_cleaner import (
+    clean_corporate_frame,
+    update_event_ledger,
+    _prepare,
+    _detect_events,
+    _flag_keys,
+    GAP_DAYS
+)
+from master_store import write_master, append_master
+from benchmarks.synthetic import make_master
+from benchmarks.bench_corporate_cleaner import legacy_clean_corporate_frame
+
+
+def _assert_same(df):
+    new = clean_corporate_frame(df)
+    old = legacy_clean_corporate_frame(df)
+    pd.testing.assert_frame_equal(new, old, check_exact=True)
+    return new
+
+
+@pytest.fixture
+def master():
+    # A year of 12 symbols with splits and bad ticks injected
+    return make_master(n_symbols=12, n_years=1, n_events=5, n_bad_ticks=8, seed=3)
+
+# ============================================================
+# EQUIVALENCE
+# ============================================================
+
+def test_matches_legacy(master):
+    out = _assert_same(master)
+    assert out["SYMBOL"].str.endswith("_PRE").any()
+    assert out["SYMBOL"].str.endswith("_POST").any()
+
+
+def test_matches_legacy_on_text_columns(master):
+    # Bhavcopy text: thousands separators, percent signs, padding, junk
+    text = master.astype({c: str for c in master.columns if c not in ("SYMBOL", "DATE1")})
+    text["TURNOVER_LACS"] = master["TURNOVER_LACS"].map("{:,.2f}".format)
+    text["DELIV_PER"] = " " + master["DELIV_PER"].astype(str) + "%"
+    text.loc[::17, "NO_OF_TRADES"] = "-"
+
+    _assert_same(text.sample(frac=1, random_state=0))
+
+
+def test_matches_legacy_excluded_and_late_events(master):
+    sym = master["SYMBOL"].unique()
+    close = master["CLOSE_PRICE"].copy()
+
+    # Split in an excluded symbol, and one too close to the end to confirm
+    britannia = master["SYMBOL"] == sym[0]
+    close[britannia & (master.groupby("SYMBOL").cumcount() >= 100)] /= 2
+    late = master["SYMBOL"] == sym[1]
+    close[late & (master.groupby("SYMBOL").cumcount() >= late.sum() - 3)] /= 2
+
+    df = master.assign(CLOSE_PRICE=close)
+    df["SYMBOL"] = df["SYMBOL"].replace({sym[0]: "BRITANNIA"})
+
+    out = _assert_same(df)
+    assert not out["SYMBOL"].str.startswith("BRITANNIA_").any()
+
+
+def test_split_leaves_gap_around_event():
+    df = make_master(n_symbols=1, n_years=0.4, n_events=0, n_bad_ticks=0, seed=1)
+    df.loc[50:, "CLOSE_PRICE"] /= 2
+
+    out = _assert_same(df)
+    sym = df["SYMBOL"].iloc[0]
+    assert (out["SYMBOL"] == f"{sym}_PRE").sum() == 50 - GAP_DAYS
+    assert (out["SYMBOL"] == f"{sym}_POST").sum() == len(df) - 50 - GAP_DAYS - 1
+    assert np.all(out["SYMBOL"].str.startswith(sym))
+
+# ============================================================
+# EVENT LEDGER
+# ============================================================
+
+@pytest.fixture
+def ledger_store(tmp_path):
+    """A tmp_path master store and its ledger path."""
+    return str(tmp_path / "master"), str(tmp_path / "ledger.json")
+
+
+def _full_scan_flags(df):
+    scan = _detect_events(_prepare(df))
+    return _flag_keys(scan, scan["suspected_corp_event"]), _flag_keys(scan, scan["suspected_bad_tick"])
+
+
+def test_ledger_matches_full_scan_across_appends(ledger_store):
+    store, ledger = ledger_store
+    master = make_master(n_symbols=8, n_years=0.6, n_events=4, n_bad_ticks=6, seed=11)
+    days = np.sort(master["DATE1"].unique())
+
+    write_master(master[master["DATE1"] < days[60]], store)
+    assert update_event_ledger(ledger, store) == _full_scan_flags(master[master["DATE1"] < days[60]])
+
+    for lo, hi in [(60, 61), (61, 70), (70, len(days))]:
+        append_master(master[master["DATE1"].between(days[lo], days[hi - 1])], store)
+        seen = master[master["DATE1"] <= days[hi - 1]]
+        assert update_event_ledger(ledger, store) == _full_scan_flags(seen)
+
+    with open(ledger) as f:
+        assert json.load(f)["through_date"] == str(pd.Timestamp(days[-1]).date())
+    assert not [f for f in os.listdir(os.path.dirname(ledger)) if f.endswith(".tmp")]
@@ -0,0 +1,128 @@
+# ============================================================
+# tests/test_feature_state.py
+# Streaming FeatureState against add_features; saved-state checks
+# ============================================================
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import FEATURES
+from feature_state import FeatureState, advance_feature_state, check_against_batch
+from feature_engineer import add_features
+from benchmarks.synthetic import make_master
+
+KEY = ["SYMBOL", "DATE"]
+
+
+@pytest.fixture
+def history():
+    # Cleaned-frame columns for 5 symbols, one of them listed late
+    df = make_master(n_symbols=5, n_years=0.2, n_events=0, n_bad_ticks=0, start="2024-01-01", seed=9)
+    df = df.rename(columns={"DATE1": "DATE"}).drop(columns=["SERIES", "PREV_CLOSE"])
+    late = (df["SYMBOL"] == "SYM0004") & (df["DATE"] < "2024-01-20")
+    return df[~late].reset_index(drop=True)
+
+
+def _split(df, n_days):
+    dates = np.sort(df["DATE"].unique())
+    cut = dates[-n_days]
+    return df[df["DATE"] < cut], [df[df["DATE"] == d] for d in dates[-n_days:]]
+
+
+def _features(df):
+    return df.sort_values(KEY).reset_index(drop=True)[FEATURES].to_numpy(dtype=float)
+
+# ============================================================
+# STREAMING
+# ============================================================
+
+def test_update_matches_add_features(history):
+    past, days = _split(history, 5)
+    st = FeatureState().bootstrap(past)
+    streamed = pd.concat([st.update(d) for d in days], ignore_index=True)
+
+    batch = add_features(history)
+    batch = batch[batch["DATE"] >= days[0]["DATE"].iloc[0]]
+    np.testing.assert_allclose(_features(streamed), _features(batch), rtol=1e-9, atol=1e-12)
+
+
+def test_update_rejects_old_or_mixed_days(history):
+    past, days = _split(history, 2)
+    st = FeatureState().bootstrap(past)
+
+    with pytest.raises(RuntimeError, match="not after state date"):
+        st.update(past[past["DATE"] == past["DATE"].max()])
+    with pytest.raises(RuntimeError, match="exactly one trading date"):
+        st.update(pd.concat(days))
+
+# ============================================================
+# PERSISTENCE
+# ============================================================
+
+def test_save_load_round_trip(history, tmp_path):
+    path = str(tmp_path / "state.npz")
+    past, days = _split(history, 3)
+    FeatureState().bootstrap(past).save(path, "v1")
+
+    assert os.listdir(tmp_path) == ["state.npz"]
+    resumed = advance_feature_state(pd.concat(days), past["DATE"].max(), "v1", path)
+    assert resumed is not None
+
+    st = FeatureState().bootstrap(past)
+    expected = pd.concat([st.update(d) for d in days], ignore_index=True)
+    np.testing.assert_array_equal(_features(resumed[0]), _features(expected))
+    assert resumed[1].last_date == days[-1]["DATE"].iloc[0]
+
+
+def test_advance_refuses_other_version_or_gap(history, tmp_path):
+    path = str(tmp_path / "state.npz")
+    past, days = _split(history, 3)
+    FeatureState().bootstrap(past).save(path, "v1")
+
+    assert advance_feature_state(pd.concat(days), past["DATE"].max(), "v2", path) is None
+    assert advance_feature_state(pd.concat(days), days[0]["DATE"].iloc[0], "v1", path) is None
+    assert advance_feature_state(pd.concat(days), past["DATE"].max(), "v1", str(tmp_path / "none")) is None
+
+# ============================================================
+# SAVED-STATE CHECK
+# ============================================================
+
+def test_check_passes_for_matching_state(history, tmp_path):
+    path = str(tmp_path / "state.npz")
+    past, _ = _split(history, 4)
+    FeatureState().bootstrap(past).save(path)
+
+    assert check_against_batch(history, path, n_days=3) < 1e-9
+
+
+def test_check_catches_stale_state(history, tmp_path):
+    path = str(tmp_path / "state.npz")
+    past, _ = _split(history, 4)
+
+    # State seeded from history that has since been corrected
+    stale = past.copy()
+    last = stale["DATE"] == stale["DATE"].max()
+    stale.loc[last & (stale["SYMBOL"] == "SYM0001"), "CLOSE_PRICE"] *= 1.5
+    FeatureState().bootstrap(stale).save(path)
+
+    with pytest.raises(RuntimeError, match="diverges"):
+        check_against_batch(history, path, n_days=3)
+
+
+def test_check_catches_unreadable_state(history, tmp_path):
+    path = tmp_path / "state.npz"
+    path.write_bytes(b"truncated")
+
+    with pytest.raises(RuntimeError, match="could not be read"):
+        check_against_batch(history, str(path))
+
+
+def test_check_needs_dates_after_state(history, tmp_path):
+    path = str(tmp_path / "state.npz")
+    FeatureState().bootstrap(history).save(path)
+
+    with pytest.raises(RuntimeError, match="No dates after"):
+        check_against_batch(history, path)
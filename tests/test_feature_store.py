@@ -0,0 +1,244 @@
+# ============================================================
+# tests/test_feature_store.py
+# Feature store builds, point-in-time reads and staleness
+# ============================================================
+
+import os
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+from config import FEATURES
+from feature_store import build_feature_store, load_features, feature_store_version
+from master_store import write_master, append_master, load_master
+from corporate_cleaner import clean_corporate_frame
+from regime_engine import integrate_regimes
+from feature_engineer import add_features
+from feature_state import FeatureState
+from benchmarks.synthetic import make_master
+
+KEY = ["SYMBOL", "DATE"]
+
+
+@pytest.fixture
+def master():
+    # Jan-May 2024, one split and a few bad ticks
+    return make_master(n_symbols=6, n_years=0.4, n_events=1, n_bad_ticks=3,
+                       start="2024-01-01", seed=5)
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Master, feature store, state file and regime files under tmp_path."""
+    paths = {
+        "master": str(tmp_path / "master"),
+        "features": str(tmp_path / "features"),
+        "state": str(tmp_path / "feature_state.npz"),
+        "regimes": str(tmp_path / "regimes.csv"),
+        "macros": str(tmp_path / "macros.csv"),
+        "ledger": str(tmp_path / "ledger.json"),
+    }
+    shutil.copy(feature_store.REGIME_TABLE, paths["regimes"])
+    shutil.copy(feature_store.MACRO_MAP, paths["macros"])
+    monkeypatch.setattr(feature_store, "REGIME_TABLE", paths["regimes"])
+    monkeypatch.setattr(feature_store, "MACRO_MAP", paths["macros"])
+    return paths
+
+
+def _build(stores):
+    return build_feature_store(stores["features"], stores["master"], stores["state"], stores["ledger"])
+
+
+def _load(stores, **kw):
+    return load_features(store_dir=stores["features"], master_dir=stores["master"], **kw)
+
+
+def _pipeline(stores, as_of, start=None):
+    """clean -> integrate_regimes(cutoff=as_of) -> add_features, rows in [start, as_of]."""
+    df = clean_corporate_frame(load_master(store_dir=stores["master"]))
+    df = integrate_regimes(df, stores["regimes"], stores["macros"], cutoff_date=as_of)
+    df = add_features(df)
+
+    keep = df["DATE"] <= as_of
+    if start is not None:
+        keep &= df["DATE"] >= start
+    df = df[keep].sort_values(KEY, kind="mergesort").reset_index(drop=True)
+    return df.astype({"regime": "float64", "macro_group": "float64"})
+
+# ============================================================
+# POINT-IN-TIME READS
+# ============================================================
+
+def test_full_build_matches_pipeline(stores, master):
+    write_master(master, stores["master"])
+    summary = _build(stores)
+    assert summary["status"] == "full"
+    assert summary["data_version"] == feature_store_version(stores["features"])
+
+    for as_of, start in [("2024-03-15", None), ("2024-05-10", "2024-04-01")]:
+        as_of, start = pd.Timestamp(as_of), start and pd.Timestamp(start)
+        out = _load(stores, as_of=as_of, start=start)
+        pd.testing.assert_frame_equal(out, _pipeline(stores, as_of, start), check_exact=True)
+
+
+def test_column_and_symbol_selection(stores, master):
+    write_master(master, stores["master"])
+    _build(stores)
+
+    full = _load(stores, as_of="2024-02-29")
+    sym = full["SYMBOL"].iloc[-1]
+
+    out = _load(stores, as_of="2024-02-29", columns=["DATE", "ret_1"], symbols={sym})
+    assert list(out.columns) == ["DATE", "ret_1"]
+    pd.testing.assert_frame_equal(
+        out, full.loc[full["SYMBOL"] == sym, ["DATE", "ret_1"]].reset_index(drop=True)
+    )
+
+
+def test_unchanged_inputs_are_fresh(stores, master):
+    write_master(master, stores["master"])
+    first = _build(stores)
+    again = _build(stores)
+    assert again["status"] == "fresh"
+    assert again["data_version"] == first["data_version"]
+
+# ============================================================
+# INCREMENTAL BUILDS
+# ============================================================
+
+def _assert_matches_full(stores):
+    """
+    The incremental store reads back like a from-scratch build. Rolling
+    std restarted over a warm-up slice (or streamed) differs from the
+    full-history pass in the last bits, hence the tolerance.
+    """
+    as_of = pd.Timestamp("2030-01-01")
+    out = _load(stores, as_of=as_of)
+    exp = _pipeline(stores, as_of)
+    pd.testing.assert_frame_equal(out, exp, check_exact=False, rtol=1e-9, atol=1e-12)
+
+
+def test_appended_days_are_streamed(stores):
+    # No split or bad tick whose flag the new days could change
+    master = make_master(n_symbols=6, n_years=0.4, n_events=0, n_bad_ticks=0,
+                         start="2024-01-01", seed=5)
+    days = np.sort(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-3]], stores["master"])
+    _build(stores)
+
+    append_master(master[master["DATE1"] >= days[-3]], stores["master"])
+    summary = _build(stores)
+
+    assert summary["status"] == "streamed"
+    assert summary["rows"] == (master["DATE1"] >= days[-3]).sum()
+    _assert_matches_full(stores)
+
+
+def test_ledger_flags_follow_appends(stores, master):
+    # Appends in steps so the ledger confirms flags incrementally
+    days = np.sort(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[40]], stores["master"])
+    _build(stores)
+
+    for lo, hi in [(40, 41), (41, 60), (60, len(days))]:
+        append_master(master[master["DATE1"].between(days[lo], days[hi - 1])], stores["master"])
+        _build(stores)
+        _assert_matches_full(stores)
+
+    with open(stores["ledger"]) as f:
+        assert json.load(f)["through_date"] == str(pd.Timestamp(days[-1]).date())
+
+
+def test_backfilled_month_is_rebuilt(stores, master):
+    hole = (master["SYMBOL"] == "SYM0001") & master["DATE1"].between("2024-02-05", "2024-02-09")
+    write_master(master[~hole], stores["master"])
+    _build(stores)
+
+    append_master(master[hole], stores["master"])
+    summary = _build(stores)
+
+    assert summary["status"] == "incremental"
+    _assert_matches_full(stores)
+
+
+def test_missing_state_falls_back_to_batch(stores, master):
+    days = np.sort(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-2]], stores["master"])
+    _build(stores)
+
+    os.remove(stores["state"])
+    append_master(master[master["DATE1"] >= days[-2]], stores["master"])
+    assert _build(stores)["status"] == "incremental"
+    _assert_matches_full(stores)
+
+def test_stale_state_falls_back_to_batch(stores):
+    master = make_master(n_symbols=6, n_years=0.4, n_events=0, n_bad_ticks=0,
+                         start="2024-01-01", seed=5)
+    days = np.sort(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-2]], stores["master"])
+    _build(stores)
+
+    # Right version tag, wrong buffers: only the saved-state check sees it
+    st = FeatureState.load(stores["state"])
+    st.close[0, -1] *= 1.5
+    st.save(stores["state"], st.version)
+
+    append_master(master[master["DATE1"] >= days[-2]], stores["master"])
+    assert _build(stores)["status"] == "incremental"
+    _assert_matches_full(stores)
+
+# ============================================================
+# STALENESS
+# ============================================================
+
+def test_not_built_raises(stores):
+    with pytest.raises(RuntimeError, match="not built"):
+        _load(stores)
+
+
+def test_master_change_makes_reads_stale(stores, master):
+    days = np.sort(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-1]], stores["master"])
+    _build(stores)
+
+    append_master(master[master["DATE1"] == days[-1]], stores["master"])
+    with pytest.raises(RuntimeError, match="master changed"):
+        _load(stores)
+
+    _build(stores)
+    assert _load(stores)["DATE"].max() == days[-1]
+
+
+def test_regime_change_makes_reads_stale(stores, master):
+    write_master(master, stores["master"])
+    _build(stores)
+
+    mac = pd.read_csv(stores["macros"])
+    mac["macro_group"] = (mac["macro_group"] + 1) % 4
+    mac.to_csv(stores["macros"], index=False)
+
+    with pytest.raises(RuntimeError, match="regime files changed"):
+        _load(stores)
+    assert _build(stores)["status"] == "full"
+    out = _load(stores, as_of="2024-03-01")
+    assert out[FEATURES].notna().any().all()
+
+
+def test_regime_issues_reported_once_per_version(stores, master, capsys):
+    reg = pd.read_csv(stores["regimes"])
+    reg.loc[reg.index[-1], "end_date"] = "1990-01-01"
+    reg.to_csv(stores["regimes"], index=False)
+    write_master(master.iloc[:-10], stores["master"])
+
+    _build(stores)
+    warned = capsys.readouterr().out
+    assert f"regime {reg['regime_id'].iloc[-1]}: end_date before start_date" in warned
+
+    # Same regime files: later builds and appends stay quiet
+    append_master(master.iloc[-10:], stores["master"])
+    _build(stores)
+    assert "Regime table" not in capsys.readouterr().out
@@ -0,0 +1,289 @@
+# ============================================================
+# tests/test_job_runner.py
+# Job queue: dedupe, claims, cancel, orphan recovery, worker lock
+# ============================================================
+
+import os
+import sys
+import time
+import subprocess
+import multiprocessing
+
+import pytest
+
+import job_runner
+from pipeline_dag import Node, run_node as pipeline_run_node
+from job_runner import (
+    submit_pipeline_job,
+    submit_backtest_job,
+    job_status,
+    cancel_job,
+    list_jobs,
+    run_worker,
+    CLAIM_FILE
+)
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_runner, "JOB_POLL_SEC", 0.05)
+    return str(tmp_path / "jobs")
+
+
+@pytest.fixture
+def fork_children(monkeypatch):
+    """Job children are forked, so a patched _run_job runs in them."""
+    real = multiprocessing.get_context
+    monkeypatch.setattr(job_runner.mp, "get_context", lambda method=None: real("fork"))
+
+
+def _submit(jobs, day="2024-03-01", **kw):
+    return submit_pipeline_job(day, jobs_dir=jobs, **kw)
+
+
+def _marker(jobs, job_id):
+    return os.path.join(jobs, f"{job_status(job_id, jobs)['key']}.active")
+
+# ============================================================
+# SUBMIT
+# ============================================================
+
+def test_same_params_share_an_active_job(jobs):
+    a = _submit(jobs)
+    assert _submit(jobs) == a
+    assert _submit(jobs, train_mode="full") != a
+
+    job = job_status(a, jobs)
+    assert job["status"] == "queued" and job["progress"] == 0
+    assert list(job["stages"]) == job_runner.STAGES
+    assert len(list_jobs(jobs_dir=jobs)) == 2
+
+
+def test_backtest_job_has_its_own_stages(jobs):
+    bt = submit_backtest_job("2023-03-01", "2024-03-01", jobs_dir=jobs)
+    assert submit_backtest_job("2023-03-01", "2024-03-01", jobs_dir=jobs) == bt
+    assert bt != _submit(jobs)
+
+    job = job_status(bt, jobs)
+    assert job["kind"] == "backtest"
+    assert job["params"] == {"start": "2023-03-01", "end": "2024-03-01"}
+    assert list(job["stages"]) == ["features", "backtest"]
+    assert list_jobs(jobs_dir=jobs)["kind"].tolist().count("backtest") == 1
+
+
+def test_finished_job_releases_its_params(jobs):
+    a = _submit(jobs)
+    job_runner._finish(a, jobs, "done")
+    assert not os.path.exists(_marker(jobs, a))
+
+    b = _submit(jobs)
+    assert b != a and job_status(b, jobs)["status"] == "queued"
+
+
+def test_stale_marker_of_finished_job_is_replaced(jobs):
+    a = _submit(jobs)
+    marker = _marker(jobs, a)
+    job = job_runner._read_job(a, jobs)
+    job["status"] = "failed"
+    job_runner._save_job(job, jobs)
+
+    # Marker still points at the finished job
+    assert os.path.exists(marker)
+    assert _submit(jobs) != a
+
+# ============================================================
+# CLAIMS
+# ============================================================
+
+def test_each_queued_job_is_claimed_once(jobs):
+    ids = [_submit(jobs, day=f"2024-03-0{d}") for d in (1, 2, 3)]
+
+    # Oldest id first; ids made in the same second sort by their suffix
+    claimed = [job_runner._next_job(jobs) for _ in range(4)]
+    assert claimed == sorted(ids) + [None]
+    for job_id in ids:
+        assert os.path.exists(os.path.join(jobs, job_id, CLAIM_FILE))
+
+
+def test_cancelled_queued_job_never_starts(jobs):
+    a = _submit(jobs)
+    cancel_job(a, jobs)
+
+    job_id = job_runner._next_job(jobs)
+    job_runner._execute(job_id, jobs)
+
+    job = job_status(a, jobs)
+    assert job["status"] == "cancelled" and job["started"] is None
+    assert all(s["status"] == "cancelled" for s in job["stages"].values())
+    assert not os.path.exists(_marker(jobs, a))
+
+# ============================================================
+# RUNNING JOBS
+# ============================================================
+
+def _sleeping_job(job_id, jobs_dir):
+    job = job_runner._read_job(job_id, jobs_dir)
+    job["stages"][job_runner.STAGES[0]] = {"status": "running"}
+    job_runner._save_job(job, jobs_dir)
+    time.sleep(60)
+
+
+def _failing_job(job_id, jobs_dir):
+    raise SystemExit(3)
+
+
+def test_cancel_stops_a_running_job(jobs, fork_children, monkeypatch):
+    monkeypatch.setattr(job_runner, "_run_job", _sleeping_job)
+    a = _submit(jobs)
+    job_runner._next_job(jobs)
+
+    def cancel_soon():
+        while job_status(a, jobs)["stages"][job_runner.STAGES[0]]["status"] != "running":
+            time.sleep(0.02)
+        cancel_job(a, jobs)
+
+    ctx = multiprocessing.get_context("fork")
+    canceller = ctx.Process(target=cancel_soon)
+    canceller.start()
+
+    t0 = time.monotonic()
+    job_runner._execute(a, jobs)
+    canceller.join(10)
+
+    assert time.monotonic() - t0 < 10
+    job = job_status(a, jobs)
+    assert job["status"] == "cancelled"
+    assert job["stages"][job_runner.STAGES[0]]["status"] == "cancelled"
+
+
+def test_job_runs_the_nodes_of_its_kind(jobs, fork_children, monkeypatch, tmp_path):
+    ran = tmp_path / "ran.txt"
+
+    def record(params, inputs, work_dir):
+        with open(ran, "a") as f:
+            f.write(f"{params['start']}\n")
+        return {"n": 1}
+
+    monkeypatch.setitem(job_runner.JOB_KINDS, "backtest",
+                        [Node("toy", [], lambda p, up: {"p": p}, record)])
+    monkeypatch.setattr(job_runner, "run_node",
+                        lambda node, params, up, job_dir: pipeline_run_node(
+                            node, params, up, job_dir, str(tmp_path / "ckpt")))
+
+    bt = submit_backtest_job("2023-03-01", "2024-03-01", jobs_dir=jobs)
+    job_runner._next_job(jobs)
+    job_runner._execute(bt, jobs)
+
+    job = job_status(bt, jobs)
+    assert job["status"] == "done"
+    assert job["result"] == {"toy": {"n": 1}}
+    assert ran.read_text() == "2023-03-01\n"
+
+
+def test_failed_child_fails_the_job(jobs, fork_children, monkeypatch):
+    monkeypatch.setattr(job_runner, "_run_job", _failing_job)
+    a = _submit(jobs)
+    job_runner._next_job(jobs)
+    job_runner._execute(a, jobs)
+
+    job = job_status(a, jobs)
+    assert job["status"] == "failed"
+    assert "exited with code 3" in job["error"]
+    assert not os.path.exists(_marker(jobs, a))
+
+# ============================================================
+# WORKER / ORPHAN RECOVERY
+# ============================================================
+
+def _orphans(jobs):
+    running, claimed, waiting = (_submit(jobs, day=f"2024-03-0{d}") for d in (1, 2, 3))
+
+    job = job_runner._read_job(running, jobs)
+    job["status"] = "running"
+    job_runner._save_job(job, jobs)
+    open(os.path.join(jobs, running, CLAIM_FILE), "w").close()
+    open(os.path.join(jobs, claimed, CLAIM_FILE), "w").close()
+    return running, claimed, waiting
+
+
+def test_worker_recovers_orphans(jobs, monkeypatch):
+    running, claimed, waiting = _orphans(jobs)
+    served = []
+    monkeypatch.setattr(job_runner, "_execute", lambda job_id, d: served.append(job_id))
+
+    run_worker(jobs, idle_exit=0.1)
+
+    assert job_status(running, jobs)["status"] == "failed"
+    assert "while the job was running" in job_status(running, jobs)["error"]
+    assert job_status(claimed, jobs)["status"] == "failed"
+    assert not os.path.exists(os.path.join(jobs, claimed, CLAIM_FILE))
+    # The unclaimed job is served as usual
+    assert served == [waiting]
+
+
+def _hold_worker_lock(jobs, ready, release):
+    with job_runner._worker_slot(jobs) as held:
+        assert held
+        ready.set()
+        release.wait(30)
+
+
+def test_second_worker_leaves_live_jobs_alone(jobs, capsys):
+    running, claimed, waiting = _orphans(jobs)
+
+    ctx = multiprocessing.get_context("fork")
+    ready, release = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold_worker_lock, args=(jobs, ready, release))
+    holder.start()
+    try:
+        assert ready.wait(10)
+        run_worker(jobs, idle_exit=0.1)
+    finally:
+        release.set()
+        holder.join(10)
+
+    assert "Another worker" in capsys.readouterr().out
+    assert job_status(running, jobs)["status"] == "running"
+    assert job_status(claimed, jobs)["status"] == "queued"
+    assert os.path.exists(os.path.join(jobs, claimed, CLAIM_FILE))
+
+
+def _job_with_pool(job_id, jobs_dir):
+    # Stands in for a stage that fans out to pool workers
+    pool = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    with open(os.path.join(jobs_dir, "pool.pid"), "w") as f:
+        f.write(str(pool.pid))
+    _sleeping_job(job_id, jobs_dir)
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="needs /proc")
+def test_cancel_stops_the_jobs_pool_workers(jobs, fork_children, monkeypatch):
+    monkeypatch.setattr(job_runner, "_run_job", _job_with_pool)
+    a = _submit(jobs)
+    job_runner._next_job(jobs)
+
+    def cancel_soon():
+        while job_status(a, jobs)["stages"][job_runner.STAGES[0]]["status"] != "running":
+            time.sleep(0.02)
+        cancel_job(a, jobs)
+
+    canceller = multiprocessing.get_context("fork").Process(target=cancel_soon)
+    canceller.start()
+    job_runner._execute(a, jobs)
+    canceller.join(10)
+
+    with open(os.path.join(jobs, "pool.pid")) as f:
+        pid = int(f.read())
+    deadline = time.monotonic() + 5
+    while _alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(pid)
+    assert job_status(a, jobs)["status"] == "cancelled"
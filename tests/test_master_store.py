@@ -0,0 +1,245 @@
+# ============================================================
+# tests/test_master_store.py
+# Columnar master store: commits, dedupe, compaction, lock, migration
+# ============================================================
+
+import os
+import json
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+import master_store
+from master_store import (
+    write_master,
+    append_master,
+    load_master,
+    master_info,
+    master_manifest,
+    master_manifest_path,
+    master_date_counts,
+    normalize_master_frame,
+    MANIFEST_FILE,
+    COMPACT_AFTER_SHARDS,
+    SORT_KEY
+)
+from benchmarks.synthetic import make_master
+
+
+@pytest.fixture
+def store(tmp_path):
+    return str(tmp_path / "store")
+
+
+@pytest.fixture
+def master():
+    # Jan-Mar 2024, four symbols
+    return make_master(n_symbols=4, n_years=0.24, n_events=0, n_bad_ticks=0, start="2024-01-01")
+
+
+def _load(store_dir, **kw):
+    df = load_master(store_dir=store_dir, source=master_store.MASTER_CSV, **kw)
+    return df.sort_values(SORT_KEY, kind="mergesort").reset_index(drop=True)
+
+
+def _expected(df):
+    return normalize_master_frame(df).sort_values(SORT_KEY, kind="mergesort").reset_index(drop=True)
+
+
+def _shards(store_dir):
+    return sorted(f for f in os.listdir(store_dir) if f.endswith(".parquet"))
+
+# ============================================================
+# WRITE / READ
+# ============================================================
+
+def test_write_and_read_back(store, master):
+    write_master(master, store)
+
+    pd.testing.assert_frame_equal(_load(store), _expected(master))
+    assert _shards(store) == sorted(master_manifest(store)["shards"])
+    assert len(_shards(store)) == 3     # one per month
+
+    info = master_info(store)
+    assert info["rows"] == len(master)
+    assert info["symbols"] == 4
+    assert info["min_date"] == "2024-01-01"
+    assert info["max_date"] == master["DATE1"].max().strftime("%Y-%m-%d")
+
+
+def test_manifest_locates_every_date(store, master):
+    write_master(master.iloc[:200], store)
+    append_master(master.iloc[150:], store)
+    manifest = master_manifest(store)
+
+    # Per-date counts agree with the shards each date lives in
+    located = {}
+    for name, shard in manifest["shards"].items():
+        rows = pd.read_parquet(os.path.join(store, name))
+        assert shard["dates"] == rows["DATE1"].dt.strftime("%Y-%m-%d").value_counts().to_dict()
+        for d, n in shard["dates"].items():
+            located[d] = located.get(d, 0) + n
+    assert located == manifest["dates"] == master_date_counts(store)
+    assert "date_offsets" not in manifest
+
+
+def test_filtered_read(store, master):
+    write_master(master, store)
+    out = _load(store, columns=["SYMBOL", "DATE1", "CLOSE_PRICE"],
+                start="2024-02-01", end="2024-02-29", symbols={"SYM0001"})
+
+    exp = _expected(master)
+    exp = exp[(exp["SYMBOL"] == "SYM0001") & (exp["DATE1"].dt.month == 2)]
+    pd.testing.assert_frame_equal(out, exp[["SYMBOL", "DATE1", "CLOSE_PRICE"]].reset_index(drop=True))
+
+# ============================================================
+# COMMIT POINT
+# ============================================================
+
+def test_unreferenced_files_are_garbage(store, master):
+    write_master(master.iloc[:10], store)
+    stray = os.path.join(store, "2024-01-999999.parquet")
+    with open(stray, "wb") as f:
+        f.write(b"half-written shard")
+    with open(os.path.join(store, "2024-02-000009.parquet.tmp"), "wb") as f:
+        f.write(b"")
+
+    # Readers only follow the manifest
+    assert len(_load(store)) == 10
+
+    append_master(master.iloc[10:], store)
+    assert _shards(store) == sorted(master_manifest(store)["shards"])
+    assert not [f for f in os.listdir(store) if f.endswith(".tmp")]
+
+
+def test_failed_commit_keeps_previous_version(store, master, monkeypatch):
+    first = master[master["DATE1"] < "2024-02-01"]
+    write_master(first, store)
+    before = master_info(store)
+
+    def fail(path, payload, default=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(master_store, "write_json_atomic", fail)
+    with pytest.raises(OSError):
+        append_master(master, store)
+    monkeypatch.undo()
+
+    # The new shards exist on disk but were never committed
+    assert master_info(store) == before
+    pd.testing.assert_frame_equal(_load(store), _expected(first))
+
+# ============================================================
+# APPEND
+# ============================================================
+
+def test_append_skips_stored_keys(store, master):
+    write_master(master.iloc[:100], store)
+
+    # Overlaps the stored rows; duplicates within the batch too
+    batch = pd.concat([master.iloc[50:], master.iloc[-5:]])
+    added = append_master(batch, store)
+
+    assert added == len(master) - 100
+    assert append_master(master, store) == 0
+    pd.testing.assert_frame_equal(_load(store), _expected(master))
+    assert sum(master_date_counts(store).values()) == len(master)
+
+
+def test_month_is_compacted(store, master):
+    jan = master[master["DATE1"] < "2024-02-01"]
+    days = sorted(jan["DATE1"].unique())
+    write_master(jan[jan["DATE1"] == days[0]], store)
+
+    for day in days[1:COMPACT_AFTER_SHARDS + 1]:
+        append_master(jan[jan["DATE1"] == day], store)
+
+    # The append that pushed the month past the limit merged it
+    months = [s["month"] for s in master_manifest(store)["shards"].values()]
+    assert months == ["2024-01"]
+    assert len(_shards(store)) == 1
+
+    part = jan[jan["DATE1"] <= days[COMPACT_AFTER_SHARDS]]
+    pd.testing.assert_frame_equal(_load(store), _expected(part))
+    assert master_info(store)["rows"] == len(part)
+
+# ============================================================
+# CROSS-PROCESS LOCK
+# ============================================================
+
+def _append_days(store_dir, csv_path):
+    append_master(pd.read_csv(csv_path), store_dir)
+
+
+def test_concurrent_appends_from_processes(store, master, tmp_path):
+    days = sorted(master["DATE1"].unique())
+    write_master(master[master["DATE1"] == days[0]], store)
+
+    # Four writers, interleaved days in the same months: without the
+    # lock one commit overwrites another, or GC drops a fresh shard
+    paths = []
+    for i in range(4):
+        part = master[master["DATE1"].isin(days[1 + i::4])]
+        path = tmp_path / f"part{i}.csv"
+        part.to_csv(path, index=False)
+        paths.append(str(path))
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_append_days, args=(store, p)) for p in paths]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+    assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+
+    pd.testing.assert_frame_equal(_load(store), _expected(master))
+    assert _shards(store) == sorted(master_manifest(store)["shards"])
+
+
+def test_nested_write_lock_is_reentrant(store, master):
+    # append_master into a missing store runs write_master under its lock
+    assert append_master(master, store) == len(master)
+    assert master_info(store)["rows"] == len(master)
+
+# ============================================================
+# LEGACY MIGRATION
+# ============================================================
+
+def test_load_master_migrates_legacy_csv(store, master, tmp_path, monkeypatch, capsys):
+    csv = tmp_path / "legacy.csv"
+    legacy = master.copy()
+    legacy["DATE1"] = legacy["DATE1"].dt.strftime(" %d-%b-%Y")
+    legacy["TURNOVER_LACS"] = legacy["TURNOVER_LACS"].map("{:,.2f}".format)
+    legacy.rename(columns={"SERIES": " SERIES"}).to_csv(csv, index=False)
+    monkeypatch.setattr(master_store, "MASTER_CSV", str(csv))
+
+    out = load_master(source=str(csv), store_dir=store)
+    assert "Migrated" in capsys.readouterr().out
+    assert os.path.exists(master_manifest_path(store))
+    pd.testing.assert_frame_equal(
+        out.sort_values(SORT_KEY, kind="mergesort").reset_index(drop=True), _expected(master)
+    )
+
+    # Later loads are served from the store, not the CSV
+    os.remove(csv)
+    assert len(load_master(source=str(csv), store_dir=store)) == len(master)
+    assert "Migrated" not in capsys.readouterr().out
+
+
+def test_old_manifest_gains_metadata(store, master):
+    write_master(master, store)
+    path = os.path.join(store, MANIFEST_FILE)
+    with open(path) as f:
+        manifest = json.load(f)
+    for key in ("rows", "min_date", "max_date", "content_hash"):
+        manifest.pop(key)
+    for shard in manifest["shards"].values():
+        shard.pop("sha256")
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+    info = master_info(store)
+    assert info["rows"] == len(master)
+    with open(path) as f:
+        assert "content_hash" in json.load(f)
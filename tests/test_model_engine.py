@@ -0,0 +1,229 @@
+# ============================================================
+# tests/test_model_engine.py
+# Incremental retraining policy and the holdout drift baseline
+# ============================================================
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+import model_engine
+from config import FEATURES, HOLDING_DAYS
+from model_engine import train_and_save_models, _plan, _holdout
+from model_registry import model_meta
+
+N_TREES = 20
+
+
+def _frame(n_dates: int, n_symbols: int = 10, seed: int = 0) -> pd.DataFrame:
+    """Random-walk closes with noise features, one macro group."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2022-01-03", periods=n_dates)
+    close = 100 * np.exp(np.cumsum(rng.normal(scale=0.01, size=(n_dates, n_symbols)), axis=0))
+    df = pd.DataFrame({
+        "SYMBOL": np.tile([f"S{i}" for i in range(n_symbols)], n_dates),
+        "DATE": np.repeat(dates, n_symbols),
+        "CLOSE_PRICE": close.ravel(),
+        "macro_group": 0.0
+    })
+    for f in FEATURES:
+        df[f] = rng.normal(size=len(df))
+    return df
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_engine, "XGB_PARAMS", {**model_engine.XGB_PARAMS, "n_estimators": N_TREES})
+    monkeypatch.setattr(model_engine, "MIN_TRAIN_ROWS", 100)
+    monkeypatch.setattr(model_engine, "INCREMENTAL_MIN_ROWS", 200)
+    return str(tmp_path / "models")
+
+
+@pytest.fixture(scope="module")
+def world():
+    return _frame(320)
+
+
+def _train(df, model_dir, mode):
+    report = train_and_save_models(train_df=df, model_dir=model_dir, mode=mode, cores=1)
+    return report.set_index("macro_group").loc[0.0]
+
+
+def _until(df, n_dates):
+    return df[df["DATE"] <= df["DATE"].unique()[n_dates - 1]]
+
+# ============================================================
+# FULL FIT
+# ============================================================
+
+def test_full_fit_records_an_out_of_sample_baseline(world, models):
+    _train(_until(world, 200), models, "full")
+    meta = model_meta(0, models)
+
+    assert meta["mode"] == "full"
+    assert meta["incremental_updates"] == 0
+    assert meta["n_trees"] == N_TREES
+    # Noise features: the fit only looks good in sample
+    assert meta["holdout_rmse"] > meta["train_rmse"]
+
+
+def test_holdout_embargoes_rows_whose_target_reaches_it(world):
+    fit, test = _holdout(world)
+    dates = world["DATE"].unique()
+    first = np.searchsorted(dates, test["DATE"].min())
+
+    assert len(test["DATE"].unique()) == int(len(dates) * model_engine.HOLDOUT_FRACTION)
+    assert np.searchsorted(dates, fit["DATE"].max()) == first - HOLDING_DAYS - 1
+    assert _holdout(_until(world, HOLDING_DAYS)) is None
+
+
+def test_incremental_without_a_saved_model_fits_fully(world, models):
+    row = _train(_until(world, 200), models, "incremental")
+
+    assert row["mode"] == "full"
+    assert row["reason"] == "no previous model with a training watermark"
+
+# ============================================================
+# INCREMENTAL
+# ============================================================
+
+def test_too_few_new_rows_keeps_the_model(world, models):
+    _train(_until(world, 200), models, "full")
+    before = model_meta(0, models)
+
+    row = _train(_until(world, 210), models, "incremental")
+
+    assert row["mode"] == "kept"
+    assert model_meta(0, models) == before
+
+
+def test_new_rows_continue_the_saved_model(world, models):
+    _train(_until(world, 200), models, "full")
+    before = model_meta(0, models)
+
+    row = _train(_until(world, 260), models, "incremental")
+    meta = model_meta(0, models)
+
+    assert row["mode"] == "incremental"
+    assert meta["mode"] == "incremental"
+    assert meta["incremental_updates"] == 1
+    assert meta["n_trees"] == N_TREES + model_engine.INCREMENTAL_TREES
+    assert meta["train_end"] > before["train_end"]
+    # The drift baseline stays the one from the last full fit
+    assert meta["holdout_rmse"] == before["holdout_rmse"]
+
+
+def test_update_cap_forces_a_full_refit(world, models, monkeypatch):
+    monkeypatch.setattr(model_engine, "MAX_INCREMENTAL_UPDATES", 1)
+    _train(_until(world, 200), models, "full")
+    _train(_until(world, 260), models, "incremental")
+
+    row = _train(world, models, "incremental")
+    meta = model_meta(0, models)
+
+    assert row["mode"] == "full"
+    assert row["reason"] == "1 incremental updates since last full fit"
+    assert (meta["mode"], meta["incremental_updates"]) == ("full", 0)
+    assert meta["n_trees"] == N_TREES
+
+# ============================================================
+# PLAN
+# ============================================================
+
+def _rows(n_dates: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    d = pd.DataFrame(rng.normal(size=(10 * n_dates, len(FEATURES))), columns=FEATURES)
+    d["DATE"] = np.repeat(pd.bdate_range("2023-01-02", periods=n_dates), 10)
+    d["target"] = d["ret_1"] + rng.normal(scale=0.1, size=len(d))
+    return d
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    """A model of target ~ ret_1, its metadata, and rows past its watermark."""
+    d, unseen = _rows(60, seed=1), _rows(20, seed=2)
+    old = d[d["DATE"] <= "2023-01-31"]
+
+    model = xgb.XGBRegressor(n_estimators=50, max_depth=3, n_jobs=1)
+    model.fit(old[FEATURES], old["target"])
+    meta = {
+        "train_end": "2023-01-31", "features": list(FEATURES), "incremental_updates": 0,
+        "train_rmse": model_engine._rmse(model, old[FEATURES], old["target"]),
+        "holdout_rmse": model_engine._rmse(model, unseen[FEATURES], unseen["target"])
+    }
+    return d, model, meta
+
+
+def test_plan_refits_when_features_change(fitted):
+    d, model, meta = fitted
+    assert _plan(d, model, {**meta, "features": FEATURES[:-1]}) == ("full", "feature list changed")
+
+
+def test_plan_continues_when_new_rows_err_like_the_holdout(fitted, monkeypatch):
+    monkeypatch.setattr(model_engine, "INCREMENTAL_MIN_ROWS", 100)
+    d, model, meta = fitted
+
+    kind, new = _plan(d, model, meta)
+
+    assert kind == "incremental"
+    assert (new["DATE"] > pd.Timestamp(meta["train_end"])).all()
+    # Against the in-sample RMSE the same rows would look like drift
+    legacy = {k: v for k, v in meta.items() if k != "holdout_rmse"}
+    assert _plan(d, model, legacy)[0] == "full"
+
+
+def test_plan_refits_on_drift(fitted, monkeypatch):
+    monkeypatch.setattr(model_engine, "INCREMENTAL_MIN_ROWS", 100)
+    d, model, meta = fitted
+
+    # The relationship flips on the new rows
+    new = d["DATE"] > meta["train_end"]
+    kind, reason = _plan(d.assign(target=np.where(new, -d["target"], d["target"])), model, meta)
+
+    assert kind == "full"
+    assert reason.startswith("drift:")
+
+# ============================================================
+# SCHEDULER
+# ============================================================
+
+@pytest.mark.parametrize("n_jobs, cores, split", [
+    (1, 8, (1, 8)),
+    (3, 8, (3, 2)),
+    (8, 4, (4, 1)),
+    (4, 1, (1, 1)),
+    (0, 4, (1, 4)),
+])
+def test_split_cores(n_jobs, cores, split):
+    assert model_engine._split_cores(n_jobs, cores) == split
+
+
+def test_pooled_fits_match_sequential(world):
+    # Spawned workers import XGB_PARAMS afresh, so this runs the real 300 trees
+    X, y = world[FEATURES], world["CLOSE_PRICE"].pct_change().fillna(0.0)
+    jobs = [(m, "exact", X.iloc[m::4], y.iloc[m::4]) for m in range(2)]
+
+    # Two spawned workers x two threads vs one in-process n_jobs=1 fit
+    pooled = {m: model for m, _, model, _ in model_engine._run_jobs(jobs, cores=4)}
+    for m, tm, Xm, ym in jobs:
+        ref = xgb.XGBRegressor(**{**model_engine.XGB_PARAMS, "tree_method": tm}).fit(Xm, ym)
+        np.testing.assert_array_equal(pooled[m].predict(X), ref.predict(X))
+        assert pooled[m].get_params()["n_jobs"] == 1
+
+# ============================================================
+# HIST VS EXACT
+# ============================================================
+
+@pytest.mark.parametrize("min_corr, kept", [(-1.0, "hist"), (1.01, "exact")])
+def test_hist_falls_back_to_exact_below_rank_corr(world, models, monkeypatch, capsys, min_corr, kept):
+    monkeypatch.setattr(model_engine, "HIST_MIN_RANK_CORR", min_corr)
+
+    report = train_and_save_models(train_df=_until(world, 200), model_dir=models,
+                                   tree_method="hist", validate_hist=True, cores=1)
+    row = report.set_index("macro_group").loc[0.0]
+    meta = model_meta(0, models)
+
+    assert row["tree_method"] == meta["params"]["tree_method"] == kept
+    assert meta["hist_drift"]["rank_corr"] == row["rank_corr"]
+    assert ("keeping exact model" in capsys.readouterr().out) == (kept == "exact")
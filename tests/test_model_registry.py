@@ -0,0 +1,159 @@
+# ============================================================
+# tests/test_model_registry.py
+# Warm registry: checksum refusal, reloads and joblib migration
+# ============================================================
+
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from config import FEATURES
+from model_registry import (
+    save_model,
+    load_models,
+    model_meta,
+    model_versions,
+    LEGACY_ARCHIVE_DIR
+)
+
+
+def _train(seed: int) -> xgb.XGBRegressor:
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(200, len(FEATURES))), columns=FEATURES)
+    y = X.iloc[:, 0] * seed + rng.normal(scale=0.1, size=len(X))
+    model = xgb.XGBRegressor(n_estimators=5, max_depth=2, n_jobs=1)
+    return model.fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def models():
+    return _train(1), _train(2)
+
+
+@pytest.fixture
+def X():
+    return np.random.default_rng(0).normal(size=(10, len(FEATURES))).astype(np.float32)
+
+
+def _pred(model, X):
+    return model.get_booster().inplace_predict(X)
+
+# ============================================================
+# SAVE / LOAD
+# ============================================================
+
+def test_round_trip_and_warm_cache(tmp_path, models, X):
+    a, _ = models
+    path = save_model(a, 3, {"rows": 200, "features": FEATURES}, str(tmp_path), "ubj")
+    assert os.path.basename(path) == "macro_3.0.ubj"
+
+    loaded = load_models(str(tmp_path))
+    assert list(loaded) == [3]
+    np.testing.assert_array_equal(_pred(loaded[3], X), _pred(a, X))
+
+    # Unchanged files are served from memory
+    assert load_models(str(tmp_path))[3] is loaded[3]
+
+    meta = model_meta(3, str(tmp_path))
+    assert meta["rows"] == 200 and meta["format"] == "ubj"
+    assert model_versions(str(tmp_path)) == {"3.0": meta["sha256"]}
+
+
+def test_resave_is_reloaded(tmp_path, models, X):
+    a, b = models
+    save_model(a, 1, model_dir=str(tmp_path), fmt="ubj")
+    first = load_models(str(tmp_path))[1]
+
+    save_model(b, 1, model_dir=str(tmp_path), fmt="json")
+    second = load_models(str(tmp_path))[1]
+
+    assert second is not first
+    np.testing.assert_array_equal(_pred(second, X), _pred(b, X))
+    # The other native format is removed so it cannot shadow the new one
+    assert not os.path.exists(tmp_path / "macro_1.0.ubj")
+
+# ============================================================
+# CHECKSUM REFUSAL
+# ============================================================
+
+def _swap_in(tmp_path, src_dir, macro=1):
+    """Replaces the model file behind the metadata's back."""
+    name = f"macro_{float(macro)}.ubj"
+    shutil.copy(os.path.join(src_dir, name), tmp_path / (name + ".new"))
+    os.replace(tmp_path / (name + ".new"), tmp_path / name)
+
+
+def test_mismatched_checksum_is_skipped(tmp_path, models, capsys):
+    a, b = models
+    other = tmp_path / "other"
+    save_model(b, 1, model_dir=str(other), fmt="ubj")
+
+    save_model(a, 1, model_dir=str(tmp_path), fmt="ubj")
+    _swap_in(tmp_path, other)
+
+    assert load_models(str(tmp_path)) == {}
+    assert "checksum does not match" in capsys.readouterr().out
+
+
+def test_mismatched_checksum_keeps_loaded_copy(tmp_path, models, X, capsys):
+    a, b = models
+    other = tmp_path / "other"
+    save_model(b, 1, model_dir=str(other), fmt="ubj")
+
+    save_model(a, 1, model_dir=str(tmp_path), fmt="ubj")
+    first = load_models(str(tmp_path))[1]
+    _swap_in(tmp_path, other)
+
+    kept = load_models(str(tmp_path))[1]
+    assert kept is first
+    np.testing.assert_array_equal(_pred(kept, X), _pred(a, X))
+    assert "Keeping previously loaded" in capsys.readouterr().out
+
+    # A proper save is picked up again
+    save_model(b, 1, model_dir=str(tmp_path), fmt="ubj")
+    np.testing.assert_array_equal(_pred(load_models(str(tmp_path))[1], X), _pred(b, X))
+
+
+def test_wrong_features_are_refused(tmp_path, models):
+    save_model(models[0], 2, {"features": FEATURES[::-1]}, str(tmp_path), "ubj")
+    assert load_models(str(tmp_path)) == {}
+
+# ============================================================
+# LEGACY JOBLIB MIGRATION
+# ============================================================
+
+def test_joblib_pickles_are_migrated(tmp_path, models, X, capsys):
+    a, b = models
+    joblib.dump(a, tmp_path / "macro_0.0.joblib")
+    joblib.dump(b, tmp_path / "macro_2.joblib")
+
+    loaded = load_models(str(tmp_path))
+    assert sorted(loaded) == [0, 2]
+    np.testing.assert_array_equal(_pred(loaded[0], X), _pred(a, X))
+    np.testing.assert_array_equal(_pred(loaded[2], X), _pred(b, X))
+    assert "Converted 2 legacy" in capsys.readouterr().out
+
+    # Pickles are archived, metadata records where each model came from
+    assert sorted(os.listdir(tmp_path / LEGACY_ARCHIVE_DIR)) == ["macro_0.0.joblib", "macro_2.joblib"]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".joblib")]
+    assert model_meta(2, str(tmp_path))["migrated_from"] == "macro_2.joblib"
+    assert model_meta(2, str(tmp_path))["features"] == FEATURES
+
+
+def test_unconvertible_pickle_is_left_in_place(tmp_path, models, capsys):
+    save_model(models[0], 1, model_dir=str(tmp_path), fmt="ubj")
+    with open(tmp_path / "macro_4.0.joblib", "wb") as f:
+        f.write(b"not a pickle")
+
+    assert list(load_models(str(tmp_path))) == [1]
+    assert "Could not convert legacy model macro_4.0.joblib" in capsys.readouterr().out
+    assert os.path.exists(tmp_path / "macro_4.0.joblib")
+
+    # Migration runs once per directory and process
+    load_models(str(tmp_path))
+    assert "Could not convert" not in capsys.readouterr().out
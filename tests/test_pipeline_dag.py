@@ -0,0 +1,120 @@
+# ============================================================
+# tests/test_pipeline_dag.py
+# Input-keyed checkpoints: which nodes run, which are reused
+# ============================================================
+
+import os
+
+import pytest
+
+import pipeline_dag
+from pipeline_dag import Node, run_node, run_pipeline, read_checkpoint
+
+# ------------------------------------------------------------
+# TOY DAG
+# ------------------------------------------------------------
+#   source  -> {"version": <source version>}      (current while on disk)
+#   derived -> {"file": ..., "from": <version>}   (current while its file exists)
+
+
+class Toy:
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.version = 1
+        self.runs = []
+
+    def nodes(self):
+        def source_run(params, inputs, work_dir):
+            self.runs.append("source")
+            return {"version": inputs["version"]}
+
+        def derived_run(params, inputs, work_dir):
+            self.runs.append("derived")
+            path = os.path.join(work_dir, f"derived_{inputs['source']}.txt")
+            with open(path, "w") as f:
+                f.write(params["decision_date"])
+            return {"file": path, "from": inputs["source"]}
+
+        return [
+            Node("source", [], lambda p, up: {"version": self.version}, source_run,
+                 lambda out: True),
+            Node("derived", ["source"],
+                 lambda p, up: {"source": up["source"]["version"], "day": p["decision_date"]},
+                 derived_run, lambda out: os.path.exists(out["file"])),
+        ]
+
+
+@pytest.fixture
+def toy(tmp_path, monkeypatch):
+    t = Toy(str(tmp_path / "work"))
+    monkeypatch.setattr(pipeline_dag, "PIPELINE", t.nodes())
+    return t
+
+
+def _run(toy, tmp_path, day="2024-03-01"):
+    out = run_pipeline(day, work_dir=toy.work_dir, pipeline_dir=str(tmp_path / "ckpt"))
+    return {name: r["status"] for name, r in out.items()}
+
+# ============================================================
+# CHECKPOINT SKIPPING
+# ============================================================
+
+def test_unchanged_inputs_reuse_checkpoints(toy, tmp_path):
+    assert _run(toy, tmp_path) == {"source": "done", "derived": "done"}
+    assert _run(toy, tmp_path) == {"source": "reused", "derived": "reused"}
+    assert toy.runs == ["source", "derived"]
+
+    ckpt = read_checkpoint("derived", str(tmp_path / "ckpt"))
+    assert ckpt["inputs"] == {"source": 1, "day": "2024-03-01"}
+
+
+def test_changed_source_reruns_dependents(toy, tmp_path):
+    _run(toy, tmp_path)
+    toy.version = 2
+    assert _run(toy, tmp_path) == {"source": "done", "derived": "done"}
+    assert toy.runs == ["source", "derived"] * 2
+
+
+def test_changed_param_reruns_only_its_node(toy, tmp_path):
+    _run(toy, tmp_path)
+    assert _run(toy, tmp_path, day="2024-03-04") == {"source": "reused", "derived": "done"}
+    assert toy.runs == ["source", "derived", "derived"]
+
+
+def test_missing_output_is_rebuilt(toy, tmp_path):
+    _run(toy, tmp_path)
+    os.remove(read_checkpoint("derived", str(tmp_path / "ckpt"))["output"]["file"])
+    assert _run(toy, tmp_path) == {"source": "reused", "derived": "done"}
+
+# ============================================================
+# SINGLE NODES
+# ============================================================
+
+def test_node_without_inputs_is_skipped(tmp_path):
+    node = Node("noop", [], lambda p, up: None, lambda *a: pytest.fail("ran"))
+    assert run_node(node, {}, {}, str(tmp_path), str(tmp_path)) == ("skipped", None)
+    assert read_checkpoint("noop", str(tmp_path)) is None
+
+
+def test_node_without_current_is_never_reused(tmp_path):
+    runs = []
+    node = Node("fetch", [], lambda p, up: {"range": ["a", "b"]},
+                lambda p, inputs, w: runs.append(1) or {"n": len(runs)})
+
+    assert run_node(node, {}, {}, str(tmp_path), str(tmp_path)) == ("done", {"n": 1})
+    assert run_node(node, {}, {}, str(tmp_path), str(tmp_path)) == ("done", {"n": 2})
+
+
+def test_failed_node_keeps_previous_checkpoint(tmp_path):
+    ok = Node("n", [], lambda p, up: {"v": 1}, lambda p, i, w: {"v": 1}, lambda out: True)
+    run_node(ok, {}, {}, str(tmp_path), str(tmp_path))
+
+    def boom(p, i, w):
+        raise RuntimeError("stage failed")
+
+    bad = Node("n", [], lambda p, up: {"v": 2}, boom, lambda out: True)
+    with pytest.raises(RuntimeError):
+        run_node(bad, {}, {}, str(tmp_path), str(tmp_path))
+
+    assert read_checkpoint("n", str(tmp_path))["inputs"] == {"v": 1}
+    assert run_node(ok, {}, {}, str(tmp_path), str(tmp_path))[0] == "reused"
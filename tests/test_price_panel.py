@@ -0,0 +1,164 @@
+# ============================================================
+# tests/test_price_panel.py
+# Date x symbol price panel vs the groupby/merge it replaced; rebuilds
+# ============================================================
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from master_store import write_master, append_master, load_master, master_manifest_path
+from price_panel import load_price_panel, PRICE_FIELDS
+from performance_engine import extract_base_symbol
+from benchmarks.synthetic import make_master
+
+
+@pytest.fixture(scope="module")
+def master():
+    # Jan-Mar 2024, eight symbols
+    return make_master(n_symbols=8, n_years=0.24, n_events=0, n_bad_ticks=0, start="2024-01-01")
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    return {k: str(tmp_path / k) for k in ("master", "panel", "fresh")}
+
+
+def _assert_same(a, b):
+    np.testing.assert_array_equal(a.dates, b.dates)
+    assert list(a.symbols) == list(b.symbols)
+    assert a.meta["base_start"] == b.meta["base_start"]
+    np.testing.assert_array_equal(a.present, b.present)
+    for f in PRICE_FIELDS:
+        np.testing.assert_array_equal(a.prices[f], b.prices[f])
+
+@pytest.fixture(scope="module")
+def relabelled():
+    """
+    A master with what the panel must average over: SYM0001 relabelled
+    _PRE / _POST around a split (both on the split day), missing
+    AVG_PRICE values, and a symbol absent on some days.
+    """
+    df = make_master(n_symbols=6, n_years=0.2, n_events=0, n_bad_ticks=0, start="2024-01-01", seed=3)
+    days = np.sort(df["DATE1"].unique())
+    split = days[20]
+
+    one = df["SYMBOL"] == "SYM0001"
+    pre = df[one & (df["DATE1"] <= split)].assign(SYMBOL="SYM0001_PRE")
+    post = df[one & (df["DATE1"] >= split)].assign(SYMBOL="SYM0001_POST")
+    post.loc[post["DATE1"] == split, "AVG_PRICE"] *= 0.5
+    df = pd.concat([df[~one], pre, post], ignore_index=True)
+
+    rng = np.random.default_rng(0)
+    df.loc[rng.choice(len(df), 15, replace=False), "AVG_PRICE"] = np.nan
+    df.loc[(df["SYMBOL"] == "SYM0002_PRE") | ((df["SYMBOL"] == "SYM0003") & (df["DATE1"] == split)), "AVG_PRICE"] = np.nan
+    gone = (df["SYMBOL"] == "SYM0004") & df["DATE1"].isin(days[5:9])
+    return df[~gone].reset_index(drop=True)
+
+
+def _legacy_prices(df, day):
+    """Per-base-symbol mean AVG_PRICE on `day`, as performance_engine computed it."""
+    p = df[df["DATE1"] == day][["SYMBOL", "AVG_PRICE"]].copy()
+    p["BASE_SYMBOL"] = p["SYMBOL"].apply(extract_base_symbol)
+    return p.groupby("BASE_SYMBOL")["AVG_PRICE"].mean()
+
+# ============================================================
+# PARITY WITH GROUPBY / MERGE
+# ============================================================
+
+def test_base_prices_match_groupby_mean(dirs, relabelled):
+    write_master(relabelled, dirs["master"])
+    panel = load_price_panel(dirs["panel"], dirs["master"])
+    df = load_master(store_dir=dirs["master"])
+
+    assert "SYM0001" in set(panel.base_symbols)
+    prices, present = panel.base_prices(np.arange(len(panel.dates)))
+    for row, day in enumerate(panel.dates):
+        ref = _legacy_prices(df, day)
+        got = pd.Series(prices[row], index=panel.base_symbols)[present[row]]
+
+        assert set(got.index) == set(ref.index)
+        pd.testing.assert_series_equal(got.sort_index(), ref.sort_index(),
+                                       check_names=False, rtol=1e-13)
+
+
+def test_returns_match_entry_exit_merge(dirs, relabelled):
+    write_master(relabelled, dirs["master"])
+    panel = load_price_panel(dirs["panel"], dirs["master"])
+    df = load_master(store_dir=dirs["master"])
+
+    entry = np.arange(len(panel.dates) - 5)
+    r, in_both = panel.returns(entry, entry + 5)
+    for i, e in enumerate(entry):
+        ref = _legacy_prices(df, panel.dates[e]).rename("entry_price").reset_index().merge(
+            _legacy_prices(df, panel.dates[e + 5]).rename("exit_price").reset_index(),
+            on="BASE_SYMBOL", how="inner"
+        )
+        ref = (ref["exit_price"] / ref["entry_price"] - 1).set_axis(ref["BASE_SYMBOL"])
+
+        got = pd.Series(r[i], index=panel.base_symbols)[in_both[i]]
+        assert set(got.index) == set(ref.index)
+        pd.testing.assert_series_equal(got.sort_index(), ref.sort_index(),
+                                       check_names=False, rtol=1e-13)
+
+# ============================================================
+# RELOADS
+# ============================================================
+
+def test_panel_reloads_only_when_master_content_changes(dirs, master):
+    days = sorted(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-1]], dirs["master"])
+    panel = load_price_panel(dirs["panel"], dirs["master"])
+    assert load_price_panel(dirs["panel"], dirs["master"]) is panel
+
+    # A rewritten manifest with the same content: reopened, not rebuilt
+    path = master_manifest_path(dirs["master"])
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    same = load_price_panel(dirs["panel"], dirs["master"])
+    assert same is not panel and same.meta["generation"] == panel.meta["generation"]
+
+    append_master(master[master["DATE1"] == days[-1]], dirs["master"])
+    new = load_price_panel(dirs["panel"], dirs["master"])
+
+    assert new.meta["generation"] == panel.meta["generation"] + 1
+    assert new.meta["master_hash"] != panel.meta["master_hash"]
+    assert new.dates[-1] == days[-1] and panel.dates[-1] < days[-1]
+
+# ============================================================
+# APPENDS
+# ============================================================
+
+def test_appended_dates_extend_the_panel(dirs, master, capsys):
+    days = sorted(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-2]], dirs["master"])
+    load_price_panel(dirs["panel"], dirs["master"])
+
+    for d in days[-2:]:
+        append_master(master[master["DATE1"] == d], dirs["master"])
+        panel = load_price_panel(dirs["panel"], dirs["master"])
+
+    assert capsys.readouterr().out.count("extended by 1 dates") == 2
+    _assert_same(panel, load_price_panel(dirs["fresh"], dirs["master"]))
+
+
+@pytest.mark.parametrize("change", ["backfill", "new_symbol"])
+def test_other_changes_rebuild_in_full(dirs, master, capsys, change):
+    days = sorted(master["DATE1"].unique())
+    base = master[master["DATE1"] < days[-1]]
+    if change == "backfill":
+        late = base[(base["DATE1"] == days[3]) & (base["SYMBOL"] == "SYM0002")]
+        base, new = base.drop(late.index), late
+    else:
+        new = master[(master["DATE1"] == days[-1]) & (master["SYMBOL"] == "SYM0000")]
+        new = new.assign(SYMBOL="NEW")
+    write_master(base, dirs["master"])
+    load_price_panel(dirs["panel"], dirs["master"])
+
+    append_master(new, dirs["master"])
+    panel = load_price_panel(dirs["panel"], dirs["master"])
+
+    assert "extended" not in capsys.readouterr().out
+    _assert_same(panel, load_price_panel(dirs["fresh"], dirs["master"]))
@@ -0,0 +1,220 @@
+# ============================================================
+# tests/test_raw_cache.py
+# Raw bhavcopy cache: importing downloads, hashing objects once, ensure_days
+# ============================================================
+
+import os
+
+import pandas as pd
+import pytest
+
+import raw_cache
+from bhav_downloader import REPORT_COLUMNS
+from raw_cache import import_dir, cached_days, ensure_days, _read_index
+
+HEADER = "SYMBOL, SERIES, DATE1, CLOSE_PRICE\n"
+
+
+def _bhavcopy(folder, day, close=10.0):
+    """Writes '<dd-Mon-yyyy>_sec_bhavdata_full.csv' for `day`."""
+    path = folder / f"{day}_sec_bhavdata_full.csv"
+    path.write_text(HEADER + f"ABC, EQ, {day}, {close}\n")
+    return path
+
+
+@pytest.fixture
+def src(tmp_path):
+    folder = tmp_path / "downloads"
+    folder.mkdir()
+    return folder
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return str(tmp_path / "cache")
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Names of the files raw_cache hashes."""
+    seen = []
+    real = raw_cache.sha256_file
+
+    def sha256_file(path):
+        seen.append(os.path.basename(path))
+        return real(path)
+
+    monkeypatch.setattr(raw_cache, "sha256_file", sha256_file)
+    return seen
+
+
+@pytest.fixture
+def nse(monkeypatch):
+    """
+    Fake download_bhavcopies. `served` maps a requested calendar date to
+    the trading day NSE answers with (absent: not published). Returns
+    the served map and the batches of dates requested.
+    """
+    served, calls = {}, []
+
+    def download_bhavcopies(dates, output_dir):
+        calls.append([pd.Timestamp(d).strftime("%Y-%m-%d") for d in dates])
+        rows = []
+        for d in dates:
+            d = pd.Timestamp(d)
+            day = served.get(d.strftime("%Y-%m-%d"))
+            if day is None:
+                rows.append((d, "missing", None, 404, 1, 0.0, None))
+                continue
+            path = os.path.join(output_dir, f"{d.strftime('%d-%b-%Y')}_sec_bhavdata_full.csv")
+            with open(path, "w") as f:
+                f.write(HEADER + f"ABC, EQ, {pd.Timestamp(day).strftime('%d-%b-%Y')}, 10.0\n")
+            rows.append((d, "ok", path, 200, 1, 0.0, None))
+        return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+    monkeypatch.setattr(raw_cache, "download_bhavcopies", download_bhavcopies)
+    monkeypatch.setattr(raw_cache, "LEGACY_DIRS", [])
+    return served, calls
+
+# ============================================================
+# IMPORT
+# ============================================================
+
+def test_import_dir_indexes_days_and_requests(src, cache):
+    _bhavcopy(src, "01-Mar-2024")
+    # A holiday request answered with the previous session's file
+    (src / "02-Mar-2024_sec_bhavdata_full.csv").write_text(HEADER + "ABC, EQ, 01-Mar-2024, 10.0\n")
+
+    assert import_dir(str(src), cache) == 2
+    index = _read_index(cache)
+    assert list(index["days"]) == ["2024-03-01"]
+    assert index["requests"] == {"2024-03-01": {"day": "2024-03-01"}, "2024-03-02": {"day": "2024-03-01"}}
+    assert [d.strftime("%Y-%m-%d") for d in cached_days(cache)] == ["2024-03-01"]
+
+
+def test_other_files_are_skipped_quietly(src, cache, capsys):
+    _bhavcopy(src, "01-Mar-2024")
+    (src / "master_data.csv").write_text("not a download\n")
+
+    assert import_dir(str(src), cache) == 1
+    assert capsys.readouterr().out == ""
+
+
+def test_failed_imports_are_reported(src, cache, capsys, monkeypatch):
+    _bhavcopy(src, "01-Mar-2024")
+    (src / "04-Mar-2024_sec_bhavdata_full.csv").write_text("garbage\n")
+    _bhavcopy(src, "05-Mar-2024")
+
+    real = raw_cache.shutil.copyfile
+
+    def corrupt_copy(a, b):
+        real(a, b)
+        if "05-Mar-2024" in a:
+            with open(b, "ab") as f:
+                f.write(b"flipped")
+
+    monkeypatch.setattr(raw_cache.shutil, "copyfile", corrupt_copy)
+    assert import_dir(str(src), cache) == 1
+
+    out = capsys.readouterr().out
+    assert "04-Mar-2024_sec_bhavdata_full.csv" in out
+    assert "does not match its checksum" in out
+    assert list(_read_index(cache)["days"]) == ["2024-03-01"]
+
+# ============================================================
+# HASH ONCE
+# ============================================================
+
+def test_stamped_object_is_not_rehashed(src, cache, hashes):
+    _bhavcopy(src, "01-Mar-2024")
+    import_dir(str(src), cache)
+    # Source, then the copy before it is renamed into place
+    assert hashes == ["01-Mar-2024_sec_bhavdata_full.csv", hashes[1]]
+    assert hashes[1].endswith(".tmp")
+
+    hashes.clear()
+    assert import_dir(str(src), cache) == 1
+    assert hashes == ["01-Mar-2024_sec_bhavdata_full.csv"]
+
+
+def test_changed_object_is_hashed_and_replaced(src, cache, hashes):
+    _bhavcopy(src, "01-Mar-2024")
+    import_dir(str(src), cache)
+    entry = _read_index(cache)["days"]["2024-03-01"]
+    obj = raw_cache._object_path(entry["sha256"], cache)
+
+    with open(obj, "a") as f:
+        f.write("tampered\n")
+    hashes.clear()
+    import_dir(str(src), cache)
+
+    # The object no longer matches its stamp, so it is hashed and rewritten
+    assert os.path.basename(obj) in hashes
+    with open(obj) as f:
+        assert f.read() == (src / "01-Mar-2024_sec_bhavdata_full.csv").read_text()
+
+# ============================================================
+# ENSURE DAYS
+# ============================================================
+
+def test_ensure_days_fetches_only_missing_days(cache, nse):
+    served, calls = nse
+    served.update({"2024-03-01": "2024-03-01", "2024-03-04": "2024-03-04",
+                   "2024-03-05": "2024-03-05"})
+
+    first = ensure_days(["2024-03-01"], cache)
+    got = ensure_days(["2024-03-01", "2024-03-04", "2024-03-05"], cache)
+
+    assert calls == [["2024-03-01"], ["2024-03-04", "2024-03-05"]]
+    assert list(got) == [pd.Timestamp(d) for d in ("2024-03-01", "2024-03-04", "2024-03-05")]
+    assert got[pd.Timestamp("2024-03-01")] == first[pd.Timestamp("2024-03-01")]
+
+
+def test_repeat_call_makes_no_requests(cache, nse):
+    served, calls = nse
+    # Saturday is answered with Friday's file
+    served.update({"2024-03-01": "2024-03-01", "2024-03-02": "2024-03-01"})
+    dates = ["2024-03-01", "2024-03-02"]
+
+    got = ensure_days(dates, cache)
+    calls.clear()
+
+    assert ensure_days(dates, cache) == got
+    assert calls == []
+    assert list(got) == [pd.Timestamp("2024-03-01")]
+
+
+def test_unpublished_days_are_recorded(cache, nse):
+    served, calls = nse
+    served["2024-03-01"] = "2024-03-01"
+
+    got = ensure_days(["2024-03-01", "2024-03-08"], cache)
+    assert list(got) == [pd.Timestamp("2024-03-01")]
+    assert _read_index(cache)["requests"]["2024-03-08"] == {"missing": True}
+
+    calls.clear()
+    ensure_days(["2024-03-01", "2024-03-08"], cache)
+    assert calls == []
+
+
+def test_todays_file_is_not_final_until_published(cache, nse):
+    served, calls = nse
+    today = pd.Timestamp.now().normalize()
+    yesterday = today - pd.Timedelta(days=1)
+    t, y = today.strftime("%Y-%m-%d"), yesterday.strftime("%Y-%m-%d")
+
+    # Nothing out yet: not recorded as missing
+    assert ensure_days([today], cache) == {}
+    assert t not in _read_index(cache)["requests"]
+
+    # Before the day's file is out, today is answered with yesterday's
+    served[t] = y
+    assert list(ensure_days([today], cache)) == [yesterday]
+    assert list(ensure_days([today], cache)) == [yesterday]
+    assert calls == [[t], [t], [t]]
+
+    # Once today's own file is in, it is final
+    served[t] = t
+    assert list(ensure_days([today], cache)) == [today]
+    ensure_days([today], cache)
+    assert calls == [[t], [t], [t], [t]]
@@ -0,0 +1,109 @@
+# ============================================================
+# tests/test_regime_engine.py
+# integrate_regimes against the legacy per-row apply
+# ============================================================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from regime_engine import integrate_regimes, validate_regime_table
+
+# Shared boundary days (03-15, 06-30) as in the shipped breakpoint
+# tables, and a calendar gap 09-01 -> 09-09 covered by no regime
+REGIMES = pd.DataFrame({
+    "regime_id": [1, 2, 3, 4],
+    "start_date": ["2024-01-01", "2024-03-15", "2024-06-30", "2024-09-10"],
+    "end_date": ["2024-03-15", "2024-06-30", "2024-08-31", "2024-12-31"],
+})
+MACROS = pd.DataFrame({"regime_id": [1, 2, 3, 4], "macro_group": [0, 2, 0, 1]})
+
+
+@pytest.fixture
+def tables(tmp_path):
+    reg, mac = tmp_path / "regimes.csv", tmp_path / "macro.csv"
+    REGIMES.to_csv(reg, index=False)
+    MACROS.to_csv(mac, index=False)
+    return str(reg), str(mac)
+
+
+def _frame(start="2023-12-20", end="2025-01-10", symbols=3):
+    dates = pd.date_range(start, end)
+    df = pd.DataFrame({
+        "SYMBOL": np.repeat([f"S{i}" for i in range(symbols)], len(dates)),
+        "DATE": np.tile(dates.values, symbols),
+    })
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+# ============================================================
+# LEGACY REFERENCE
+# ============================================================
+
+def legacy_integrate_regimes(df, regime_csv, macro_csv, cutoff_date):
+    reg = pd.read_csv(regime_csv)
+    mac = pd.read_csv(macro_csv)
+    reg["start_date"] = pd.to_datetime(reg["start_date"])
+    reg["end_date"] = pd.to_datetime(reg["end_date"])
+    cutoff_date = pd.to_datetime(cutoff_date)
+
+    def map_reg(d):
+        if d > cutoff_date:
+            return np.nan
+        r = reg[(reg.start_date <= d) & (reg.end_date >= d)]
+        return r.regime_id.iloc[0] if len(r) else np.nan
+
+    df["regime"] = df["DATE"].apply(map_reg)
+    df["macro_group"] = df["regime"].map(mac.set_index("regime_id")["macro_group"])
+    return df
+
+# ============================================================
+# EQUIVALENCE
+# ============================================================
+
+@pytest.mark.parametrize("cutoff", ["2024-03-15", "2024-09-05", "2024-12-31", "2026-01-01"])
+def test_matches_legacy(tables, cutoff):
+    df = _frame()
+    df.loc[::97, "DATE"] = pd.NaT
+
+    new = integrate_regimes(df.copy(), *tables, cutoff)
+    old = legacy_integrate_regimes(df.copy(), *tables, cutoff)
+    pd.testing.assert_frame_equal(new, old, check_exact=True)
+
+
+def test_boundary_day_takes_first_regime(tables):
+    df = pd.DataFrame({"DATE": pd.to_datetime(["2024-03-15", "2024-06-30", "2024-09-05"])})
+    out = integrate_regimes(df, *tables, "2024-12-31")
+
+    assert out["regime"].tolist()[:2] == [1, 2]
+    assert np.isnan(out["regime"].iloc[2])
+
+
+def test_all_resolved_keeps_integer_ids(tables):
+    df = _frame("2024-01-01", "2024-08-31")
+    out = integrate_regimes(df.copy(), *tables, "2024-12-31")
+
+    assert out["regime"].dtype == np.int64
+    pd.testing.assert_frame_equal(out, legacy_integrate_regimes(df.copy(), *tables, "2024-12-31"))
+
+# ============================================================
+# VALIDATION
+# ============================================================
+
+def test_validate_regime_table():
+    reg = REGIMES.assign(
+        start_date=pd.to_datetime(REGIMES["start_date"]),
+        end_date=pd.to_datetime(REGIMES["end_date"]),
+    )
+    assert validate_regime_table(reg) == ["gap between regime 3 and 4: 2024-08-31 -> 2024-09-10"]
+
+    reg.loc[1, "start_date"] = pd.Timestamp("2024-03-01")
+    reg.loc[3, "end_date"] = pd.Timestamp("2024-01-01")
+    issues = validate_regime_table(reg)
+    assert "regime 4: end_date before start_date" in issues
+    assert "regime 2 overlaps regime 1 by more than a boundary day" in issues
+
+
+def test_integrate_does_not_report_issues(tables, capsys):
+    # The gap in REGIMES is reported by feature store builds, not per call
+    integrate_regimes(_frame(), *tables, "2024-12-31")
+    assert capsys.readouterr().out == ""
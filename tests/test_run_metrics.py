@@ -0,0 +1,91 @@
+# ============================================================
+# tests/test_run_metrics.py
+# Stage records: the JSON lines stage / timed / set_rows append to LOG_FILE
+# ============================================================
+
+import json
+import time
+import threading
+
+import pytest
+
+import run_metrics
+from run_metrics import stage, timed, set_rows, begin_run
+
+
+@pytest.fixture
+def records(monkeypatch):
+    """Reads back the JSON lines written so far; runs are per stage."""
+    monkeypatch.setitem(run_metrics._state, "run", None)
+
+    def read():
+        with open(run_metrics.LOG_FILE, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    return read
+
+
+def test_stage_writes_one_json_line(records):
+    with stage("ingest", source="cache") as m:
+        m["rows"] = 12
+
+    [rec] = records()
+    assert rec["stage"] == "ingest" and rec["status"] == "ok"
+    assert rec["rows"] == 12 and rec["source"] == "cache"
+    assert rec["parent"] is None and rec["depth"] == 0
+    for k in ("run", "started", "ts", "wall_s", "cpu_s", "thread_cpu_s", "peak_rss_mb", "pid"):
+        assert k in rec, k
+    assert rec["wall_s"] >= 0 and rec["thread_cpu_s"] >= 0
+
+
+def test_timed_nests_under_the_open_stage(records):
+    @timed("parse", rows=len)
+    def parse():
+        return [1, 2, 3]
+
+    @timed("load")
+    def load():
+        set_rows(7)
+
+    run = begin_run("run-1")
+    with stage("pipeline"):
+        parse()
+        load()
+
+    inner_parse, inner_load, outer = records()
+    assert [r["run"] for r in (inner_parse, inner_load, outer)] == [run] * 3
+    assert (inner_parse["stage"], inner_parse["parent"], inner_parse["depth"], inner_parse["rows"]) == \
+        ("parse", "pipeline", 1, 3)
+    assert (inner_load["stage"], inner_load["rows"]) == ("load", 7)
+    assert (outer["stage"], outer["depth"], outer["rows"]) == ("pipeline", 0, None)
+
+
+def test_failed_stage_is_logged_and_reraised(records):
+    with pytest.raises(ValueError):
+        with stage("train"):
+            raise ValueError("no rows")
+
+    [rec] = records()
+    assert rec["status"] == "error"
+    assert rec["error"] == "ValueError: no rows"
+
+
+def test_thread_cpu_excludes_other_threads(records):
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            sum(range(1000))
+
+    busy = threading.Thread(target=spin)
+    busy.start()
+    try:
+        with stage("wait"):
+            time.sleep(0.3)
+    finally:
+        stop.set()
+        busy.join()
+
+    # The spinning thread lands in cpu_s, not in the stage's own thread
+    [rec] = records()
+    assert rec["thread_cpu_s"] < 0.05
+    assert rec["cpu_s"] > rec["thread_cpu_s"] + 0.1
@@ -0,0 +1,136 @@
+# ============================================================
+# tests/test_symbol_history.py
+# Per-symbol index over master shards: slices, date bounds, updates
+# ============================================================
+
+import os
+
+import pandas as pd
+import pytest
+
+import symbol_history
+from master_store import write_master, append_master, load_master, master_manifest, COMPACT_AFTER_SHARDS
+from symbol_history import load_symbol_history, build_symbol_history
+from benchmarks.synthetic import make_master
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    return str(tmp_path / "master"), str(tmp_path / "history")
+
+
+@pytest.fixture(scope="module")
+def master():
+    # Jan-Apr 2024, six symbols
+    return make_master(n_symbols=6, n_years=0.35, n_events=0, n_bad_ticks=0, start="2024-01-01")
+
+
+def _read(dirs, symbol, **kw):
+    master_dir, history_dir = dirs
+    return load_symbol_history(symbol, history_dir=history_dir, master_dir=master_dir, **kw)
+
+
+def _expected(dirs, symbol, start=None, end=None, columns=None):
+    df = load_master(symbols=[symbol], start=start, end=end, store_dir=dirs[0])
+    df = df.sort_values("DATE1", kind="mergesort").reset_index(drop=True)
+    return df if columns is None else df[[c for c in df.columns if c in columns]]
+
+
+@pytest.fixture
+def indexed(monkeypatch):
+    """Shard paths whose SYMBOL column the index reads."""
+    seen = []
+    real = symbol_history._symbol_runs
+
+    def runs(path):
+        seen.append(os.path.basename(path))
+        return real(path)
+
+    monkeypatch.setattr(symbol_history, "_symbol_runs", runs)
+    return seen
+
+# ============================================================
+# SLICES
+# ============================================================
+
+def test_full_history_matches_master(dirs, master):
+    write_master(master, dirs[0])
+    for symbol in sorted(master["SYMBOL"].unique()):
+        pd.testing.assert_frame_equal(_read(dirs, symbol), _expected(dirs, symbol))
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2024-02-05", "2024-03-14"),   # inside, across a month boundary
+    ("2024-02-01", "2024-02-29"),   # exactly one month shard
+    ("2024-02-03", "2024-02-04"),   # a weekend: no rows
+    (None, "2024-01-10"),
+    ("2024-04-20", None),
+    ("2023-01-01", "2023-12-31"),   # before the master
+])
+def test_date_bounds_are_inclusive(dirs, master, start, end):
+    write_master(master, dirs[0])
+    got = _read(dirs, "SYM0001", start=start, end=end)
+
+    pd.testing.assert_frame_equal(got, _expected(dirs, "SYM0001", start, end))
+    if start is not None and len(got):
+        assert got["DATE1"].min() >= pd.Timestamp(start)
+    if end is not None and len(got):
+        assert got["DATE1"].max() <= pd.Timestamp(end)
+
+
+def test_column_subset_and_unknown_symbol(dirs, master):
+    write_master(master, dirs[0])
+    got = _read(dirs, "SYM0002", start="2024-03-01", columns=["CLOSE_PRICE", "DATE1"])
+
+    assert list(got.columns) == ["DATE1", "CLOSE_PRICE"]
+    pd.testing.assert_frame_equal(
+        got, _expected(dirs, "SYM0002", start="2024-03-01", columns=["DATE1", "CLOSE_PRICE"])
+    )
+    missing = _read(dirs, "NOPE", columns=["CLOSE_PRICE"])
+    assert missing.empty and list(missing.columns) == ["CLOSE_PRICE"]
+
+# ============================================================
+# UPDATES
+# ============================================================
+
+def test_append_indexes_only_new_shards(dirs, master, indexed):
+    days = sorted(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-1]], dirs[0])
+    build_symbol_history(dirs[1], dirs[0])
+    before = set(indexed)
+
+    append_master(master[master["DATE1"] == days[-1]], dirs[0])
+    indexed.clear()
+    got = _read(dirs, "SYM0003")
+
+    # One new shard for the appended day; the others are not re-read
+    assert len(indexed) == 1 and indexed[0] not in before
+    assert got["DATE1"].max() == days[-1]
+    pd.testing.assert_frame_equal(got, _expected(dirs, "SYM0003"))
+
+
+def test_late_rows_for_a_month_are_read_in_date_order(dirs, master):
+    days = sorted(master["DATE1"].unique())
+    gap = days[5]
+    late = master[(master["DATE1"] == gap) & (master["SYMBOL"] == "SYM0000")]
+    write_master(master.drop(late.index), dirs[0])
+    assert _read(dirs, "SYM0000")["DATE1"].isin([gap]).sum() == 0
+
+    # The back-filled row lands in a later shard of the same month
+    append_master(late, dirs[0])
+    got = _read(dirs, "SYM0000")
+
+    assert got["DATE1"].is_monotonic_increasing
+    pd.testing.assert_frame_equal(got, _expected(dirs, "SYM0000"))
+
+
+def test_compacted_shards_leave_the_index(dirs, master):
+    days = sorted(d for d in master["DATE1"].unique() if pd.Timestamp(d).month == 4)
+    write_master(master[master["DATE1"] < days[0]], dirs[0])
+    for d in days[:COMPACT_AFTER_SHARDS + 1]:
+        append_master(master[master["DATE1"] == d], dirs[0])
+        _read(dirs, "SYM0004")
+
+    meta = build_symbol_history(dirs[1], dirs[0])
+    assert set(meta["shards"]) == set(master_manifest(dirs[0])["shards"])
+    pd.testing.assert_frame_equal(_read(dirs, "SYM0004"), _expected(dirs, "SYM0004"))
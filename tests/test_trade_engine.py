@@ -0,0 +1,150 @@
+# ============================================================
+# tests/test_trade_engine.py
+# live_trade_decision against the legacy per-model sort/head(K) loop
+# ============================================================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import trade_engine
+from config import FEATURES, TOP_K
+from trade_engine import live_trade_decision
+
+DECISION = pd.Timestamp("2024-03-01")
+ENTRY = pd.Timestamp("2024-03-04")
+
+# ------------------------------------------------------------
+# STUB MODELS
+# ------------------------------------------------------------
+# Integer features and weights keep every float32 score exact, so the
+# batched matrix and the per-model DataFrame predict agree bit for bit
+# and ties are real ties.
+
+class LinearModel:
+    def __init__(self, weights):
+        self.w = np.asarray(weights, dtype=np.float32)
+
+    def get_booster(self):
+        return self
+
+    def inplace_predict(self, X):
+        return np.asarray(X, dtype=np.float32) @ self.w
+
+    def predict(self, X: pd.DataFrame):
+        return self.inplace_predict(X.to_numpy(dtype=np.float32))
+
+
+def _weights(*head):
+    w = np.zeros(len(FEATURES))
+    w[:len(head)] = head
+    return w
+
+
+def _snapshot(n_symbols: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Symbols out of alphabetical order so the SYMBOL tie-break matters
+    symbols = [f"S{i:03d}" for i in rng.permutation(n_symbols)]
+
+    rows = []
+    for date in (DECISION - pd.Timedelta(days=1), DECISION):
+        day = pd.DataFrame(rng.integers(-2, 3, (n_symbols, len(FEATURES))), columns=FEATURES)
+        day.insert(0, "SYMBOL", symbols)
+        day.insert(1, "DATE", date)
+        rows.append(day)
+    df = pd.concat(rows, ignore_index=True).astype({f: "float64" for f in FEATURES})
+
+    # A row with a missing feature never enters the snapshot
+    df.loc[len(df) - 1, FEATURES[0]] = np.nan
+    return df
+
+
+@pytest.fixture
+def use_models(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_engine, "MODEL_DIR", str(tmp_path))
+
+    def install(models: dict):
+        monkeypatch.setattr(trade_engine, "load_models", lambda model_dir: models)
+        return models
+
+    return install
+
+# ============================================================
+# LEGACY REFERENCE
+# ============================================================
+
+def legacy_trade_decision(df_feat, decision_date, entry_date, models) -> pd.DataFrame:
+    snap = df_feat[df_feat["DATE"] == decision_date].dropna(subset=FEATURES).copy()
+
+    cluster_scores = {}
+    cluster_topk = {}
+    for macro, model in models.items():
+        tmp = snap.copy()
+        tmp["pred"] = model.predict(tmp[FEATURES])
+        topk = tmp.sort_values(["pred", "SYMBOL"], ascending=[False, True]).head(TOP_K)
+        cluster_scores[macro] = topk["pred"].mean()
+        cluster_topk[macro] = topk
+
+    champion = max(cluster_scores, key=cluster_scores.get)
+
+    trade = cluster_topk[champion].copy()
+    trade.loc[:, "weight"] = 1 / TOP_K
+    trade.loc[:, "entry_date"] = entry_date
+    trade.loc[:, "cluster"] = champion
+    return trade.sort_values("pred", ascending=False)
+
+
+def _assert_same_sheet(df, models):
+    new = live_trade_decision(df, DECISION, ENTRY)
+    old = legacy_trade_decision(df, DECISION, ENTRY, models)
+
+    assert set(new.attrs["scoring_ms"]) == set(models)
+    new.attrs.clear()
+    pd.testing.assert_frame_equal(new, old, check_exact=True)
+    return new
+
+# ============================================================
+# EQUIVALENCE
+# ============================================================
+
+def test_matches_legacy_with_ties_at_cut(use_models):
+    models = use_models({
+        0: LinearModel(_weights(1)),            # five-valued scores: many ties at the cut
+        1: LinearModel(_weights(1, 1, -1)),
+        2: LinearModel(_weights(2, 0, 1, 1)),
+    })
+    _assert_same_sheet(_snapshot(40), models)
+
+
+def test_matches_legacy_all_tied(use_models):
+    models = use_models({
+        3: LinearModel(_weights()),
+        1: LinearModel(_weights()),
+    })
+    trade = _assert_same_sheet(_snapshot(25), models)
+
+    # Every score is 0: first model wins, alphabetical symbols
+    assert trade["cluster"].eq(3).all()
+    assert list(trade["SYMBOL"]) == [f"S{i:03d}" for i in range(TOP_K)]
+
+
+def test_matches_legacy_fewer_symbols_than_k(use_models):
+    models = use_models({0: LinearModel(_weights(1, 2))})
+    trade = _assert_same_sheet(_snapshot(TOP_K - 2), models)
+    # One of the symbols has a missing feature on the decision date
+    assert len(trade) == TOP_K - 3
+
+# ============================================================
+# ERRORS
+# ============================================================
+
+def test_empty_snapshot_raises(use_models):
+    use_models({0: LinearModel(_weights(1))})
+    with pytest.raises(RuntimeError, match="No data available"):
+        live_trade_decision(_snapshot(5), pd.Timestamp("2030-01-01"), ENTRY)
+
+
+def test_no_models_raises(use_models):
+    use_models({})
+    with pytest.raises(RuntimeError, match="No trained models"):
+        live_trade_decision(_snapshot(5), DECISION, ENTRY)
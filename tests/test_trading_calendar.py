@@ -0,0 +1,103 @@
+# ============================================================
+# tests/test_trading_calendar.py
+# TradingCalendar session offsets and the warm loader
+# ============================================================
+
+import pandas as pd
+import pytest
+
+from trading_calendar import TradingCalendar, load_trading_calendar
+from master_store import write_master, append_master
+from benchmarks.synthetic import make_master
+
+# Observed master: 2024-01-01..2024-01-12 weekdays, minus a closure on
+# Tue 01-09 nobody listed, plus a special Saturday session on 01-06
+OBSERVED = [
+    d for d in pd.bdate_range("2024-01-01", "2024-01-12") if d != pd.Timestamp("2024-01-09")
+] + [pd.Timestamp("2024-01-06")]
+# Projected days only skip listed holidays
+HOLIDAYS = [pd.Timestamp("2024-01-16"), pd.Timestamp("2023-12-25")]
+
+
+@pytest.fixture
+def cal():
+    return TradingCalendar(OBSERVED, HOLIDAYS)
+
+
+def _d(s):
+    return pd.Timestamp(s)
+
+# ============================================================
+# OFFSETS
+# ============================================================
+
+def test_observed_span_uses_master_dates(cal):
+    assert cal.is_session("2024-01-06")         # special session
+    assert not cal.is_session("2024-01-09")     # unlisted closure
+    assert cal.next_session("2024-01-05") == _d("2024-01-06")
+    assert cal.next_session("2024-01-08") == _d("2024-01-10")
+    assert cal.prev_session("2024-01-10") == _d("2024-01-08")
+
+
+def test_projection_skips_weekends_and_holidays(cal):
+    assert cal.next_session("2024-01-12") == _d("2024-01-15")
+    assert cal.offset("2024-01-12", 2) == _d("2024-01-17")     # 01-16 listed holiday
+    assert cal.prev_session("2024-01-01") == _d("2023-12-29")
+    assert cal.offset("2023-12-27", -1) == _d("2023-12-26")    # 12-25 listed holiday
+
+
+@pytest.mark.parametrize("date, n, expected", [
+    ("2024-01-05", 0, "2024-01-05"),     # session itself
+    ("2024-01-07", 0, "2024-01-08"),     # Sunday -> next session
+    ("2024-01-09", 0, "2024-01-10"),
+    ("2024-01-07", 1, "2024-01-08"),     # strictly after
+    ("2024-01-05", 3, "2024-01-10"),     # 06, 08, 10
+    ("2024-01-10", -3, "2024-01-05"),    # 08, 06, 05
+    ("2024-01-07", -1, "2024-01-06"),
+    ("2024-01-05 15:30", 1, "2024-01-06"),
+])
+def test_offset(cal, date, n, expected):
+    assert cal.offset(date, n) == _d(expected)
+
+
+def test_offset_round_trip(cal):
+    for d in cal.sessions_between("2024-01-02", "2024-01-31"):
+        for n in (1, 5, 12):
+            assert cal.offset(cal.offset(d, n), -n) == d
+
+
+def test_sessions_between_and_download_days(cal):
+    assert list(cal.sessions_between("2024-01-05", "2024-01-10")) == [
+        _d("2024-01-05"), _d("2024-01-06"), _d("2024-01-08"), _d("2024-01-10")
+    ]
+    # The unlisted closure stays downloadable so a gap can be filled
+    days = cal.download_days("2024-01-05", "2024-01-16")
+    assert _d("2024-01-09") in days and _d("2024-01-06") in days
+    assert _d("2024-01-16") not in days and _d("2024-01-13") not in days
+
+
+def test_out_of_range_raises(cal):
+    with pytest.raises(RuntimeError, match="No T-1 session"):
+        cal.offset(cal.sessions[0], -1)
+
+# ============================================================
+# WARM LOADER
+# ============================================================
+
+def test_loader_follows_the_master(tmp_path):
+    store = str(tmp_path / "store")
+    holidays = tmp_path / "holidays.csv"
+    pd.DataFrame({"date": ["2024-01-16"]}).to_csv(holidays, index=False)
+
+    master = make_master(n_symbols=2, n_years=0.04, n_events=0, n_bad_ticks=0, start="2024-01-01")
+    days = sorted(master["DATE1"].unique())
+    write_master(master[master["DATE1"] < days[-1]], store)
+
+    cal = load_trading_calendar(store, str(holidays))
+    assert cal.last_observed == days[-2]
+    assert load_trading_calendar(store, str(holidays)) is cal
+
+    append_master(master[master["DATE1"] == days[-1]], store)
+    fresh = load_trading_calendar(store, str(holidays))
+    assert fresh is not cal and fresh.last_observed == days[-1]
+    assert not fresh.is_session("2024-01-16")
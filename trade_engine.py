@@ -4,7 +4,10 @@
 # ============================================================
 
 import os
-import joblib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 
 from config import (
@@ -12,17 +15,59 @@ from config import (
     TOP_K,
     MODEL_DIR
 )
+from feature_store import load_features
+from model_registry import load_models
+from trading_calendar import load_trading_calendar
+from run_metrics import timed, set_rows
+
+# ============================================================
+# SCORING KERNELS
+# ============================================================
+
+def _score(model, X: np.ndarray):
+    t0 = time.perf_counter()
+    pred = model.get_booster().inplace_predict(X)
+    return pred, time.perf_counter() - t0
+
+
+def _top_k(snap: pd.DataFrame, pred: np.ndarray, k: int) -> pd.DataFrame:
+    """
+    Same rows as sorting by (pred desc, SYMBOL asc) and taking head(k),
+    but only the k best predictions (plus ties at the cut) get sorted.
+    """
+    if len(pred) > k:
+        best = np.argpartition(-pred, k - 1)[:k]
+        cand = np.flatnonzero(pred >= pred[best].min())
+    else:
+        cand = np.arange(len(pred))
+
+    return (
+        snap.iloc[cand]
+        .assign(pred=pred[cand])
+        .sort_values(["pred", "SYMBOL"], ascending=[False, True])
+        .head(k)
+    )
 
 # ============================================================
 # LIVE TRADE DECISION
 # ============================================================
 
-def live_trade_decision(df_feat: pd.DataFrame, decision_date, entry_date) -> pd.DataFrame:
+@timed("score")
+def live_trade_decision(df_feat: pd.DataFrame, decision_date, entry_date=None) -> pd.DataFrame:
+    """
+    df_feat=None reads the decision date straight from the feature store;
+    entry_date=None is the next exchange session after the decision date.
+    """
 
     # Ensure timestamps
     decision_date = pd.to_datetime(decision_date)
+    if entry_date is None:
+        entry_date = load_trading_calendar().next_session(decision_date)
     entry_date = pd.to_datetime(entry_date)
 
+    if df_feat is None:
+        df_feat = load_features(as_of=decision_date, start=decision_date)
+
     # --------------------------------------------------------
     # Snapshot at SPECIFIC decision date (Dynamic)
     # --------------------------------------------------------
@@ -35,30 +80,16 @@ def live_trade_decision(df_feat: pd.DataFrame, decision_date, entry_date) -> pd.
 
     if snap.empty:
         raise RuntimeError(f"❌ No data available on Selected Decision Date: {decision_date.date()}")
+    set_rows(len(snap))
 
     # --------------------------------------------------------
     # Load all models
     # --------------------------------------------------------
 
-    models = {}
-
     if not os.path.exists(MODEL_DIR):
         raise RuntimeError(f"❌ Model directory not found: {MODEL_DIR}")
 
-    for f in os.listdir(MODEL_DIR):
-        if not f.endswith(".joblib"):
-            continue
-
-        try:
-            macro_id = int(float(
-                f.replace("macro_", "").replace(".joblib", "")
-            ))
-
-            models[macro_id] = joblib.load(
-                os.path.join(MODEL_DIR, f)
-            )
-        except:
-            continue
+    models = load_models(MODEL_DIR)
 
     if not models:
         raise RuntimeError("❌ No trained models found. Please train models first.")
@@ -66,21 +97,26 @@ def live_trade_decision(df_feat: pd.DataFrame, decision_date, entry_date) -> pd.
     # --------------------------------------------------------
     # Champion–Challenger
     # --------------------------------------------------------
+    # One contiguous float32 matrix (XGBoost's internal precision)
+    # shared by every macro model, scored concurrently.
+
+    X = np.ascontiguousarray(snap[FEATURES].to_numpy(dtype=np.float32))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(len(models), os.cpu_count() or 1)) as pool:
+        futures = {macro: pool.submit(_score, model, X) for macro, model in models.items()}
+    wall = time.perf_counter() - t0
 
     cluster_scores = {}
     cluster_topk = {}
+    latency = {}
 
-    for macro, model in models.items():
-
-        tmp = snap.copy()
+    for macro, fut in futures.items():
         try:
-            tmp["pred"] = model.predict(tmp[FEATURES])
-            
-            topk = (
-                tmp
-                .sort_values(["pred", "SYMBOL"], ascending=[False, True])
-                .head(TOP_K)
-            )
+            pred, secs = fut.result()
+            latency[macro] = round(secs * 1e3, 3)
+
+            topk = _top_k(snap, pred, TOP_K)
 
             cluster_scores[macro] = topk["pred"].mean()
             cluster_topk[macro] = topk
@@ -102,4 +138,10 @@ def live_trade_decision(df_feat: pd.DataFrame, decision_date, entry_date) -> pd.
     trade.loc[:, "entry_date"] = entry_date
     trade.loc[:, "cluster"] = champion
 
-    return trade.sort_values("pred", ascending=False)
\ No newline at end of file
+    trade = trade.sort_values("pred", ascending=False)
+
+    trade.attrs["scoring_ms"] = latency
+    trade.attrs["scoring_wall_ms"] = round(wall * 1e3, 3)
+    print(f"⏱ Scored {len(snap)} symbols x {len(models)} models in {wall * 1e3:.1f} ms")
+
+    return trade
\ No newline at end of file
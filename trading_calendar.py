@@ -0,0 +1,156 @@
+# ============================================================
+# trading_calendar.py
+# Exchange session calendar from master dates + holiday list
+# ============================================================
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    MASTER_STORE_DIR,
+    HOLIDAY_CALENDAR
+)
+from master_store import (
+    store_exists,
+    master_date_counts,
+    master_manifest_path
+)
+
+# ------------------------------------------------------------
+# SESSIONS
+# ------------------------------------------------------------
+# Inside the master's date span the observed DATE1 values are the
+# sessions (they include special weekend sessions and exclude closures
+# nobody listed). Outside it sessions are projected: weekdays that are
+# not in HOLIDAY_CALENDAR, up to PROJECT_YEARS past the later of the
+# last master date and today.
+
+PROJECT_FROM = pd.Timestamp("2000-01-01")
+PROJECT_YEARS = 1
+
+_cache = {}
+_lock = threading.Lock()
+
+# ============================================================
+# CALENDAR
+# ============================================================
+
+def _weekdays(start, end, holidays: np.ndarray) -> pd.DatetimeIndex:
+    days = pd.bdate_range(start, end)
+    return days[~days.isin(holidays)]
+
+
+class TradingCalendar:
+    """
+    Sorted session dates with O(log n) next / previous / offset-N lookups.
+    """
+
+    def __init__(self, observed, holidays):
+        self.observed = pd.DatetimeIndex(sorted(set(observed)))
+        self.holidays = pd.DatetimeIndex(sorted(set(holidays)))
+        self._holidays = self.holidays.to_numpy()
+
+        today = pd.Timestamp.now().normalize()
+        last = max([today] + list(self.observed[-1:]) + list(self.holidays[-1:]))
+        horizon = last + pd.DateOffset(years=PROJECT_YEARS)
+
+        if len(self.observed):
+            first_obs, last_obs = self.observed[0], self.observed[-1]
+            before = _weekdays(min(PROJECT_FROM, first_obs), first_obs - pd.Timedelta(days=1), self._holidays)
+            after = _weekdays(last_obs + pd.Timedelta(days=1), horizon, self._holidays)
+            sessions = before.append(self.observed).append(after)
+        else:
+            sessions = _weekdays(PROJECT_FROM, horizon, self._holidays)
+
+        self.sessions = sessions.to_numpy(dtype="datetime64[ns]")
+
+    @property
+    def last_observed(self):
+        return self.observed[-1] if len(self.observed) else None
+
+    def _at(self, i: int, date, what: str) -> pd.Timestamp:
+        if not 0 <= i < len(self.sessions):
+            raise RuntimeError(f"❌ No {what} session for {pd.Timestamp(date).date()} in the calendar")
+        return pd.Timestamp(self.sessions[i])
+
+    @staticmethod
+    def _key(date):
+        return np.datetime64(pd.Timestamp(date).normalize(), "ns")
+
+    def is_session(self, date) -> bool:
+        d = self._key(date)
+        i = np.searchsorted(self.sessions, d)
+        return bool(i < len(self.sessions) and self.sessions[i] == d)
+
+    def is_observed(self, date) -> bool:
+        """True if `date` is a trading date present in the master."""
+        return pd.Timestamp(date).normalize() in self.observed
+
+    def offset(self, date, n: int) -> pd.Timestamp:
+        """
+        n > 0: the n-th session strictly after `date`; n < 0: the |n|-th
+        strictly before it; n = 0: `date` itself if it is a session,
+        else the next one.
+        """
+        d = self._key(date)
+        if n > 0:
+            return self._at(int(np.searchsorted(self.sessions, d, side="right")) + n - 1, date, f"T+{n}")
+        if n < 0:
+            return self._at(int(np.searchsorted(self.sessions, d, side="left")) + n, date, f"T{n}")
+        return self._at(int(np.searchsorted(self.sessions, d, side="left")), date, "current")
+
+    def next_session(self, date) -> pd.Timestamp:
+        return self.offset(date, 1)
+
+    def prev_session(self, date) -> pd.Timestamp:
+        return self.offset(date, -1)
+
+    def sessions_between(self, start, end) -> pd.DatetimeIndex:
+        """Sessions in [start, end]."""
+        lo = np.searchsorted(self.sessions, self._key(start), side="left")
+        hi = np.searchsorted(self.sessions, self._key(end), side="right")
+        return pd.DatetimeIndex(self.sessions[lo:hi])
+
+    def download_days(self, start, end) -> pd.DatetimeIndex:
+        """
+        Dates in [start, end] that can have a bhavcopy: every weekday that
+        is not a listed holiday, plus observed special sessions. Gaps in
+        the master are kept so they can still be filled.
+        """
+        days = _weekdays(start, end, self._holidays)
+        extra = self.observed[(self.observed >= pd.Timestamp(start)) & (self.observed <= pd.Timestamp(end))]
+        return days.union(extra)
+
+# ============================================================
+# LOAD (WARM)
+# ============================================================
+
+def _read_holidays(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    return list(pd.to_datetime(pd.read_csv(path)["date"]).dt.normalize())
+
+
+def load_trading_calendar(store_dir: str = MASTER_STORE_DIR,
+                          holiday_file: str = HOLIDAY_CALENDAR) -> TradingCalendar:
+    """
+    Calendar for the current master, answered from its manifest (no row
+    scan). Kept warm until the manifest or the holiday file changes.
+    """
+    paths = [master_manifest_path(store_dir), holiday_file]
+
+    with _lock:
+        stamp = tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in paths)
+        key = (os.path.abspath(store_dir), os.path.abspath(holiday_file))
+
+        entry = _cache.get(key)
+        if entry is not None and entry["stamp"] == stamp and entry["day"] == pd.Timestamp.now().date():
+            return entry["calendar"]
+
+        observed = [pd.Timestamp(d) for d in master_date_counts(store_dir)] if store_exists(store_dir) else []
+        calendar = TradingCalendar(observed, _read_holidays(holiday_file))
+        _cache[key] = {"stamp": stamp, "day": pd.Timestamp.now().date(), "calendar": calendar}
+        return calendar